@@ -1,28 +1,37 @@
+import csv
+import sys
+from concurrent.futures import Future
+from dataclasses import replace
 from itertools import product
-from math import ceil
 from pathlib import Path
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import Optional
 
 import typer
 from typing_extensions import Annotated
 
-from .lib.ach import ach_required
-from .lib.ashrae import ashrae_calculation
-from .lib.graphics import risk_ach_aerosol_graph
-from .lib.graphics import risk_ach_inf_graph
-from .lib.risk import ach_risk_aerosol_calculation
-from .lib.risk import ach_risk_inf_percent_calculation
 from .settings.config import config_app
 from .settings.config import settings
-from .utils.io import graphics_output
-from .utils.io import load_data
-from .utils.io import make_results_folder
-from .utils.io import save_data
 from .utils.options import AerosolCutoff
 from .utils.options import MaskType
+from .utils.options import OccupancyType
+from .utils.options import RiskAnalysis
 from .utils.options import SaveFormat
 from .utils.options import ViralLoad
 
 
+# pandas, numpy, plotly and pyarrow are imported by the commands that use them,
+# so `--help`, `config` and `query` start without loading them
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+    import pandas as pd
+
+    from .settings.model import ModelParameters
+    from .utils.progress import StageProgress
+
+
 app = typer.Typer(
     help="CLI interface for Air Quality analysis and Air Changes per Hour required for multiple indoor areas",
     pretty_exceptions_short=False,
@@ -30,8 +39,65 @@ app = typer.Typer(
 app.add_typer(config_app, name="config")
 
 
+@app.callback()
+def main(
+    ctx: typer.Context,
+    jobs: Annotated[
+        int,
+        typer.Option(
+            min=1,
+            help="Worker processes shared by every stage of a command. With 1 everything runs in this process",
+        ),
+    ] = settings["general"]["jobs"],
+    profile: Annotated[
+        bool,
+        typer.Option(
+            help="Time every stage of the command (load, validate, ACH, ASHRAE, risk, graphics, save). A summary is printed and profile.json is written next to the results",
+        ),
+    ] = False,
+    cprofile: Annotated[
+        bool,
+        typer.Option(
+            help="Also collect a cProfile of the command, saved as profile.prof, and print its hottest functions. Implies --profile",
+        ),
+    ] = False,
+    memory: Annotated[
+        bool,
+        typer.Option(
+            help="Also record the memory of every stage: peak RSS, peak Python allocations and the lines allocating the most. Implies --profile",
+        ),
+    ] = False,
+    metrics: Annotated[
+        Optional[Path],
+        typer.Option(
+            dir_okay=False,
+            help="Write the metrics of the command to this file on exit: simulations, cache hits, rows loaded, figures, bytes written and stage latencies. As a Prometheus textfile when it ends in .prom, JSON otherwise",
+        ),
+    ] = None,
+) -> None:
+    """
+    CLI interface for Air Quality analysis and Air Changes per Hour required for multiple indoor areas
+    """
+    ctx.obj = {"jobs": jobs}
+
+    if profile or cprofile or memory:
+        from .utils.profiling import finish_profile
+        from .utils.profiling import start_profile
+
+        start_profile(ctx.invoked_subcommand or "airborne", cprofile, memory)
+        ctx.call_on_close(finish_profile)
+
+    if metrics is not None:
+        from .utils.metrics import finish_metrics
+        from .utils.metrics import start_metrics
+
+        start_metrics(ctx.invoked_subcommand or "airborne", metrics)
+        ctx.call_on_close(finish_metrics)
+
+
 @app.command()
 def run(
+    ctx: typer.Context,
     data_in: Annotated[
         Path,
         typer.Argument(
@@ -77,100 +143,547 @@ def run(
         SaveFormat,
         typer.Option(
             case_sensitive=False,
-            help="Format for saving calculation results. Currently supperted: .csv and .xlsx",
+            help="Format for saving calculation results. Currently supperted: .csv, .xlsx, a single .xlsx workbook, .parquet, .feather and a .sqlite database",
         ),
     ] = SaveFormat(settings["general"]["save_format"]),
+    chunk_size: Annotated[
+        Optional[int],
+        typer.Option(
+            min=1,
+            help="Process the input in chunks of this many rows to keep memory bounded. Only for .csv and .jsonl/.ndjson inputs, results are appended to .csv files. Can't be used with --graphics",
+        ),
+    ] = None,
+    memory_limit: Annotated[
+        Optional[int],
+        typer.Option(
+            min=1,
+            help="Memory budget in MiB. When the projected footprint of the run is larger, the input is processed in chunks that fit, as with --chunk-size, and --graphics is rejected",
+        ),
+    ] = None,
 ) -> None:  # noqa: C901
     """
     Shortcut function to run calculation with default values.
     By default runs Required ACH, ASHRAE ventilation requirement calculations using default values and makes and saves graphics.
     To see configuration options and default values use airborne config --help
     """
+    from rich.console import Console
+
+    from .lib.graphics import risk_ach_aerosol_graph
+    from .lib.graphics import risk_ach_inf_graph
+    from .settings.model import compile_settings
+    from .utils.io import append_data
+    from .utils.io import graphics_output
+    from .utils.io import load_data
+    from .utils.io import load_data_chunks
+    from .utils.io import make_results_folder
+    from .utils.io import save_data
+    from .utils.memory import results_row_bytes
+    from .utils.metrics import count_written
+    from .utils.profiling import report_to
+    from .utils.profiling import stage
+    from .utils.progress import StageProgress
+    from .utils.workers import make_executor
+
+    parameters = compile_settings(settings)
+
+    if memory_limit is not None and chunk_size is None:
+        chunk_size = budget_chunk_size(
+            data_in,
+            memory_limit,
+            results_row_bytes(
+                parameters,
+                ach,
+                ashrae,
+                risk and settings["risk"]["risk_inf"],
+                risk and settings["risk"]["risk_aerosol"],
+                graphics,
+                save_format.value,
+                risk_co2=risk and settings["risk"]["risk_co2"],
+            ),
+            save_format.value,
+        )
+
+        if chunk_size is not None and save_format != SaveFormat.csv:
+            Console(stderr=True).print(
+                f"Results are saved as csv instead of {save_format.value}, only csv can be appended to chunk by chunk"
+            )
+            save_format = SaveFormat.csv
+
+    # Figures are made from the risk sweep of every room, a figure per chunk would overwrite the one before
+    if graphics and chunk_size is not None:
+        raise ValueError(
+            "[bold red]Alert![/bold red] --graphics needs the whole input at once, it can't be used with --chunk-size or when --memory-limit processes the input in chunks"
+        )
+
     # Setup input and output
-    (data, data_folder) = load_data(data_in)
+    if chunk_size is not None:
+        chunks = load_data_chunks(data_in, chunk_size)
+        data_folder = data_in.parent
+    else:
+        (data, data_folder) = load_data(data_in)
+        chunks = iter([data])
 
     if save_results or save_graphics:
         results_folder = make_results_folder(data_folder)
+        report_to(results_folder)
+        count_written(results_folder)
+
+    # Graphics exports and saves finish in the pool while the next stages run
+    exports = []
+    saves = []
+
+    with make_executor(ctx.obj["jobs"]) as executor, StageProgress() as progress:
+        for chunk_number, data in enumerate(chunks):
+            results_data = run_stages(
+                data,
+                parameters,
+                executor,
+                ctx.obj["jobs"],
+                ach,
+                ashrae,
+                risk,
+                progress=progress,
+            )
 
-    mask_type = MaskType(settings["ach"]["mask_default"])
-    viral_load = ViralLoad(settings["ach"]["viral_load"])
-    aerosol = AerosolCutoff(settings["ach"]["aerosol"])
+            # Making graphics
+            if graphics:
+                with stage("graphics"):
+                    graphic_results = {}
+
+                    if settings["risk"]["risk_inf"]:
+                        graphic_results["risk_ach_inf_graphics"] = risk_ach_inf_graph(
+                            results_data["risk_ach_inf_data"],
+                            settings["graphics"]["color_scheme"],
+                        )
+                    if settings["risk"]["risk_aerosol"]:
+                        graphic_results[
+                            "risk_ach_aerosol_graphics"
+                        ] = risk_ach_aerosol_graph(
+                            results_data["risk_ach_aerosol_data"],
+                            settings["graphics"]["color_scheme"],
+                        )
+
+                    if save_graphics:
+                        exports.extend(
+                            progress.track(
+                                "Figures exported",
+                                graphics_output(
+                                    results_folder, graphic_results, executor
+                                ),
+                            )
+                        )
+                    else:
+                        for graphic_group in graphic_results.values():
+                            for graph in graphic_group.values():
+                                graph.show()
+
+            # Saving data
+            if save_results:
+                with stage("save"):
+                    if chunk_size is not None:
+                        # Chunks are appended in order, so they are written here
+                        append_data(
+                            results_folder,
+                            save_format.value,
+                            results_data,
+                            header=chunk_number == 0,
+                        )
+                        progress.track_written(results_folder)
+                    else:
+                        future = executor.submit(
+                            save_data,
+                            results_folder,
+                            save_format.value,
+                            results_data,
+                            settings["general"]["compression"],
+                        )
+                        progress.track_written(results_folder, future)
+                        saves.append(future)
+
+        if exports:
+            with stage("graphics"):
+                for future in exports:
+                    future.result()
+
+        if saves:
+            with stage("save"):
+                for future in saves:
+                    future.result()
+
+
+def budget_chunk_size(
+    data_in: Path, memory_limit: int, results_bytes: float, save_format: str
+) -> Optional[int]:
+    """Checks the projected footprint of a run against a memory budget.
+
+    Args:
+        data_in (Path): Input file
+        memory_limit (int): Memory budget in MiB
+        results_bytes (float): Bytes of the results of a room, from `results_row_bytes`
+        save_format (str): Format the results are saved in
+
+    Returns:
+        Optional[int]: Rows per chunk that fit in the budget, None when the whole input fits or it can't be read in chunks
+    """
+    from rich.console import Console
+
+    from .utils.memory import MIB
+    from .utils.memory import project_footprint
+
+    console = Console(stderr=True)
+    footprint = project_footprint(data_in, results_bytes, save_format)
+
+    if footprint is None:
+        console.print(
+            f"Memory limit not applied, {data_in.suffix} inputs can't be read in chunks. Use .csv or .jsonl inputs"
+        )
+        return None
+
+    if footprint.total <= memory_limit * MIB:
+        return None
+
+    chunk_rows = footprint.chunk_rows(memory_limit * MIB)
+    console.print(
+        f"Projected memory of {footprint.total / MIB:.0f} MiB for {footprint.rows} rooms is over the {memory_limit} MiB limit, processing {chunk_rows} rooms at a time"
+    )
+
+    return chunk_rows
+
+
+def run_stages(
+    data: "pd.DataFrame",
+    parameters: "ModelParameters",
+    executor: "Executor",
+    jobs: int,
+    ach: bool,
+    ashrae: bool,
+    risk: bool,
+    cache: Optional[dict[tuple, Any]] = None,
+    progress: Optional["StageProgress"] = None,
+) -> dict[str, "pd.DataFrame"]:
+    """Runs the ACH, ASHRAE and risk stages of `run` over a data set with the configured defaults.
+    ACH solves and risk sweeps are submitted room by room to the worker pool before any of them is awaited, so the stages overlap.
+
+    Args:
+        data (pd.DataFrame): Validated input data, either the whole file or a chunk of it
+        parameters (ModelParameters): Model parameters compiled from the settings
+        executor (Executor): Worker pool of the command
+        jobs (int): Number of worker processes of the pool
+        ach (bool): Make required ACH calculations
+        ashrae (bool): Make ASHRAE ventilation requirements calculations
+        risk (bool): Make risk calculations
+        cache (Optional[dict[tuple, Any]]): Results of previous runs over the same data and ASHRAE rates, keyed by the parameters they depend on. Defaults to None.
+        progress (Optional[StageProgress]): Progress the solved rooms are counted on. Defaults to None.
+
+    Returns:
+        dict[str, pd.DataFrame]: Names and results of every stage that was run
+    """
+    import pandas as pd
+
+    from .lib.ach import ach_required_rooms
+    from .lib.ach import solver_iterations
+    from .lib.ashrae import ashrae_calculation
+    from .lib.risk import ach_risk_aerosol_calculation
+    from .lib.risk import ach_risk_co2_calculation
+    from .lib.risk import ach_risk_inf_percent_calculation
+    from .lib.risk import sweep_simulations
+    from .utils.metrics import increment
+    from .utils.metrics import observe
+    from .utils.profiling import stage
+    from .utils.progress import StageProgress
+    from .utils.workers import chunk_sizes
+    from .utils.workers import gather_chunks
+    from .utils.workers import stage_parts
+    from .utils.workers import submit_chunks
+
+    if cache is None:
+        cache = {}
+
+    if progress is None:
+        progress = StageProgress()
 
     results_data = {}
+    ach_columns = {}
+    pending: dict[tuple, list[Future]] = {}
+
+    # Required ACH calculations, solved in blocks of rooms
+    parts = stage_parts(jobs)
+    sizes = chunk_sizes(data, parts)
 
-    # Required ACH calculations
     if ach:
-        for occupancy, inf_percent in product(
-            settings["general"]["aforo"], settings["ach"]["inf_percent"]
-        ):
-            data[f"ACH_{occupancy}_aforo_{inf_percent}_inf"] = data.apply(
-                lambda x: ach_required(
-                    x["Area"],
-                    x["Altura"],
-                    ceil(x["Aforo_100"] * 0.5),
-                    x["Actividad"],
-                    x["Permanencia"],
-                    set_risk=settings["general"]["max_risk"] / 100,
-                    mask_type=int(mask_type.name[-1]),
-                    inf_percent=inf_percent,
-                    viral_load=int(viral_load.value),
-                    cutoff_type=int(aerosol.name[-1]),
-                ),
-                axis=1,
-            )
+        with stage("ach"):
+            for occupancy, inf_percent in product(
+                parameters.aforo, parameters.inf_percent
+            ):
+                key = (
+                    "ach",
+                    occupancy,
+                    inf_percent,
+                    parameters.max_risk,
+                    parameters.mask_type,
+                    parameters.viral_load,
+                    parameters.cutoff_type,
+                )
+
+                if key not in cache and key not in pending:
+                    pending[key] = progress.track(
+                        "Rooms solved",
+                        submit_chunks(
+                            executor,
+                            ach_required_rooms,
+                            data,
+                            parts,
+                            occupancy,
+                            parameters.mask_type,
+                            parameters.max_risk,
+                            inf_percent,
+                            parameters.viral_load,
+                            parameters.cutoff_type,
+                        ),
+                        sizes,
+                    )
+
+                ach_columns[f"ACH_{occupancy}_aforo_{inf_percent}_inf"] = key
+
+    # Risk sweeps, in the same blocks of rooms
+    risk_sweeps = {}
+
+    if risk:
+        with stage("risk"):
+            if settings["risk"]["risk_inf"]:
+                key = ("risk_inf", parameters.inf_percent)
+                risk_sweeps["risk_ach_inf_data"] = key
+
+                if key not in cache and key not in pending:
+                    pending[key] = progress.track(
+                        "Rooms swept",
+                        submit_chunks(
+                            executor,
+                            ach_risk_inf_percent_calculation,
+                            data,
+                            parts,
+                            list(parameters.inf_percent),
+                        ),
+                        sizes,
+                    )
+
+            if settings["risk"]["risk_aerosol"]:
+                key = ("risk_aerosol", parameters.aerosol)
+                risk_sweeps["risk_ach_aerosol_data"] = key
+
+                if key not in cache and key not in pending:
+                    pending[key] = progress.track(
+                        "Rooms swept",
+                        submit_chunks(
+                            executor,
+                            ach_risk_aerosol_calculation,
+                            data,
+                            parts,
+                            list(parameters.aerosol),
+                        ),
+                        sizes,
+                    )
+
+            if settings["risk"]["risk_co2"]:
+                key = ("risk_co2", parameters.max_risk)
+                risk_sweeps["risk_ach_co2_data"] = key
+
+                if key not in cache and key not in pending:
+                    pending[key] = progress.track(
+                        "Rooms swept",
+                        submit_chunks(
+                            executor,
+                            ach_risk_co2_calculation,
+                            data,
+                            parts,
+                            parameters.max_risk,
+                        ),
+                        sizes,
+                    )
+
+    for key, futures in pending.items():
+        if key[0] == "ach":
+            with stage("ach"):
+                cache[key] = pd.Series(
+                    [ach for future in futures for ach in future.result()],
+                    index=data.index,
+                )
+
+            for ach_value in cache[key]:
+                observe("airborne_ach_solver_iterations", solver_iterations(ach_value))
+                increment("airborne_simulations_total", solver_iterations(ach_value))
+        else:
+            with stage("risk"):
+                cache[key] = gather_chunks(futures)
+
+            increment("airborne_simulations_total", sweep_simulations(cache[key]))
+
+    increment("airborne_cache_misses_total", len(pending), cache="results")
+    increment(
+        "airborne_cache_hits_total",
+        len(set(ach_columns.values()) | set(risk_sweeps.values())) - len(pending),
+        cache="results",
+    )
+
+    for column, key in ach_columns.items():
+        data[column] = cache[key]
 
     # ASHRAE requirements calculations
     if ashrae:
-        for occupancy in settings["general"]["aforo"]:
-            data = ashrae_calculation(data, occupancy, settings["ashrae"])
+        with stage("ashrae"):
+            for occupancy in parameters.aforo:
+                columns = [f"Flujo_ASHRAE_{occupancy}", f"ACH_ASHRAE_{occupancy}"]
+
+                if ("ashrae", occupancy) in cache:
+                    data[columns] = cache[("ashrae", occupancy)]
+                    increment("airborne_cache_hits_total", cache="results")
+                else:
+                    data = ashrae_calculation(data, occupancy, parameters.ashrae)
+                    cache[("ashrae", occupancy)] = data[columns]
+                    increment("airborne_cache_misses_total", cache="results")
 
     results_data["ach-ashrae"] = data
 
-    # Risk calculations
-    if risk:
-        if settings["risk"]["risk_inf"]:
-            results_data["risk_ach_inf_data"] = ach_risk_inf_percent_calculation(
-                data, settings["ach"]["inf_percent"]
-            )
+    for name, key in risk_sweeps.items():
+        results_data[name] = cache[key]
 
-        if settings["risk"]["risk_aerosol"]:
-            results_data["risk_ach_aerosol_data"] = ach_risk_aerosol_calculation(
-                data, settings["ach"]["aerosol"]
-            )
+    return results_data
+
+
+@app.command()
+def batch(
+    ctx: typer.Context,
+    manifest_path: Annotated[
+        Path,
+        typer.Argument(
+            exists=True,
+            help="TOML manifest with the scenarios to run as [scenarios.<name>] tables. Read the docs for the settings a scenario can change",
+        ),
+    ],
+    data_in: Annotated[
+        Optional[Path],
+        typer.Option(
+            exists=True,
+            help="Filepath of the data for analysis. Defaults to the `input` of the manifest",
+        ),
+    ] = None,
+    save_format: Annotated[
+        SaveFormat,
+        typer.Option(
+            case_sensitive=False,
+            help="Format for saving calculation results. Currently supperted: .csv, .xlsx, a single .xlsx workbook, .parquet, .feather and a .sqlite database",
+        ),
+    ] = SaveFormat(settings["general"]["save_format"]),
+) -> None:
+    """
+    Runs many named scenarios against the same data. The data is loaded once and results shared between scenarios are computed once.
+    Results of each scenario are saved in its own folder, along with a table comparing the scenarios room by room.
+    """
+    import pandas as pd
+
+    from .settings.model import compile_ashrae
+    from .settings.model import compile_settings
+    from .utils.io import load_data
+    from .utils.io import make_results_folder
+    from .utils.io import save_data
+    from .utils.manifest import load_manifest
+    from .utils.metrics import count_written
+    from .utils.profiling import report_to
+    from .utils.profiling import stage
+    from .utils.progress import StageProgress
+    from .utils.workers import make_executor
+
+    manifest = load_manifest(manifest_path, settings)
+
+    if data_in is None:
+        data_in = manifest.data_in
+
+    if data_in is None:
+        raise ValueError(
+            "[bold red]Alert![/bold red] No data to analyse, set `input` in the manifest or use --data-in"
+        )
+
+    (data, data_folder) = load_data(data_in)
+    input_columns = data.columns
+
+    # Scenarios can't change the ASHRAE rates, so they are compiled once and the cache holds for every scenario
+    ashrae_rates = compile_ashrae(settings["ashrae"])
+    cache: dict[tuple, Any] = {}
+    comparison = {}
 
-    # Making graphics
-    if graphics:
-        graphic_results = {}
+    results_folder = make_results_folder(data_folder)
+    report_to(results_folder)
+    count_written(results_folder)
+    pending = []
 
-        if settings["risk"]["risk_inf"]:
-            graphic_results["risk_ach_inf_graphics"] = risk_ach_inf_graph(
-                results_data["risk_ach_inf_data"], settings["graphics"]["color_scheme"]
+    # One pool serves every scenario
+    with make_executor(ctx.obj["jobs"]) as executor, StageProgress() as progress:
+        progress.expect("Scenarios simulated", len(manifest.scenarios))
+
+        for scenario in manifest.scenarios:
+            parameters = replace(
+                compile_settings(scenario.settings), ashrae=ashrae_rates
             )
-        if settings["risk"]["risk_aerosol"]:
-            graphic_results["risk_ach_aerosol_graphics"] = risk_ach_aerosol_graph(
-                results_data["risk_ach_aerosol_data"],
-                settings["graphics"]["color_scheme"],
+
+            results_data = run_stages(
+                data.copy(),
+                parameters,
+                executor,
+                ctx.obj["jobs"],
+                scenario.settings["general"]["ach"],
+                scenario.settings["general"]["ashrae"],
+                scenario.settings["general"]["risk"],
+                cache,
+                progress,
             )
+            progress.advance("Scenarios simulated")
 
-        if save_graphics:
-            graphics_output(results_folder, graphic_results)
-        else:
-            for graphic_group in graphic_results:
-                for graph in graphic_group.values():
-                    graph.show()
+            scenario_results = results_data["ach-ashrae"]
+            comparison[scenario.name] = scenario_results[
+                scenario_results.columns.difference(input_columns, sort=False)
+            ]
 
-    # Saving data
-    if save_results:
-        save_data(data_folder, save_format.value, results_data)
+            with stage("save"):
+                scenario_folder = results_folder.joinpath(scenario.name)
+                scenario_folder.mkdir()
+                future = executor.submit(
+                    save_data,
+                    scenario_folder,
+                    save_format.value,
+                    results_data,
+                    settings["general"]["compression"],
+                )
+                progress.track_written(scenario_folder, future)
+                pending.append(future)
+
+        with stage("save"):
+            for future in pending:
+                future.result()
+
+            comparison_data = pd.concat(comparison, axis=1)
+            comparison_data.columns = [
+                f"{scenario}_{column}" for (scenario, column) in comparison_data.columns
+            ]
+            comparison_data.insert(0, "ambiente", data["Ambiente"])
+
+            save_data(
+                results_folder,
+                save_format.value,
+                {"comparison": comparison_data},
+                settings["general"]["compression"],
+            )
+            progress.track_written(results_folder)
 
 
 @app.command(name="ach")
 def required_ach(
+    ctx: typer.Context,
     data_in: Annotated[
         Path,
         typer.Argument(
             exists=True,
-            help="Filepath where the data for analysis is stored. To know the required fields for the data, read the docs.",
+            allow_dash=True,
+            help="Filepath where the data for analysis is stored. To know the required fields for the data, read the docs. Use - to read newline-delimited JSON records from stdin and write the results to stdout.",
         ),
     ],
     max_risk: Annotated[
@@ -216,14 +729,35 @@ def required_ach(
     save_format: Annotated[
         SaveFormat,
         typer.Option(
-            help="Format for saving calculation results. Currently supperted: csv and xlsx",
+            help="Format for saving calculation results. Currently supperted: csv, xlsx, workbook, parquet, feather and sqlite",
         ),
     ] = SaveFormat(settings["general"]["save_format"]),
+    batch_size: Annotated[
+        int,
+        typer.Option(
+            min=1,
+            help="Number of records processed per batch when reading from stdin",
+        ),
+    ] = 100,
 ) -> None:
     """
     Make Required ACH calculations with custom parameters.
     """
-    (data, data_folder) = load_data(data_in)
+    from .settings.model import compile_settings
+    from .settings.model import cutoff_index
+    from .settings.model import mask_index
+    from .utils.io import load_data
+    from .utils.io import load_data_chunks
+    from .utils.io import make_results_folder
+    from .utils.io import save_data
+    from .utils.io import write_ndjson
+    from .utils.metrics import count_written
+    from .utils.profiling import report_to
+    from .utils.profiling import stage
+    from .utils.progress import StageProgress
+    from .utils.workers import make_executor
+
+    streaming = data_in == Path("-")
 
     # Checking options
     for percentage in inf_percent:
@@ -238,31 +772,51 @@ def required_ach(
                 "There cannot be less than zero people in a room right? ¯\\_(ツ)_/¯"
             )
 
-    # Making the calculations
-    for occupancy, percent in product(aforo, inf_percent):
-        data[f"ACH_{occupancy}_aforo_{percent}_inf"] = data.apply(
-            lambda x: ach_required(
-                x["Area"],
-                x["Altura"],
-                ceil(x["Aforo_100"] * 0.5),
-                x["Actividad"],
-                x["Permanencia"],
-                set_risk=max_risk / 100,
-                mask_type=(
-                    int(mask_type.name[-1])
-                    if mask_type != MaskType.i5
-                    else x["Mask Type"]
-                ),
-                inf_percent=percent,
-                viral_load=int(viral_load.value),
-                cutoff_type=int(aerosol.name[-1]),
-            ),
-            axis=1,
-        )
+    parameters = replace(
+        compile_settings(settings),
+        max_risk=max_risk / 100,
+        mask_type=mask_index(mask_type),
+        viral_load=int(viral_load.value),
+        cutoff_type=cutoff_index(aerosol),
+        inf_percent=tuple(inf_percent),
+        aforo=tuple(aforo),
+    )
 
-    if save:
+    if streaming:
+        batches = load_data_chunks(data_in, batch_size)
+    else:
+        (data, data_folder) = load_data(data_in)
+        batches = iter([data])
+
+    with make_executor(ctx.obj["jobs"]) as executor, StageProgress() as progress:
+        for data in batches:
+            # Making the calculations
+            data = run_stages(
+                data,
+                parameters,
+                executor,
+                ctx.obj["jobs"],
+                True,
+                False,
+                False,
+                progress=progress,
+            )["ach-ashrae"]
+
+            if streaming:
+                write_ndjson(data, sys.stdout)
+
+    if save and not streaming:
         results_folder = make_results_folder(data_folder)
-        save_data(results_folder, save_format.value, {"required_ach": data})
+        report_to(results_folder)
+        count_written(results_folder)
+
+        with stage("save"):
+            save_data(
+                results_folder,
+                save_format.value,
+                {"required_ach": data},
+                settings["general"]["compression"],
+            )
 
 
 @app.command()
@@ -271,7 +825,8 @@ def ashrae(
         Path,
         typer.Argument(
             exists=True,
-            help="Filepath where the data for analysis is stored. To know the required fields for the data, read the docs.",
+            allow_dash=True,
+            help="Filepath where the data for analysis is stored. To know the required fields for the data, read the docs. Use - to read newline-delimited JSON records from stdin and write the results to stdout.",
         ),
     ],
     aforo: Annotated[
@@ -284,14 +839,33 @@ def ashrae(
     save_format: Annotated[
         SaveFormat,
         typer.Option(
-            help="Format for saving calculation results. Currently supperted: csv and xlsx",
+            help="Format for saving calculation results. Currently supperted: csv, xlsx, workbook, parquet, feather and sqlite",
         ),
     ] = SaveFormat(settings["general"]["save_format"]),
+    batch_size: Annotated[
+        int,
+        typer.Option(
+            min=1,
+            help="Number of records processed per batch when reading from stdin",
+        ),
+    ] = 100,
 ) -> None:
     """
     Makes recommended flow calculations for analysis according to ASHRAE recomendations with custom parameters.
     """
-    (data, data_folder) = load_data(data_in)
+    from .lib.ashrae import ashrae_calculation
+    from .settings.model import compile_ashrae
+    from .utils.io import load_data
+    from .utils.io import load_data_chunks
+    from .utils.io import make_results_folder
+    from .utils.io import save_data
+    from .utils.io import write_ndjson
+    from .utils.metrics import count_written
+    from .utils.profiling import report_to
+    from .utils.profiling import stage
+
+    streaming = data_in == Path("-")
+    ashrae_rates = compile_ashrae(settings["ashrae"])
 
     for people in aforo:
         if people < 0:
@@ -299,21 +873,291 @@ def ashrae(
                 "There cannot be less than zero people in a room right? ¯\\_(ツ)_/¯"
             )
 
-    for occupancy in aforo:
-        data = ashrae_calculation(data, occupancy, settings["ashrae"])
+    if streaming:
+        batches = load_data_chunks(data_in, batch_size)
+    else:
+        (data, data_folder) = load_data(data_in)
+        batches = iter([data])
 
-    if save:
+    for data in batches:
+        with stage("ashrae"):
+            for occupancy in aforo:
+                data = ashrae_calculation(data, occupancy, ashrae_rates)
+
+        if streaming:
+            write_ndjson(data, sys.stdout)
+
+    if save and not streaming:
+        results_folder = make_results_folder(data_folder)
+        report_to(results_folder)
+        count_written(results_folder)
+
+        with stage("save"):
+            save_data(
+                results_folder,
+                save_format.value,
+                {"required_ventilation": data},
+                settings["general"]["compression"],
+            )
+
+
+@app.command(name="co2-ach")
+def co2_ach(
+    data_in: Annotated[
+        Path,
+        typer.Argument(
+            exists=True,
+            allow_dash=True,
+            help="Filepath where the data for analysis is stored. To know the required fields for the data, read the docs. Use - to read newline-delimited JSON records from stdin and write the results to stdout.",
+        ),
+    ],
+    max_co2: Annotated[
+        float,
+        typer.Option(
+            min=0,
+            help="Maximum CO2 concentration acceptable during the permanence, in ppm",
+        ),
+    ] = settings["ach"]["max_co2"],
+    outside_air: Annotated[
+        float,
+        typer.Option(
+            min=0,
+            max=100,
+            help="Percentage of outdoor air in the supply. Only outdoor air lowers the CO2",
+        ),
+    ] = settings["ach"]["outside_air"],
+    occupancy: Annotated[
+        OccupancyType,
+        typer.Option(
+            help="Occupancy over the permanence. Options: constant, gaussian",
+        ),
+    ] = OccupancyType.i0,
+    aforo: Annotated[
+        list[float], typer.Option(help="Percentages to calculate occupancy")
+    ] = settings["general"]["aforo"],
+    save: Annotated[
+        bool,
+        typer.Option(help="Save results to files for analysis"),
+    ] = settings["general"]["save"],
+    save_format: Annotated[
+        SaveFormat,
+        typer.Option(
+            help="Format for saving calculation results. Currently supperted: csv, xlsx, workbook, parquet, feather and sqlite",
+        ),
+    ] = SaveFormat(settings["general"]["save_format"]),
+    batch_size: Annotated[
+        int,
+        typer.Option(
+            min=1,
+            help="Number of records processed per batch when reading from stdin",
+        ),
+    ] = 100,
+) -> None:
+    """
+    Makes required ACH calculations to keep CO2 below a maximum concentration.
+    """
+    from .lib.co2 import co2_ach_calculation
+    from .settings.model import occupancy_index
+    from .utils.io import load_data
+    from .utils.io import load_data_chunks
+    from .utils.io import make_results_folder
+    from .utils.io import save_data
+    from .utils.io import write_ndjson
+    from .utils.metrics import count_written
+    from .utils.profiling import report_to
+    from .utils.profiling import stage
+
+    streaming = data_in == Path("-")
+
+    for people in aforo:
+        if people < 0:
+            raise ValueError(
+                "There cannot be less than zero people in a room right? ¯\\_(ツ)_/¯"
+            )
+
+    if streaming:
+        batches = load_data_chunks(data_in, batch_size)
+    else:
+        (data, data_folder) = load_data(data_in)
+        batches = iter([data])
+
+    for data in batches:
+        with stage("co2"):
+            for occupancy_perc in aforo:
+                data = co2_ach_calculation(
+                    data,
+                    occupancy_perc,
+                    max_co2,
+                    outside_air,
+                    occupancy_index(occupancy),
+                )
+
+        if streaming:
+            write_ndjson(data, sys.stdout)
+
+    if save and not streaming:
         results_folder = make_results_folder(data_folder)
-        save_data(results_folder, save_format.value, {"required_ventilation": data})
+        report_to(results_folder)
+        count_written(results_folder)
+
+        with stage("save"):
+            save_data(
+                results_folder,
+                save_format.value,
+                {"required_co2_ach": data},
+                settings["general"]["compression"],
+            )
+
+
+@app.command(name="occupancy")
+def safe_occupancy(
+    data_in: Annotated[
+        Path,
+        typer.Argument(
+            exists=True,
+            allow_dash=True,
+            help="Filepath where the data for analysis is stored. To know the required fields for the data, read the docs. Use - to read newline-delimited JSON records from stdin and write the results to stdout.",
+        ),
+    ],
+    ach: Annotated[
+        Optional[float],
+        typer.Option(
+            min=0,
+            help="ACH of every room. Defaults to the ACH_natural column of the data",
+        ),
+    ] = None,
+    max_risk: Annotated[
+        float,
+        typer.Option(
+            min=0,
+            max=100,
+            help="Maximum risk acceptable for calculation",
+        ),
+    ] = settings["ach"]["max_risk"],
+    mask_type: Annotated[
+        MaskType,
+        typer.Option(
+            help="Mask type considered for occupants. Options: No mask, KN95, surgical, 3-ply cloth, 1-ply cloth, on_file",
+        ),
+    ] = MaskType(settings["ach"]["mask_default"]),
+    inf_percent: Annotated[
+        list[float],
+        typer.Option(
+            help="Percentages of infected people to evaluate",
+        ),
+    ] = settings["ach"]["inf_percent"],
+    viral_load: Annotated[
+        ViralLoad,
+        typer.Option(
+            help="Viral load considered. Options: 8, 9, 10",
+        ),
+    ] = ViralLoad(settings["ach"]["viral_load"]),
+    aerosol: Annotated[
+        AerosolCutoff,
+        typer.Option(
+            help="Maximum size of particles considered aerosol",
+        ),
+    ] = AerosolCutoff(settings["general"]["default_aerosol"]),
+    save: Annotated[
+        bool,
+        typer.Option(help="Save results to files for analysis"),
+    ] = settings["general"]["save"],
+    save_format: Annotated[
+        SaveFormat,
+        typer.Option(
+            help="Format for saving calculation results. Currently supperted: csv, xlsx, workbook, parquet, feather and sqlite",
+        ),
+    ] = SaveFormat(settings["general"]["save_format"]),
+    batch_size: Annotated[
+        int,
+        typer.Option(
+            min=1,
+            help="Number of records processed per batch when reading from stdin",
+        ),
+    ] = 100,
+) -> None:
+    """
+    Calculates the maximum occupancy of every room that keeps the risk of infection below the maximum, with its risk and CO2.
+    """
+    from .lib.ach import max_occupancy
+    from .settings.model import cutoff_index
+    from .settings.model import mask_index
+    from .utils.io import load_data
+    from .utils.io import load_data_chunks
+    from .utils.io import make_results_folder
+    from .utils.io import save_data
+    from .utils.io import write_ndjson
+    from .utils.metrics import count_written
+    from .utils.profiling import report_to
+    from .utils.profiling import stage
+
+    streaming = data_in == Path("-")
+
+    for percentage in inf_percent:
+        if (percentage < 0) or (percentage > 100):
+            raise ValueError(f"{percentage} is not on the 0% to 100% range")
+
+    if streaming:
+        batches = load_data_chunks(data_in, batch_size)
+    else:
+        (data, data_folder) = load_data(data_in)
+        batches = iter([data])
+
+    for data in batches:
+        if ach is None and "ACH_natural" not in data.columns:
+            raise ValueError(
+                "[bold red]Alert![/bold red] Set --ach or add an ACH_natural column to the data"
+            )
+
+        mask = mask_index(mask_type)
+
+        with stage("occupancy"):
+            for percentage in inf_percent:
+                results = max_occupancy(
+                    data["Area"].to_numpy(dtype=float),
+                    data["Altura"].to_numpy(dtype=float),
+                    data["Actividad"].to_numpy(dtype=int),
+                    data["Permanencia"].to_numpy(dtype=float),
+                    data["ACH_natural"].to_numpy(dtype=float) if ach is None else ach,
+                    set_risk=max_risk / 100,
+                    mask_type=(
+                        data["Mask Type"].to_numpy(dtype=int) if mask is None else mask
+                    ),
+                    inf_percent=percentage,
+                    viral_load=int(viral_load.value),
+                    cutoff_type=cutoff_index(aerosol),
+                )
+
+                data[f"Aforo_max_{percentage}_inf"] = results["aforo"]
+                data[f"riesgo_aforo_max_{percentage}_inf"] = results["riesgo"]
+                data[f"co2_aforo_max_{percentage}_inf"] = results["co2"]
+
+        if streaming:
+            write_ndjson(data, sys.stdout)
+
+    if save and not streaming:
+        results_folder = make_results_folder(data_folder)
+        report_to(results_folder)
+        count_written(results_folder)
+
+        with stage("save"):
+            save_data(
+                results_folder,
+                save_format.value,
+                {"max_occupancy": data},
+                settings["general"]["compression"],
+            )
 
 
 @app.command(name="risk")
 def risk_analysis(
+    ctx: typer.Context,
     data_in: Annotated[
         Path,
         typer.Argument(
             exists=True,
-            help="Filepath where the data for analysis is stored. To know the required fields for the data, read the docs.",
+            allow_dash=True,
+            help="Filepath where the data for analysis is stored. To know the required fields for the data, read the docs. Use - to read newline-delimited JSON records from stdin and write the results to stdout.",
         ),
     ],
     risk_inf: Annotated[
@@ -328,6 +1172,12 @@ def risk_analysis(
             help="Make risk calculations for different aerosol cutoff values",
         ),
     ] = settings["risk"]["risk_aerosol"],
+    risk_co2: Annotated[
+        bool,
+        typer.Option(
+            help="Make risk and CO2 calculations for different occupancies, with the CO2 concentration at the maximum risk",
+        ),
+    ] = settings["risk"]["risk_co2"],
     graphics: Annotated[
         bool,
         typer.Option(
@@ -347,53 +1197,361 @@ def risk_analysis(
     save_format: Annotated[
         SaveFormat,
         typer.Option(
-            help="Format for saving calculation results. Currently supperted: csv and xlsx",
+            help="Format for saving calculation results. Currently supperted: csv, xlsx, workbook, parquet, feather and sqlite",
         ),
     ] = SaveFormat(settings["general"]["save_format"]),
+    batch_size: Annotated[
+        int,
+        typer.Option(
+            min=1,
+            help="Number of records processed per batch when reading from stdin",
+        ),
+    ] = 100,
 ) -> None:  # noqa: C901
     """
     Perform risk analysis calculations and graphics.
     """
-    (data, data_folder) = load_data(data_in)
-    if save or save_graphics:
-        results_folder = make_results_folder(data_folder)
+    from .lib.graphics import risk_ach_aerosol_graph
+    from .lib.graphics import risk_ach_inf_graph
+    from .lib.risk import ach_risk_aerosol_calculation
+    from .lib.risk import ach_risk_co2_calculation
+    from .lib.risk import ach_risk_inf_percent_calculation
+    from .lib.risk import sweep_simulations
+    from .utils.io import graphics_output
+    from .utils.io import load_data
+    from .utils.io import load_data_chunks
+    from .utils.io import make_results_folder
+    from .utils.io import save_data
+    from .utils.io import write_ndjson
+    from .utils.metrics import count_written
+    from .utils.metrics import increment
+    from .utils.profiling import report_to
+    from .utils.profiling import stage
+    from .utils.progress import StageProgress
+    from .utils.workers import chunk_sizes
+    from .utils.workers import gather_chunks
+    from .utils.workers import make_executor
+    from .utils.workers import stage_parts
+    from .utils.workers import submit_chunks
 
-    risk_results = {}
+    streaming = data_in == Path("-")
 
-    if risk_inf:
-        risk_results["risk_ach_inf_data"] = ach_risk_inf_percent_calculation(
-            data, settings["ach"]["inf_percent"]
-        )
+    if streaming:
+        batches = load_data_chunks(data_in, batch_size)
+    else:
+        (data, data_folder) = load_data(data_in)
+        batches = iter([data])
+
+        if save or save_graphics:
+            results_folder = make_results_folder(data_folder)
+            report_to(results_folder)
+            count_written(results_folder)
 
-    if risk_aerosol:
-        risk_results["risk_ach_aerosol_data"] = ach_risk_aerosol_calculation(
-            data, settings["ach"]["aerosol"]
+    with make_executor(ctx.obj["jobs"]) as executor, StageProgress() as progress:
+        for data in batches:
+            with stage("risk"):
+                pending = {}
+                parts = stage_parts(ctx.obj["jobs"])
+                sizes = chunk_sizes(data, parts)
+
+                if risk_inf:
+                    pending["risk_ach_inf_data"] = progress.track(
+                        "Rooms swept",
+                        submit_chunks(
+                            executor,
+                            ach_risk_inf_percent_calculation,
+                            data,
+                            parts,
+                            settings["ach"]["inf_percent"],
+                        ),
+                        sizes,
+                    )
+
+                if risk_aerosol:
+                    pending["risk_ach_aerosol_data"] = progress.track(
+                        "Rooms swept",
+                        submit_chunks(
+                            executor,
+                            ach_risk_aerosol_calculation,
+                            data,
+                            parts,
+                            settings["ach"]["aerosol"],
+                        ),
+                        sizes,
+                    )
+
+                if risk_co2:
+                    pending["risk_ach_co2_data"] = progress.track(
+                        "Rooms swept",
+                        submit_chunks(
+                            executor,
+                            ach_risk_co2_calculation,
+                            data,
+                            parts,
+                            float(settings["ach"]["max_risk"]) / 100,
+                        ),
+                        sizes,
+                    )
+
+                risk_results = {
+                    name: gather_chunks(futures) for (name, futures) in pending.items()
+                }
+
+            for result in risk_results.values():
+                increment("airborne_simulations_total", sweep_simulations(result))
+
+            if streaming:
+                for name, result in risk_results.items():
+                    write_ndjson(result.assign(result=name), sys.stdout)
+
+        if streaming:
+            return
+
+        # Making graphics
+        with stage("graphics"):
+            graphic_results = {}
+            exports = []
+
+            if graphics:
+                if risk_inf:
+                    graphic_results["risk_ach_inf_graphics"] = risk_ach_inf_graph(
+                        risk_results["risk_ach_inf_data"],
+                        settings["graphics"]["color_scheme"],
+                    )
+                if risk_aerosol:
+                    graphic_results[
+                        "risk_ach_aerosol_graphics"
+                    ] = risk_ach_aerosol_graph(
+                        risk_results["risk_ach_aerosol_data"],
+                        settings["graphics"]["color_scheme"],
+                    )
+
+                if save_graphics:
+                    exports = progress.track(
+                        "Figures exported",
+                        graphics_output(results_folder, graphic_results, executor),
+                    )
+                else:
+                    for graphic_result_batch in graphic_results.values():
+                        for graph in graphic_result_batch.values():
+                            graph.show()
+
+            for future in exports:
+                future.result()
+
+    # Saving data
+    if save:
+        with stage("save"):
+            save_data(
+                results_folder,
+                save_format.value,
+                risk_results,
+                settings["general"]["compression"],
+            )
+
+
+@app.command()
+def bench(
+    sizes: Annotated[
+        list[int],
+        typer.Option(
+            "--size",
+            min=1,
+            help="Number of rooms of a synthetic inventory, can be repeated",
+        ),
+    ] = [10, 100, 1_000, 10_000, 100_000],
+    benchmarks: Annotated[
+        Optional[list[str]],
+        typer.Option(
+            "--benchmark",
+            help="Benchmark to run, can be repeated. Defaults to all of them: room_calculation, ach_required, risk_sweep_inf, risk_sweep_aerosol, ashrae_calculation, load_data_csv, load_data_parquet, save_data_csv, save_data_parquet, round_trip_csv, round_trip_parquet and figure_export. With --suite, the cases of the suite: single_simulation, ach_solve, risk_sweep_1k, ashrae_100k, round_trip_csv_100k and round_trip_parquet_100k",
+        ),
+    ] = None,
+    sample: Annotated[
+        int,
+        typer.Option(
+            min=1,
+            help="Rooms timed for the per room engines, their time is scaled to each inventory size",
+        ),
+    ] = 5,
+    repeat: Annotated[
+        int,
+        typer.Option(
+            min=1,
+            help="Runs of the whole inventory benchmarks, the fastest one is reported",
+        ),
+    ] = 3,
+    seed: Annotated[int, typer.Option(help="Seed of the synthetic inventories")] = 0,
+    output: Annotated[
+        Optional[Path],
+        typer.Option(help="Save the results to this JSON file"),
+    ] = None,
+    suite: Annotated[
+        bool,
+        typer.Option(
+            "--suite",
+            help="Run the regression suite instead of the inventory sizes: a single simulation, an ACH solve, a risk sweep of 1k rooms, ASHRAE over 100k rooms and .csv and .parquet round trips of 100k rooms",
+        ),
+    ] = False,
+    baseline: Annotated[
+        Optional[Path],
+        typer.Option(
+            exists=True,
+            dir_okay=False,
+            help="Compare the results with a JSON file saved with --output, failing when a benchmark is slower than the threshold",
+        ),
+    ] = None,
+    threshold: Annotated[
+        float,
+        typer.Option(min=0, help="Slowdown over the baseline allowed, in percent"),
+    ] = 20,
+) -> None:
+    """
+    Benchmarks the engines, input/output and figure export over synthetic room inventories.
+    Prints a table of seconds per inventory size and optionally saves the results as JSON to compare releases and size hardware.
+    With --baseline, fails when a benchmark got slower than a saved run.
+    """
+    import json
+
+    from rich.console import Console
+
+    from .lib.bench import BENCHMARKS
+    from .lib.bench import SUITE
+    from .lib.bench import compare_baseline
+    from .lib.bench import comparison_table
+    from .lib.bench import results_report
+    from .lib.bench import results_table
+    from .lib.bench import run_benchmarks
+    from .lib.bench import run_suite
+    from .settings.model import compile_settings
+    from .utils.progress import StageProgress
+
+    available = SUITE if suite else BENCHMARKS
+
+    if benchmarks is None:
+        benchmarks = list(available)
+
+    unknown = [name for name in benchmarks if name not in available]
+    if unknown:
+        raise ValueError(
+            f"[bold red]Alert![/bold red] Unknown benchmarks {', '.join(unknown)}. Available: {', '.join(available)}"
         )
 
-    # Making graphics
-    graphic_results = {}
+    with StageProgress() as progress:
+        if suite:
+            progress.expect("Benchmarks timed", len(benchmarks))
 
-    if graphics:
-        if risk_inf:
-            graphic_results["risk_ach_inf_graphics"] = risk_ach_inf_graph(
-                risk_results["risk_ach_inf_data"], settings["graphics"]["color_scheme"]
+            results = run_suite(
+                benchmarks,
+                compile_settings(settings),
+                on_result=lambda _: progress.advance("Benchmarks timed"),
             )
-        if risk_aerosol:
-            graphic_results["risk_ach_aerosol_graphics"] = risk_ach_aerosol_graph(
-                risk_results["risk_ach_aerosol_data"],
-                settings["graphics"]["color_scheme"],
+        else:
+            progress.expect("Benchmarks timed", len(benchmarks) * len(sizes))
+
+            results = run_benchmarks(
+                sizes,
+                benchmarks,
+                compile_settings(settings),
+                sample=sample,
+                repeat=repeat,
+                seed=seed,
+                on_result=lambda _: progress.advance("Benchmarks timed"),
             )
 
-        if save_graphics:
-            graphics_output(results_folder, graphic_results)
-        else:
-            for graphic_result_batch in graphic_results:
-                for graph in graphic_result_batch.values():
-                    graph.show()
+    if output is not None:
+        output.write_text(
+            json.dumps(results_report(results), indent=2), encoding="utf-8"
+        )
 
-    # Saving data
-    if save:
-        save_data(data_folder, save_format.value, risk_results)
+    if baseline is None:
+        Console().print(results_table(results))
+        return
+
+    comparisons = compare_baseline(
+        results,
+        json.loads(baseline.read_text(encoding="utf-8")),
+        threshold / 100,
+    )
+    Console().print(comparison_table(comparisons))
+
+    regressed = [
+        comparison.benchmark for comparison in comparisons if comparison.regressed
+    ]
+    if regressed:
+        raise ValueError(
+            f"[bold red]Alert![/bold red] {', '.join(regressed)} slower than the baseline by more than {threshold:g}%"
+        )
+
+
+@app.command()
+def query(
+    database: Annotated[
+        Path,
+        typer.Argument(
+            exists=True,
+            help="SQLite database written with the sqlite save format",
+        ),
+    ],
+    pabellon: Annotated[
+        Optional[str], typer.Option(help="Only rooms of this pavilion")
+    ] = None,
+    ambiente: Annotated[Optional[str], typer.Option(help="Only this room")] = None,
+    analysis: Annotated[
+        Optional[RiskAnalysis],
+        typer.Option(
+            help="Only risk sweeps for infected percentages or aerosol cutoffs"
+        ),
+    ] = None,
+    parameter: Annotated[
+        Optional[float],
+        typer.Option(help="Only this percentage of infected people or aerosol cutoff"),
+    ] = None,
+    occupancy: Annotated[
+        Optional[float], typer.Option(help="Only this occupancy percentage")
+    ] = None,
+    min_ach: Annotated[
+        Optional[float], typer.Option(help="Only ACH greater or equal than this")
+    ] = None,
+    max_ach: Annotated[
+        Optional[float], typer.Option(help="Only ACH lower than this")
+    ] = None,
+    min_risk: Annotated[
+        Optional[float],
+        typer.Option(min=0, max=100, help="Only risks over this percentage"),
+    ] = None,
+) -> None:
+    """
+    Looks up stored risk results, for example the rooms of a pavilion over 3% risk at 50% occupancy below 6 ACH. Rows are written to the console as CSV as they are read.
+    """
+    from .utils.store import query_results
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(
+        [
+            "pabellon",
+            "ambiente",
+            "analysis",
+            "parameter",
+            "occupancy",
+            "ach",
+            "aforo",
+            "riesgo",
+        ]
+    )
+
+    for row in query_results(
+        database,
+        pabellon=pabellon,
+        ambiente=ambiente,
+        analysis=analysis.value if analysis is not None else None,
+        parameter=parameter,
+        occupancy=occupancy,
+        min_ach=min_ach,
+        max_ach=max_ach,
+        min_risk=min_risk / 100 if min_risk is not None else None,
+    ):
+        writer.writerow(row)
 
 
 # @app.command(name="dash")
@@ -1,10 +1,71 @@
+from dataclasses import dataclass
+from dataclasses import fields
 from math import ceil
 from math import exp
 
 import numpy as np
+import numpy.typing as npt
 import pandas as pd
 
 
+# ACH added by the solver of `ach_required` on each iteration
+ACH_STEP = 0.1
+# ACH of the modes set at the interface, the last one (6) is replaced by a custom value
+ACH_PRESETS = [0.3, 1, 3, 5, 10, 20, 999]
+# Time steps the models are integrated over, whatever the permanence
+TIME_STEPS = 400
+# Risk is p(N_vs) = 1-exp(-N_vs/riskConst);
+RISK_CONSTANT = 410  # ... constant for risk estimation, PFU
+# People per square meter of a standing crowd, the most `max_occupancy` allows
+MAX_DENSITY = 4
+# Define background CO2 (hope this does not change a lot...)
+CO2_BACKGROUND = 415  # ... CO2 outdoors, ppm
+
+
+@dataclass(frozen=True)
+class RoomModel:
+    """Rates of the airborne transmission model of a room, or arrays of them for a batch of rooms."""
+
+    volume: float | npt.NDArray[np.float64]  # ... room volume, m^3
+    emission: float | npt.NDArray[
+        np.float64
+    ]  # ... effective aerosol emission rate per infected person, PFU/s
+    inhalation: float | npt.NDArray[np.float64]  # ... actual inhalation rate, m3/s
+    loss_rate: float | npt.NDArray[
+        np.float64
+    ]  # ... ventilation, filtration, settling and decay, 1/s
+
+
+@dataclass(frozen=True)
+class Co2Model:
+    """Rates of the CO2 model of a room, or arrays of them for a batch of rooms."""
+
+    volume: float | npt.NDArray[np.float64]  # ... room volume, m^3
+    emission: float | npt.NDArray[
+        np.float64
+    ]  # ... CO2 emission rate per person, scaled to ppm, m3/s
+    loss_rate: float | npt.NDArray[np.float64]  # ... outdoor air supply, 1/s
+
+
+@dataclass(frozen=True)
+class RoomResult:
+    """Occupancy, risk of infection and CO2 of a room at the end of every time step."""
+
+    time: np.ndarray  # ... start of the step, s
+    people: np.ndarray
+    infected: np.ndarray
+    virus_concentration: np.ndarray  # ... PFU/m3
+    inhaled_virus: np.ndarray  # ... PFU
+    risk: np.ndarray
+    co2: np.ndarray  # ... ppm
+
+    def to_frame(self) -> pd.DataFrame:
+        """Returns the result with a column per field, as `room_calculation` and `co2_concentration` do."""
+        return pd.DataFrame(
+            {field.name: getattr(self, field.name) for field in fields(self)}
+        )
+
+
 def infected_people(people: int, percent: float, infmin: int, toggle_inf: bool) -> int:
     """Returns the number of infected people for a certain population.
 
@@ -64,11 +125,10 @@ def people_inst(
     return {"people": people, "infected": infected}
 
 
-def room_calculation(
+def room_model(
     Ar: float = 100,
     Hr: float = 3,
     s_ACH_type: int = 6,
-    n_people: int = 10,
     Vli: int = 10,
     mask_type: int = 1,
     activity_type: int = 0,
@@ -76,40 +136,15 @@ def room_calculation(
     activity_type_sick: int = 0,
     cutoff_type: int = 3,
     verticalv_type: int = 0,
-    permanence: float = 120,
     ACH_custom: float = 20,
-    inf_checked: bool = True,
-    inf_percent: float = 10,
-    inf_min: int = 1,
-    occupancy_type: int = 0,
     s_filter_type: int = 0,
     outside_air: int = 100,
-) -> pd.DataFrame:
-    """Returns a tuple containing data of the risk of infection.
-
-    Args:
-        Ar (int, optional): Area of the room. Defaults to 100.
-        Hr (int, optional): Height of the room. Defaults to 3.
-        s_ACH_type (int, optional): Selection of type of ACH. Defaults to 6 which means custom.
-        inf_percent (int, optional): Percentage of infected people. Defaults to 20.
-        inf_min (int, optional): Minimum of infected people. Defaults to 1.
-        n_people (int, optional): Number of people in the room. Defaults to 10.
-        Vli (int, optional): Viral load considered. Defaults to 10.
-        mask_type (int, optional): Type of mask to select from list. Defaults to 1 which corresponds to KN95.
-        activity_type (int, optional): [description]. Defaults to 0.
-        mask_type_sick (int, optional): [description]. Defaults to 1 which corresponds to KN95.
-        activity_type_sick (int, optional): Activity type to select on list. Defaults to 0 which corresponds to sedentary activity.
-        cutoff_type (int, optional): [description]. Defaults to 3.
-        verticalv_type (int, optional): [description]. Defaults to 0.
-        occupancy_type (int, optional): [description]. Defaults to 0.
-        permanence (int, optional): Time of permanence in the room in minutes. Defaults to 60.
-        ACH_custom (int, optional): Custom value of ACH. Defaults to 1.
-        s_filter_type (int, optional): [description]. Defaults to 0.
-        outside_air (int, optional): [description]. Defaults to 100.
-        inf_checked (bool, optional): Whether the infected percentage toggle is active. Defaults to True.
+) -> RoomModel:
+    """Derives the rates of the airborne transmission model of a room from its options. Takes the options of `room_calculation` that don't depend on time.
+    Area, height, masks, activities, outside air and custom ACH can also be arrays that broadcast together, to derive the rates of a batch of rooms.
 
     Returns:
-        pd.DataFrame: Dataframe with columns for time, risk, inhalation rate, virus concentration, infected people and people over time
+        RoomModel: Volume, emission, inhalation and loss rates of the room
     """
     #   Filter in the ventilation system based on the modes set at the interface
     #   These values of filter efficiency need changing according to
@@ -213,8 +248,7 @@ def room_calculation(
     # The above filter applies only to recirculated air. Outside air varies between 0--100% (variable is outsideAir)
 
     # Sets ACH based on the modes set at the interface
-    sACH = [0.3, 1, 3, 5, 10, 20, 999]
-    ACH = ACH_custom if s_ACH_type == 6 else sACH[s_ACH_type]
+    ACH = ACH_custom if s_ACH_type == 6 else ACH_PRESETS[s_ACH_type]
 
     # Decay rates
     # First five values are for zero vertical velocity and last five values are for 0.1 m/s upward vertical velocity
@@ -246,11 +280,13 @@ def room_calculation(
     # IR = 1.38 m3/h : <light exercise, unmodulated vocalization> or <light exercise, voiced counting>
     # IR = 3.3 m3/h : <heavy exercise, oral breathing>
     # in Activity_type_inh we I take ratios of IR but we keep the inhRate_pure the same as a reference
-    Activity_type_inh = [
-        1,
-        2.5556,
-        6.1111,
-    ]  # multiplier for inhalation rate based on activity.
+    Activity_type_inh = np.array(
+        [
+            1,
+            2.5556,
+            6.1111,
+        ]
+    )  # multiplier for inhalation rate based on activity.
 
     # Base value for exhalation rate
     # exhRate_pure = (
@@ -258,17 +294,19 @@ def room_calculation(
     # )
 
     # Activity multiplier applied to Ngen based on similar analysis with inhalation
-    Activity_type_Ngen = [
-        1,
-        2.5556,
-        6.1111,
-    ]  # multiplier for exhalation rate based on activity.
+    Activity_type_Ngen = np.array(
+        [
+            1,
+            2.5556,
+            6.1111,
+        ]
+    )  # multiplier for exhalation rate based on activity.
 
     # Multiplier based on mask efficiency
     # No mask, N95, surgical and 3-ply cloth [medrxiv.org/content/10.1101/2020.10.05.20207241v1]
     # 90% for N95 for safety (see manual)
     # 1- ply cloth REF???
-    Mask_type = [0, 0.9, 0.59, 0.51, 0.35]
+    Mask_type = np.array([0, 0.9, 0.59, 0.51, 0.35])
 
     # Conversions with applications of mask and activity to inhalation rate and CO2 emission
     # *** the exhalation equivalent for the virus is being accounted for in N_r
@@ -301,9 +339,6 @@ def room_calculation(
         10 ** Vl[Vli] * base_N_r * (1 - Mask_type[mask_type_sick])
     )  # ... effective aerosol emission rate, PFU/s
 
-    # Risk is p(N_vs) = 1-exp(-N_vs/riskConst);
-    risk = 410  # ... constant for risk estimation, PFU
-
     # Additional variables
     V = Ar * Hr  # ... room volume, m^3
 
@@ -319,114 +354,226 @@ def room_calculation(
 
     loss_rate = vent_fresh + steril_rate + kappa + delta
 
+    return RoomModel(volume=V, emission=N_r, inhalation=inhRate, loss_rate=loss_rate)
+
+
+def time_grid(permanence: float) -> tuple[np.ndarray, float]:
+    """Returns the time steps the models are integrated over.
+
+    Args:
+        permanence (float): Time of permanence in the room in minutes
+
+    Returns:
+        tuple[np.ndarray, float]: Start of every step and length of a step, in seconds
+    """
     # Find minimum and maximum time for each event in seconds
-    t0 = 0
     tMax = permanence * 60
 
     # Solver settings
     # dt = 0.5 * 60; # ... time increment, s
-    dt = tMax / 400  # ... time increment, s
-
-    # Initialisation
-    time_series = np.arange(start=t0, stop=tMax, step=dt)
-
-    result = pd.DataFrame(time_series, columns=["time"])
-
-    result["people"] = result["time"].apply(
-        lambda x: people_inst(
-            x["time"],
-            inf_percent,
-            inf_min,
-            n_people,
-            occupancy_type,
-            inf_checked,
-            tMax,
-        )["people"]
-    )
+    dt = tMax / TIME_STEPS  # ... time increment, s
 
-    result["infected"] = result["time"].apply(
-        lambda x: people_inst(
-            x["time"],
-            inf_percent,
-            inf_min,
-            n_people,
-            occupancy_type,
-            inf_checked,
-            tMax,
-        )["infected"]
-    )
+    # Steps are counted rather than stepped up to tMax, rounding added a step past it for some permanences
+    return (np.arange(TIME_STEPS) * dt, dt)
 
-    result["virus_concentration"] = (result["infected"] * N_r) / (V * loss_rate) + (
-        result["virus_concentration"].shift(1)
-        - (result["infected"] * N_r) / (V * loss_rate)
-    ) * exp(-loss_rate * dt)
 
-    result["inhaled_virus"] = (
-        result["inhaled_virus"].shift(1) + inhRate * dt * result["virus_concentration"]
-    )
+def occupancy(
+    time: np.ndarray,
+    n_people: npt.ArrayLike,
+    occupancy_type: npt.ArrayLike,
+    permanence: npt.ArrayLike,
+) -> np.ndarray:
+    """Calculates people over time for one or many rooms, as `people_inst` does for a time.
 
-    result["risk"] = result.apply(lambda x: 1 - exp(-x["inhaled_virus"] / risk))
+    Args:
+        time (np.ndarray): Time steps in seconds, with the steps as last axis
+        n_people (npt.ArrayLike): Number of people in each room
+        occupancy_type (npt.ArrayLike): Whether it's a constant occupancy (0) or a Gaussian distribution (1)
+        permanence (npt.ArrayLike): Time of permanence in seconds
 
-    # Final result
-    return result
+    Returns:
+        np.ndarray: People at every time step, the shape of the room arguments with the steps as last axis. When every room has a constant occupancy the last axis has a single step
+    """
+    n_people = np.asarray(n_people, dtype=float)[..., None]
+    constant = np.asarray(occupancy_type)[..., None] == 0
 
+    if np.all(constant):
+        return n_people
 
-def co2_concentration(
+    b = np.asarray(permanence, dtype=float)[..., None] / 2
+    c = np.asarray(permanence, dtype=float)[..., None] / 6
+
+    gaussian = n_people * np.exp(-((time - b) ** 2) / ((2 * c) ** 2))
+
+    return np.where(constant, n_people, gaussian)
+
+
+def room_calculation(
     Ar: float = 100,
     Hr: float = 3,
-    inf_percent: float = 10,
-    inf_min: int = 1,
+    s_ACH_type: int = 6,
     n_people: int = 10,
-    occupancy_type: int = 0,
-    inf_checked: bool = True,
+    Vli: int = 10,
+    mask_type: int = 1,
     activity_type: int = 0,
-    outside_air: int = 100,
+    mask_type_sick: int = 1,
+    activity_type_sick: int = 0,
+    cutoff_type: int = 3,
+    verticalv_type: int = 0,
     permanence: float = 120,
     ACH_custom: float = 20,
-    s_ACH_type: int = 6,
+    inf_checked: bool = True,
+    inf_percent: float = 10,
+    inf_min: int = 1,
+    occupancy_type: int = 0,
+    s_filter_type: int = 0,
+    outside_air: int = 100,
 ) -> pd.DataFrame:
-    """Calculates the conentration of CO2 in the room over time
+    """Returns a tuple containing data of the risk of infection.
 
     Args:
         Ar (int, optional): Area of the room. Defaults to 100.
         Hr (int, optional): Height of the room. Defaults to 3.
+        s_ACH_type (int, optional): Selection of type of ACH. Defaults to 6 which means custom.
         inf_percent (int, optional): Percentage of infected people. Defaults to 20.
         inf_min (int, optional): Minimum of infected people. Defaults to 1.
         n_people (int, optional): Number of people in the room. Defaults to 10.
-        occupancy_type (int, optional): [description]. Defaults to 0.
-        inf_checked (bool, optional): Whether the infected percentage toggle is active. Defaults to True.
+        Vli (int, optional): Viral load considered. Defaults to 10.
+        mask_type (int, optional): Type of mask to select from list. Defaults to 1 which corresponds to KN95.
         activity_type (int, optional): [description]. Defaults to 0.
-        outside_air (int, optional): [description]. Defaults to 100.
+        mask_type_sick (int, optional): [description]. Defaults to 1 which corresponds to KN95.
+        activity_type_sick (int, optional): Activity type to select on list. Defaults to 0 which corresponds to sedentary activity.
+        cutoff_type (int, optional): [description]. Defaults to 3.
+        verticalv_type (int, optional): [description]. Defaults to 0.
+        occupancy_type (int, optional): [description]. Defaults to 0.
         permanence (int, optional): Time of permanence in the room in minutes. Defaults to 60.
         ACH_custom (int, optional): Custom value of ACH. Defaults to 1.
-        s_ACH_type (int, optional): Selection of type of ACH. Defaults to 6 which means custom.
+        s_filter_type (int, optional): [description]. Defaults to 0.
+        outside_air (int, optional): [description]. Defaults to 100.
+        inf_checked (bool, optional): Whether the infected percentage toggle is active. Defaults to True.
 
     Returns:
-        pd.DataFrame: DataFrame with the columns of people over time and concentration of CO2
+        pd.DataFrame: Dataframe with columns for time, risk, inhalation rate, virus concentration, infected people and people over time
     """
-    t0 = 0
-    tMax = permanence * 60
-    dt = tMax / 400  # ... time increment, s
-    time_series = np.arange(start=t0, stop=tMax, step=dt).tolist()
+    model = room_model(
+        Ar=Ar,
+        Hr=Hr,
+        s_ACH_type=s_ACH_type,
+        Vli=Vli,
+        mask_type=mask_type,
+        activity_type=activity_type,
+        mask_type_sick=mask_type_sick,
+        activity_type_sick=activity_type_sick,
+        cutoff_type=cutoff_type,
+        verticalv_type=verticalv_type,
+        ACH_custom=ACH_custom,
+        s_filter_type=s_filter_type,
+        outside_air=outside_air,
+    )
 
-    V = Ar * Hr  # ... room volume, m^3
+    (time_series, dt) = time_grid(permanence)
+    people = occupancy(time_series, n_people, occupancy_type, permanence * 60)
+    infected = infected_over_time(people, inf_percent, inf_min, inf_checked)
+
+    (virus_concentration, inhaled_virus, risk) = infection_series(infected, model, dt)
 
-    result = pd.DataFrame(time_series, columns=["time"])
-
-    result["n_people"] = result.apply(
-        lambda x: people_inst(
-            x["time"],
-            inf_percent,
-            inf_min,
-            n_people,
-            occupancy_type,
-            inf_checked,
-            tMax,
-        )["people"]
+    # Final result
+    return pd.DataFrame(
+        {
+            "time": time_series,
+            "people": np.broadcast_to(people, time_series.shape),
+            "infected": np.broadcast_to(infected, time_series.shape),
+            "virus_concentration": virus_concentration,
+            "inhaled_virus": inhaled_virus,
+            "risk": risk,
+        }
     )
 
-    # Define background CO2 (hope this does not change a lot...)
-    co2_background = 415  # ... CO2 outdoors, ppm
+
+def room_co2_calculation(
+    Ar: float = 100,
+    Hr: float = 3,
+    s_ACH_type: int = 6,
+    n_people: int = 10,
+    Vli: int = 10,
+    mask_type: int = 1,
+    activity_type: int = 0,
+    mask_type_sick: int = 1,
+    activity_type_sick: int = 0,
+    cutoff_type: int = 3,
+    verticalv_type: int = 0,
+    permanence: float = 120,
+    ACH_custom: float = 20,
+    inf_checked: bool = True,
+    inf_percent: float = 10,
+    inf_min: int = 1,
+    occupancy_type: int = 0,
+    s_filter_type: int = 0,
+    outside_air: int = 100,
+) -> RoomResult:
+    """Calculates the risk of infection and the concentration of CO2 in the room over time in a single pass.
+    The time grid, occupancy and ACH are worked out once for both, with the arguments of `room_calculation`.
+
+    Returns:
+        RoomResult: People, infected people, virus concentration, inhaled virus, risk and CO2 over time
+    """
+    # Sets ACH based on the modes set at the interface
+    ACH = ACH_custom if s_ACH_type == 6 else ACH_PRESETS[s_ACH_type]
+
+    model = room_model(
+        Ar=Ar,
+        Hr=Hr,
+        Vli=Vli,
+        mask_type=mask_type,
+        activity_type=activity_type,
+        mask_type_sick=mask_type_sick,
+        activity_type_sick=activity_type_sick,
+        cutoff_type=cutoff_type,
+        verticalv_type=verticalv_type,
+        ACH_custom=ACH,
+        s_filter_type=s_filter_type,
+        outside_air=outside_air,
+    )
+    model_co2 = co2_model(
+        Ar=Ar,
+        Hr=Hr,
+        activity_type=activity_type,
+        outside_air=outside_air,
+        ACH_custom=ACH,
+    )
+
+    (time_series, dt) = time_grid(permanence)
+    people = occupancy(time_series, n_people, occupancy_type, permanence * 60)
+    infected = infected_over_time(people, inf_percent, inf_min, inf_checked)
+
+    (virus_concentration, inhaled_virus, risk) = infection_series(infected, model, dt)
+
+    return RoomResult(
+        time=time_series,
+        people=np.broadcast_to(people, time_series.shape),
+        infected=np.broadcast_to(infected, time_series.shape),
+        virus_concentration=virus_concentration,
+        inhaled_virus=inhaled_virus,
+        risk=risk,
+        co2=co2_levels(people, model_co2, dt),
+    )
+
+
+def co2_model(
+    Ar: float = 100,
+    Hr: float = 3,
+    activity_type: int = 0,
+    outside_air: int = 100,
+    ACH_custom: float = 20,
+    s_ACH_type: int = 6,
+) -> Co2Model:
+    """Derives the rates of the CO2 model of a room from its options. Takes the options of `co2_concentration` that don't depend on time.
+    Area, height, activity, outside air and custom ACH can also be arrays of the same shape, or that broadcast together, to derive the rates of a batch of rooms.
+
+    Returns:
+        Co2Model: Volume, emission and loss rates of the room
+    """
+    V = Ar * Hr  # ... room volume, m^3
 
     # Base value for CO2 emission (based on https:#doi.org/10.1111/ina.12383)
     # H_forCO2 = 1.8; # height of individual, m
@@ -445,11 +592,13 @@ def co2_concentration(
     # (i) average from range in sitting quietly 1.15 met (see met_ref above)
     # (ii) standing quietly,  light exercise  1.3 met
     # (iii) calisthenics, moderate effort 3.8 met
-    metabolic_rate_forCO2 = [
-        met_ref,
-        1.3,
-        3.8,
-    ]  # metabolic rate based on activity, met
+    metabolic_rate_forCO2 = np.array(
+        [
+            met_ref,
+            1.3,
+            3.8,
+        ]
+    )  # metabolic rate based on activity, met
 
     co2_exhRate_ref = (
         co2_exhRate_without_met * met_ref
@@ -463,28 +612,284 @@ def co2_concentration(
     co2_exhRate = co2_exhRate * 10**6  # ...scale to calculate ppm in the end
 
     # Sets ACH based on the modes set at the interface
-    sACH = [0.3, 1, 3, 5, 10, 20, 999]
-    ACH = ACH_custom if s_ACH_type == 6 else sACH[s_ACH_type]
+    ACH = ACH_custom if s_ACH_type == 6 else ACH_PRESETS[s_ACH_type]
     ACH_fresh = (ACH * outside_air) / 100  # ...1/h
     vent_fresh = ACH_fresh / 3600  # ... 1/s
     loss_rate_co2 = vent_fresh
 
-    if loss_rate_co2 > 0:
-        result["co2"] = co2_background + (
-            (result["n_people"] * co2_exhRate) / V / loss_rate_co2
-            + (
-                (result["co2"].shift(1) or co2_background)
-                - (result["n_people"] * co2_exhRate) / V / loss_rate_co2
-                - co2_background
-            )
-            * exp(-loss_rate_co2 * dt)
-        )
+    return Co2Model(volume=V, emission=co2_exhRate, loss_rate=loss_rate_co2)
+
+
+def co2_concentration(
+    Ar: float = 100,
+    Hr: float = 3,
+    inf_percent: float = 10,
+    inf_min: int = 1,
+    n_people: int = 10,
+    occupancy_type: int = 0,
+    inf_checked: bool = True,
+    activity_type: int = 0,
+    outside_air: int = 100,
+    permanence: float = 120,
+    ACH_custom: float = 20,
+    s_ACH_type: int = 6,
+) -> pd.DataFrame:
+    """Calculates the conentration of CO2 in the room over time
+
+    Args:
+        Ar (int, optional): Area of the room. Defaults to 100.
+        Hr (int, optional): Height of the room. Defaults to 3.
+        inf_percent (int, optional): Percentage of infected people. Defaults to 20.
+        inf_min (int, optional): Minimum of infected people. Defaults to 1.
+        n_people (int, optional): Number of people in the room. Defaults to 10.
+        occupancy_type (int, optional): [description]. Defaults to 0.
+        inf_checked (bool, optional): Whether the infected percentage toggle is active. Defaults to True.
+        activity_type (int, optional): [description]. Defaults to 0.
+        outside_air (int, optional): [description]. Defaults to 100.
+        permanence (int, optional): Time of permanence in the room in minutes. Defaults to 60.
+        ACH_custom (int, optional): Custom value of ACH. Defaults to 1.
+        s_ACH_type (int, optional): Selection of type of ACH. Defaults to 6 which means custom.
+
+    Returns:
+        pd.DataFrame: DataFrame with the columns of people over time and concentration of CO2
+    """
+    model = co2_model(
+        Ar=Ar,
+        Hr=Hr,
+        activity_type=activity_type,
+        outside_air=outside_air,
+        ACH_custom=ACH_custom,
+        s_ACH_type=s_ACH_type,
+    )
+
+    (time_series, dt) = time_grid(permanence)
+    people = occupancy(time_series, n_people, occupancy_type, permanence * 60)
+
+    return pd.DataFrame(
+        {
+            "time": time_series,
+            "n_people": np.broadcast_to(people, time_series.shape),
+            "co2": co2_levels(people, model, dt),
+        }
+    )
+
+
+def decay_series(
+    rates: np.ndarray,
+    loss_rate: npt.ArrayLike,
+    dt: npt.ArrayLike,
+    steps: int = TIME_STEPS,
+) -> np.ndarray:
+    """Solves the mass balance of a well mixed room for one or many rooms: a level that grows with an emission and decays with a loss rate, starting from zero.
+
+    The emission is constant within a step, so each step has an exact solution: the level decays towards the steady state of the emission.
+    When the emission is constant the steps chain into a closed form over the whole grid. Otherwise the steps are taken in turn, for every room of the batch at once.
+
+    Args:
+        rates (np.ndarray): Emission per second at every time step, with the steps as last axis. A single step stands for a constant emission
+        loss_rate (npt.ArrayLike): Loss rate of each room in 1/s, the shape of `rates` without its last axis
+        dt (npt.ArrayLike): Length of a step of each room in seconds
+        steps (int): Number of time steps. Defaults to TIME_STEPS.
+
+    Returns:
+        np.ndarray: Level at the end of every step, the shape of `rates` with `steps` as last axis
+    """
+    shape = rates.shape[:-1]
+    loss_rate = np.broadcast_to(np.asarray(loss_rate, dtype=float), shape)[..., None]
+    dt = np.broadcast_to(np.asarray(dt, dtype=float), shape)[..., None]
+    ventilated = loss_rate > 0
+    safe_loss_rate = np.where(ventilated, loss_rate, 1.0)
+
+    # Level after t seconds of a constant emission
+    levels = dt * np.arange(1, steps + 1)
+    if np.all(ventilated):
+        np.multiply(levels, -safe_loss_rate, out=levels)
+        np.expm1(levels, out=levels)
+        levels *= rates[..., :1] / -safe_loss_rate
     else:
-        result["co2"] = (result["co2"].shift(1) or co2_background) + (
-            (result["n_people"] * co2_exhRate) / V
-        ) * dt
+        levels = rates[..., :1] * np.where(
+            ventilated, -np.expm1(-safe_loss_rate * levels) / safe_loss_rate, levels
+        )
+
+    if rates.shape[-1] > 1:
+        varying = np.any(rates != rates[..., :1], axis=-1)
+
+        if np.any(varying):
+            decay = np.exp(-loss_rate * dt)[varying][:, 0]
+            gain = np.where(
+                ventilated, -np.expm1(-safe_loss_rate * dt) / safe_loss_rate, dt
+            )[varying][:, 0]
+
+            if len(decay) == 1:
+                # A single room steps faster with Python floats than with arrays of one value
+                (room_decay, room_gain) = (float(decay[0]), float(gain[0]))
+                room_level = 0.0
+                room_levels = []
+
+                for rate in rates[varying][0].tolist():
+                    room_level = room_decay * room_level + room_gain * rate
+                    room_levels.append(room_level)
+
+                levels[varying] = room_levels
+            else:
+                # Steps as first axis, so every step reads and writes contiguous memory
+                step_rates = np.ascontiguousarray(rates[varying].T)
+                level = np.zeros_like(step_rates)
+
+                level[0] = gain * step_rates[0]
+                for step in range(1, steps):
+                    np.multiply(decay, level[step - 1], out=level[step])
+                    level[step] += gain * step_rates[step]
+
+                levels[varying] = level.T
+
+    return levels
+
+
+def co2_levels(
+    people: np.ndarray, model: Co2Model, dt: npt.ArrayLike, steps: int = TIME_STEPS
+) -> np.ndarray:
+    """Solves the CO2 mass balance of one or many rooms over their time steps.
+
+    Args:
+        people (np.ndarray): People at every time step, with the steps as last axis. A single step stands for a constant occupancy
+        model (Co2Model): Rates of each room, the shape of `people` without its last axis
+        dt (npt.ArrayLike): Length of a step of each room in seconds
+        steps (int): Number of time steps. Defaults to TIME_STEPS.
+
+    Returns:
+        np.ndarray: CO2 concentration at the end of every step in ppm, the shape of `people` with `steps` as last axis
+    """
+    shape = people.shape[:-1]
+    emission = np.broadcast_to(np.asarray(model.emission, dtype=float), shape)
+    volume = np.broadcast_to(np.asarray(model.volume, dtype=float), shape)
+
+    # ... CO2 added per second, ppm/s
+    rates = people * emission[..., None] / volume[..., None]
+
+    levels = decay_series(rates, model.loss_rate, dt, steps)
+    levels += CO2_BACKGROUND
+
+    return levels
+
+
+def infected_over_time(
+    people: np.ndarray, inf_percent: float, inf_min: int, inf_checked: bool
+) -> np.ndarray:
+    """Returns the number of infected people at every time step, as `infected_people` does for a time.
+
+    Args:
+        people (np.ndarray): People at every time step
+        inf_percent (float): Percentage of infected people
+        inf_min (int): Minimum number of infected people
+        inf_checked (bool): Whether the toggle for infected percentage is active or not
+
+    Returns:
+        np.ndarray: Infected people, the shape of `people`
+    """
+    if inf_checked:
+        return np.ceil(np.ceil(people) * (inf_percent / 100))
 
-    return result
+    return np.full(people.shape, inf_min, dtype=float)
+
+
+def infection_series(
+    infected: np.ndarray, model: RoomModel, dt: npt.ArrayLike, steps: int = TIME_STEPS
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Solves the virus concentration, the inhaled virus and the risk of one or many rooms over their time steps.
+
+    Args:
+        infected (np.ndarray): Infected people at every time step, with the steps as last axis. A single step stands for a constant number
+        model (RoomModel): Rates of each room, the shape of `infected` without its last axis
+        dt (npt.ArrayLike): Length of a step of each room in seconds
+        steps (int): Number of time steps. Defaults to TIME_STEPS.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: Virus concentration in PFU/m3, inhaled virus in PFU and risk, at the end of every step
+    """
+    shape = infected.shape[:-1]
+    emission = np.broadcast_to(np.asarray(model.emission, dtype=float), shape)
+    volume = np.broadcast_to(np.asarray(model.volume, dtype=float), shape)
+    inhalation = np.broadcast_to(np.asarray(model.inhalation, dtype=float), shape)
+    dt = np.broadcast_to(np.asarray(dt, dtype=float), shape)
+
+    # The room starts without virus
+    virus_concentration = decay_series(
+        infected * emission[..., None] / volume[..., None], model.loss_rate, dt, steps
+    )
+    inhaled_virus = np.cumsum(
+        (inhalation * dt)[..., None] * virus_concentration, axis=-1
+    )
+    risk = 1 - np.exp(-inhaled_virus / RISK_CONSTANT)
+
+    return (virus_concentration, inhaled_virus, risk)
+
+
+def co2_batch(
+    Ar: npt.ArrayLike,
+    Hr: npt.ArrayLike,
+    n_people: npt.ArrayLike,
+    permanence: npt.ArrayLike,
+    ACH: npt.ArrayLike,
+    activity_type: npt.ArrayLike = 0,
+    occupancy_type: npt.ArrayLike = 0,
+    outside_air: npt.ArrayLike = 100,
+) -> np.ndarray:
+    """Calculates the concentration of CO2 over time for many rooms and ventilation rates at once.
+
+    Arguments broadcast together, for example rooms as a column against ACH values as a row.
+
+    Args:
+        Ar (npt.ArrayLike): Area of each room
+        Hr (npt.ArrayLike): Height of each room
+        n_people (npt.ArrayLike): Number of people in each room
+        permanence (npt.ArrayLike): Time of permanence in each room in minutes
+        ACH (npt.ArrayLike): Air changes per hour
+        activity_type (npt.ArrayLike): Activity in each room. Defaults to 0.
+        occupancy_type (npt.ArrayLike): Constant (0) or Gaussian (1) occupancy. Defaults to 0.
+        outside_air (npt.ArrayLike): Percentage of outdoor air. Defaults to 100.
+
+    Returns:
+        np.ndarray: CO2 concentration in ppm at the end of every time step, the broadcast shape of the arguments with the steps as last axis
+    """
+    (
+        Ar,
+        Hr,
+        n_people,
+        permanence,
+        ACH,
+        activity_type,
+        occupancy_type,
+        outside_air,
+    ) = np.broadcast_arrays(
+        *[
+            np.asarray(argument)
+            for argument in (
+                Ar,
+                Hr,
+                n_people,
+                permanence,
+                ACH,
+                activity_type,
+                occupancy_type,
+                outside_air,
+            )
+        ]
+    )
+
+    model = co2_model(
+        Ar=Ar.astype(float),
+        Hr=Hr.astype(float),
+        activity_type=activity_type,
+        outside_air=outside_air,
+        ACH_custom=ACH.astype(float),
+    )
+
+    dt = permanence * 60 / TIME_STEPS
+    time_series = np.arange(TIME_STEPS) * dt[..., None]
+    people = occupancy(time_series, n_people, occupancy_type, permanence * 60)
+
+    return co2_levels(people, model, dt)
 
 
 def ach_required(
@@ -517,7 +922,7 @@ def ach_required(
     ACH_custom = 0.0
 
     while max_risk > set_risk:
-        ACH_custom += 0.1
+        ACH_custom += ACH_STEP
         results = room_calculation(
             Ar=area,
             Hr=altura,
@@ -538,6 +943,67 @@ def ach_required(
     return ACH_custom
 
 
+def ach_required_rooms(
+    data: pd.DataFrame,
+    occupancy: float,
+    mask_type: int | None,
+    set_risk: float = 0.03,
+    inf_percent: float = 10,
+    viral_load: int = 10,
+    cutoff_type: int = 3,
+) -> list[float]:
+    """Runs `ach_required` for a block of rooms at an occupancy percentage, so a worker pool gets a task per block instead of one per room.
+
+    Args:
+        data (pd.DataFrame): Rooms to solve
+        occupancy (float): Percentage of the capacity of every room occupied
+        mask_type (int | None): Mask type, None to read it from the `Mask Type` column of each room
+        set_risk (float): Maximum risk. Defaults to 0.03.
+        inf_percent (float): Percentage of infected people. Defaults to 10.
+        viral_load (int): Viral load considered. Defaults to 10.
+        cutoff_type (int): Aerosol cutoff. Defaults to 3.
+
+    Returns:
+        list[float]: Required ACH of every room, in order
+    """
+    masks = data["Mask Type"].tolist() if mask_type is None else [mask_type] * len(data)
+
+    return [
+        ach_required(
+            area,
+            altura,
+            ceil(aforo * (occupancy / 100)),
+            actividad,
+            permanencia,
+            set_risk=set_risk,
+            mask_type=mask,
+            inf_percent=inf_percent,
+            viral_load=viral_load,
+            cutoff_type=cutoff_type,
+        )
+        for (area, altura, aforo, actividad, permanencia, mask) in zip(
+            data["Area"],
+            data["Altura"],
+            data["Aforo_100"],
+            data["Actividad"],
+            data["Permanencia"],
+            masks,
+        )
+    ]
+
+
+def solver_iterations(ach: float) -> int:
+    """Returns the iterations `ach_required` took to reach an ACH value.
+
+    Args:
+        ach (float): ACH returned by `ach_required`
+
+    Returns:
+        int: Number of room simulations run by the solver
+    """
+    return round(ach / ACH_STEP)
+
+
 def risk_calculation(
     area: float, altura: float, aforo: int, actividad: int, permanencia: int
 ) -> float:
@@ -559,7 +1025,7 @@ def risk_calculation(
 
     while max_risk > 0.03:
         ACH_custom += 0.1
-        (_, R, _, _, _, _, _) = room_calculation(
+        results = room_calculation(
             Ar=area,
             Hr=altura,
             n_people=aforo,
@@ -569,38 +1035,115 @@ def risk_calculation(
             ACH_custom=ACH_custom,
         )
 
-        max_risk = R[-1]
+        max_risk = results.iloc[-1]["risk"]
 
     return max_risk
 
 
-# def occupancy(area:float, altura:float, actividad:int, permanencia:int, ach:float, inf_percent=10.0) -> dict:
-#     """Función que calcula el aforo para llegar a un riesgo máximo de 3% +- 0.05
+def occupancy_outcome(
+    area: npt.ArrayLike,
+    altura: npt.ArrayLike,
+    actividad: npt.ArrayLike,
+    permanencia: npt.ArrayLike,
+    ach: npt.ArrayLike,
+    aforo: npt.ArrayLike,
+    mask_type: npt.ArrayLike = 1,
+    inf_percent: float = 10,
+    viral_load: int = 10,
+    cutoff_type: int = 3,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Calculates the risk of infection and the CO2 concentration at the end of the permanence of many rooms at once, with a constant occupancy.
 
-#     Args:
-#         area (float): area del ambiente
-#         altura (float): altura del ambiente
-#         actividad (int): tipo de actividad que se está realizando
-#         permanencia (int): tiempo en el aeropuerto
-#         ach (float): renovaciones por ambiente
+    Args:
+        area (npt.ArrayLike): Area of each room
+        altura (npt.ArrayLike): Height of each room
+        actividad (npt.ArrayLike): Activity of each room
+        permanencia (npt.ArrayLike): Time of permanence of each room in minutes
+        ach (npt.ArrayLike): ACH of each room
+        aforo (npt.ArrayLike): People in each room
+        mask_type (npt.ArrayLike): Mask of the occupants of each room. Defaults to 1.
+        inf_percent (float): Percentage of infected people. Defaults to 10.
+        viral_load (int): Viral load considered. Defaults to 10.
+        cutoff_type (int): Aerosol cutoff. Defaults to 3.
 
-#     Returns:
-#         results (int): diccionario que contiene el número de personas permitidas y la data asociada
-#     """
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Risk and CO2 in ppm of each room
+    """
+    model = room_model(
+        Ar=area,
+        Hr=altura,
+        Vli=viral_load,
+        mask_type=mask_type,
+        mask_type_sick=mask_type,
+        activity_type=actividad,
+        activity_type_sick=actividad,
+        cutoff_type=cutoff_type,
+        ACH_custom=ach,
+    )
+    model_co2 = co2_model(Ar=area, Hr=altura, activity_type=actividad, ACH_custom=ach)
+
+    people = np.asarray(aforo, dtype=float)[..., None]
+    dt = np.asarray(permanencia, dtype=float) * 60 / TIME_STEPS
+    infected = infected_over_time(people, inf_percent, 1, True)
+
+    (_, _, risk) = infection_series(infected, model, dt)
 
-#     aforo = 0
-#     max_risk = 0
+    return (risk[..., -1], co2_levels(people, model_co2, dt)[..., -1])
+
+
+def max_occupancy(
+    area: npt.ArrayLike,
+    altura: npt.ArrayLike,
+    actividad: npt.ArrayLike,
+    permanencia: npt.ArrayLike,
+    ach: npt.ArrayLike,
+    set_risk: float = 0.03,
+    mask_type: npt.ArrayLike = 1,
+    inf_percent: float = 10,
+    viral_load: int = 10,
+    cutoff_type: int = 3,
+) -> dict[str, np.ndarray]:
+    """Calculates the maximum number of people that keeps the risk of infection of each room at or below the set risk, for many rooms at once.
+    Risk only grows with the people in the room, so the number is bisected, up to MAX_DENSITY people per square meter.
+
+    Args:
+        area (npt.ArrayLike): Area of each room
+        altura (npt.ArrayLike): Height of each room
+        actividad (npt.ArrayLike): Activity of each room
+        permanencia (npt.ArrayLike): Time of permanence of each room in minutes
+        ach (npt.ArrayLike): ACH of each room
+        set_risk (float): Maximum risk. Defaults to 0.03.
+        mask_type (npt.ArrayLike): Mask of the occupants of each room. Defaults to 1.
+        inf_percent (float): Percentage of infected people. Defaults to 10.
+        viral_load (int): Viral load considered. Defaults to 10.
+        cutoff_type (int): Aerosol cutoff. Defaults to 3.
+
+    Returns:
+        dict[str, np.ndarray]: People allowed in each room, with their risk and CO2 in ppm
+    """
+    options = dict(
+        area=area,
+        altura=altura,
+        actividad=actividad,
+        permanencia=permanencia,
+        ach=ach,
+        mask_type=mask_type,
+        inf_percent=inf_percent,
+        viral_load=viral_load,
+        cutoff_type=cutoff_type,
+    )
 
-#     while max_risk < 0.03:
-#         aforo += 1
-#         (_, R, XCO2, _,_, _, _) = room_calculation(Ar = area, Hr = altura, n_people = aforo, activity_type = actividad, activity_type_sick = actividad, permanence = permanencia, ACH_custom = ach, inf_percent = inf_percent)
+    # An empty room is safe, and one over the limit is taken as unsafe
+    safe = np.zeros(np.shape(area), dtype=np.int64)
+    unsafe = np.floor(np.asarray(area, dtype=float) * MAX_DENSITY).astype(np.int64) + 1
 
-#         max_risk = R[-1]
+    while np.any(unsafe - safe > 1):
+        middle = (safe + unsafe) // 2
+        (risk, _) = occupancy_outcome(aforo=middle, **options)
+        below = risk <= set_risk
+        safe = np.where(below, middle, safe)
+        unsafe = np.where(below, unsafe, middle)
 
-#     results = {
-#         "aforo": aforo,
-#         "co2_contagiosidad": XCO2[-1],
-#         "riesgo_contagiosidad": R[-1]
-#     }
+    (risk, co2) = occupancy_outcome(aforo=safe, **options)
 
-#     return results
+    return {"aforo": safe, "riesgo": risk, "co2": co2}
@@ -0,0 +1,615 @@
+"""
+Benchmarks of the engines and input/output over synthetic room inventories, used by `airborne bench`.
+"""
+import importlib.util
+import platform
+import tempfile
+import time
+from collections.abc import Callable
+from dataclasses import asdict
+from dataclasses import dataclass
+from datetime import datetime
+from datetime import timezone
+from importlib import metadata
+from math import ceil
+from pathlib import Path
+from typing import Any
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from rich.table import Table
+
+from ..settings.model import ModelParameters
+from ..utils.io import load_data
+from ..utils.io import save_data
+from ..utils.validation import engine_columns
+from ..utils.validation import validate_schema
+from .ach import ach_required
+from .ach import room_calculation
+from .ashrae import ashrae_calculation
+from .graphics import export_figure
+from .graphics import risk_ach_inf_graph
+from .risk import ach_risk_aerosol_calculation
+from .risk import ach_risk_co2_calculation
+from .risk import ach_risk_inf_percent_calculation
+
+
+# Typical class, meeting and lab durations, in minutes
+PERMANENCE_OPTIONS = [45, 60, 90, 120, 180, 240]
+
+
+@dataclass(frozen=True)
+class Benchmark:
+    """Operation to time over a room inventory."""
+
+    name: str
+    function: Callable[[pd.DataFrame, ModelParameters, Path], Any]
+    per_room: bool
+    requires: Optional[str] = None
+    prepare: Optional[Callable[[pd.DataFrame, ModelParameters], pd.DataFrame]] = None
+
+
+@dataclass(frozen=True)
+class BenchResult:
+    """Timing of a benchmark for an inventory size."""
+
+    benchmark: str
+    rooms: int
+    rooms_timed: int
+    seconds: Optional[float]
+    rooms_per_second: Optional[float]
+    estimated: bool
+    skipped: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class SuiteCase:
+    """Benchmark of the regression suite, timed over a fixed inventory."""
+
+    name: str
+    benchmark: str
+    rooms: int
+    repeat: int
+    seed: int = 0
+
+
+@dataclass(frozen=True)
+class Comparison:
+    """Timing of a benchmark compared with its baseline."""
+
+    benchmark: str
+    rooms: int
+    baseline: Optional[float]
+    seconds: Optional[float]
+    change: Optional[float]
+    regressed: bool
+
+
+def synthetic_rooms(rooms: int, room_types: list[str], seed: int = 0) -> pd.DataFrame:
+    """Generates a room inventory with the columns of the input schema, as an input file would have them.
+
+    Areas follow a log-normal distribution around 60 m², heights a normal distribution around 3 m, and occupancy is drawn as people per square meter.
+    Most rooms are sedentary and permanence is drawn from typical class and meeting durations.
+
+    Args:
+        rooms (int): Number of rooms
+        room_types (list[str]): ASHRAE room types to draw from
+        seed (int): Seed of the generator. Defaults to 0.
+
+    Returns:
+        pd.DataFrame: Synthetic rooms
+    """
+    rng = np.random.default_rng(seed)
+
+    area = np.clip(rng.lognormal(np.log(60), 0.7, rooms), 8, 2000).round(2)
+    altura = np.clip(rng.normal(3.0, 0.5, rooms), 2.4, 8).round(2)
+    aforo = np.maximum(np.ceil(area * rng.uniform(0.1, 1.0, rooms)), 1).astype(int)
+    actividad = rng.choice([0, 1, 2], size=rooms, p=[0.6, 0.3, 0.1])
+    permanencia = rng.choice(PERMANENCE_OPTIONS, size=rooms).astype(float)
+    ach_natural = np.clip(rng.lognormal(np.log(2), 0.8, rooms), 0.1, 20).round(2)
+    ambiente = [f"R{room:06d}" for room in range(rooms)]
+    pabellon = [
+        f"P{block:03d}" for block in rng.integers(0, max(rooms // 50, 1), rooms)
+    ]
+
+    return pd.DataFrame(
+        {
+            "ambiente": ambiente,
+            "pabellon": pabellon,
+            "area": area,
+            "altura": altura,
+            "aforo_100": aforo,
+            "actividad": actividad,
+            "permanencia": permanencia,
+            "ACH_natural": ach_natural,
+            "Tipo": rng.choice(room_types, size=rooms),
+        }
+    )
+
+
+def engine_rooms(data: pd.DataFrame, parameters: ModelParameters) -> pd.DataFrame:
+    """Validates the inventory and names its columns as the engines do, as loading it would, outside of the timing."""
+    return engine_columns(validate_schema(data))
+
+
+def bench_room_calculation(
+    data: pd.DataFrame, parameters: ModelParameters, _: Path
+) -> None:
+    """Solves the risk over time of every room at its natural ACH."""
+    for room in data.itertuples(index=False):
+        room_calculation(
+            Ar=room.Area,
+            Hr=room.Altura,
+            n_people=ceil(room.Aforo_100 * 0.5),
+            activity_type=room.Actividad,
+            activity_type_sick=room.Actividad,
+            permanence=room.Permanencia,
+            ACH_custom=room.ACH_natural,
+        )
+
+
+def bench_ach_required(
+    data: pd.DataFrame, parameters: ModelParameters, _: Path
+) -> None:
+    """Searches the required ACH of every room."""
+    for room in data.itertuples(index=False):
+        ach_required(
+            room.Area,
+            room.Altura,
+            ceil(room.Aforo_100 * 0.5),
+            room.Actividad,
+            room.Permanencia,
+            set_risk=parameters.max_risk,
+            # Synthetic rooms have no mask column, on_file falls back to KN95
+            mask_type=parameters.mask_type if parameters.mask_type is not None else 1,
+            inf_percent=parameters.inf_percent[0],
+            viral_load=parameters.viral_load,
+            cutoff_type=parameters.cutoff_type,
+        )
+
+
+def bench_risk_inf(data: pd.DataFrame, parameters: ModelParameters, _: Path) -> None:
+    """Risk sweep per percentage of infected people."""
+    ach_risk_inf_percent_calculation(data, list(parameters.inf_percent))
+
+
+def bench_risk_aerosol(
+    data: pd.DataFrame, parameters: ModelParameters, _: Path
+) -> None:
+    """Risk sweep per aerosol cutoff."""
+    ach_risk_aerosol_calculation(data, list(parameters.aerosol))
+
+
+def bench_risk_co2(data: pd.DataFrame, parameters: ModelParameters, _: Path) -> None:
+    """Risk and CO2 sweep per occupancy."""
+    ach_risk_co2_calculation(data, parameters.max_risk)
+
+
+def bench_ashrae(data: pd.DataFrame, parameters: ModelParameters, _: Path) -> None:
+    """ASHRAE flow for every configured occupancy."""
+    for occupancy in parameters.aforo:
+        ashrae_calculation(data, occupancy, parameters.ashrae)
+
+
+def bench_load_csv(
+    data: pd.DataFrame, parameters: ModelParameters, folder: Path
+) -> None:
+    """Loads and validates the inventory from .csv."""
+    load_data(folder.joinpath("rooms.csv"), use_cache=False)
+
+
+def bench_load_parquet(
+    data: pd.DataFrame, parameters: ModelParameters, folder: Path
+) -> None:
+    """Loads and validates the inventory from .parquet."""
+    load_data(folder.joinpath("rooms.parquet"), use_cache=False)
+
+
+def bench_save_csv(
+    data: pd.DataFrame, parameters: ModelParameters, folder: Path
+) -> None:
+    """Saves the inventory as .csv."""
+    save_data(folder, "csv", {"results": data})
+
+
+def bench_save_parquet(
+    data: pd.DataFrame, parameters: ModelParameters, folder: Path
+) -> None:
+    """Saves the inventory as .parquet."""
+    save_data(folder, "parquet", {"results": data})
+
+
+def bench_round_trip_csv(
+    data: pd.DataFrame, parameters: ModelParameters, folder: Path
+) -> None:
+    """Saves the inventory as .csv and loads it back."""
+    save_data(folder, "csv", {"round_trip": data})
+    load_data(folder.joinpath("round_trip.csv"), use_cache=False)
+
+
+def bench_round_trip_parquet(
+    data: pd.DataFrame, parameters: ModelParameters, folder: Path
+) -> None:
+    """Saves the inventory as .parquet and loads it back."""
+    save_data(folder, "parquet", {"round_trip": data})
+    load_data(folder.joinpath("round_trip.parquet"), use_cache=False)
+
+
+def prepare_risk_sweep(data: pd.DataFrame, parameters: ModelParameters) -> pd.DataFrame:
+    """Runs the risk sweep the figures are made from, outside of the timing."""
+    return ach_risk_inf_percent_calculation(
+        engine_rooms(data, parameters), list(parameters.inf_percent)
+    )
+
+
+def bench_figure_export(
+    data: pd.DataFrame, parameters: ModelParameters, folder: Path
+) -> None:
+    """Makes and exports the risk vs. ACH figure of every room."""
+    for name, figure in risk_ach_inf_graph(data, ["#458588"] * 6).items():
+        export_figure(figure, folder.joinpath(f"{name}.png"))
+
+
+BENCHMARKS = {
+    benchmark.name: benchmark
+    for benchmark in [
+        Benchmark(
+            "room_calculation",
+            bench_room_calculation,
+            per_room=True,
+            prepare=engine_rooms,
+        ),
+        Benchmark(
+            "ach_required", bench_ach_required, per_room=True, prepare=engine_rooms
+        ),
+        Benchmark(
+            "risk_sweep_inf", bench_risk_inf, per_room=True, prepare=engine_rooms
+        ),
+        Benchmark(
+            "risk_sweep_aerosol",
+            bench_risk_aerosol,
+            per_room=True,
+            prepare=engine_rooms,
+        ),
+        Benchmark(
+            "risk_sweep_co2", bench_risk_co2, per_room=True, prepare=engine_rooms
+        ),
+        Benchmark(
+            "ashrae_calculation", bench_ashrae, per_room=False, prepare=engine_rooms
+        ),
+        Benchmark("load_data_csv", bench_load_csv, per_room=False),
+        Benchmark("load_data_parquet", bench_load_parquet, per_room=False),
+        Benchmark("save_data_csv", bench_save_csv, per_room=False),
+        Benchmark("save_data_parquet", bench_save_parquet, per_room=False),
+        Benchmark("round_trip_csv", bench_round_trip_csv, per_room=False),
+        Benchmark("round_trip_parquet", bench_round_trip_parquet, per_room=False),
+        Benchmark(
+            "figure_export",
+            bench_figure_export,
+            per_room=True,
+            requires="kaleido",
+            prepare=prepare_risk_sweep,
+        ),
+    ]
+}
+
+
+SUITE = {
+    case.name: case
+    for case in [
+        SuiteCase("single_simulation", "room_calculation", 1, repeat=20),
+        # A sedentary room of four hours, the solver takes a few hundred steps
+        SuiteCase("ach_solve", "ach_required", 1, repeat=3, seed=5),
+        SuiteCase("risk_sweep_1k", "risk_sweep_inf", 1_000, repeat=1),
+        SuiteCase("ashrae_100k", "ashrae_calculation", 100_000, repeat=5),
+        SuiteCase("round_trip_csv_100k", "round_trip_csv", 100_000, repeat=3),
+        SuiteCase("round_trip_parquet_100k", "round_trip_parquet", 100_000, repeat=3),
+    ]
+}
+
+
+def time_benchmark(
+    benchmark: Benchmark,
+    data: pd.DataFrame,
+    parameters: ModelParameters,
+    folder: Path,
+    repeat: int,
+) -> float:
+    """Times a benchmark over some rooms.
+
+    Args:
+        benchmark (Benchmark): Benchmark to time
+        data (pd.DataFrame): Rooms to run it on
+        parameters (ModelParameters): Model parameters of the engines
+        folder (Path): Folder for the files read and written
+        repeat (int): Number of runs, the fastest one is kept
+
+    Returns:
+        float: Seconds of the fastest run
+    """
+    if benchmark.prepare is not None:
+        data = benchmark.prepare(data, parameters)
+
+    timings = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        benchmark.function(data.copy(), parameters, folder)
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+def run_benchmarks(
+    sizes: list[int],
+    names: list[str],
+    parameters: ModelParameters,
+    sample: int = 5,
+    repeat: int = 3,
+    seed: int = 0,
+    on_result: Optional[Callable[[BenchResult], None]] = None,
+) -> list[BenchResult]:
+    """Runs benchmarks over synthetic inventories of every size.
+
+    Benchmarks of the vectorized stages and of input/output run over the whole inventory.
+    The per room engines are timed once over `sample` rooms and their time is scaled to each size, these results are marked as estimated.
+
+    Args:
+        sizes (list[int]): Number of rooms of each inventory
+        names (list[str]): Benchmarks to run, keys of BENCHMARKS
+        parameters (ModelParameters): Model parameters of the engines
+        sample (int): Rooms timed for the per room engines. Defaults to 5.
+        repeat (int): Runs of the whole inventory benchmarks, the fastest one is kept. Defaults to 3.
+        seed (int): Seed of the synthetic inventories. Defaults to 0.
+        on_result (Optional[Callable[[BenchResult], None]]): Called with every result as soon as it's ready. Defaults to None.
+
+    Returns:
+        list[BenchResult]: Results per benchmark and size
+    """
+    room_types = parameters.ashrae.room_types.tolist()
+    results = []
+
+    def report(result: BenchResult) -> None:
+        results.append(result)
+        if on_result is not None:
+            on_result(result)
+
+    with tempfile.TemporaryDirectory() as temporary_folder:
+        folder = Path(temporary_folder)
+
+        for name in names:
+            benchmark = BENCHMARKS[name]
+
+            if (
+                benchmark.requires is not None
+                and importlib.util.find_spec(benchmark.requires) is None
+            ):
+                for rooms in sizes:
+                    report(
+                        BenchResult(
+                            name,
+                            rooms,
+                            0,
+                            None,
+                            None,
+                            False,
+                            f"{benchmark.requires} is not installed",
+                        )
+                    )
+                continue
+
+            if benchmark.per_room:
+                data = synthetic_rooms(sample, room_types, seed)
+                seconds = time_benchmark(benchmark, data, parameters, folder, 1)
+                per_room = seconds / sample
+
+                for rooms in sizes:
+                    report(
+                        BenchResult(
+                            name,
+                            rooms,
+                            sample,
+                            per_room * rooms,
+                            1 / per_room if per_room > 0 else None,
+                            rooms != sample,
+                        )
+                    )
+                continue
+
+            for rooms in sizes:
+                data = synthetic_rooms(rooms, room_types, seed)
+                data.to_csv(folder.joinpath("rooms.csv"), index=False)
+                data.to_parquet(folder.joinpath("rooms.parquet"))
+
+                seconds = time_benchmark(benchmark, data, parameters, folder, repeat)
+                report(
+                    BenchResult(
+                        name,
+                        rooms,
+                        rooms,
+                        seconds,
+                        rooms / seconds if seconds > 0 else None,
+                        False,
+                    )
+                )
+
+    return results
+
+
+def run_suite(
+    names: list[str],
+    parameters: ModelParameters,
+    on_result: Optional[Callable[[BenchResult], None]] = None,
+) -> list[BenchResult]:
+    """Runs cases of the regression suite over their whole inventory, the per room engines included.
+
+    Args:
+        names (list[str]): Cases to run, keys of SUITE
+        parameters (ModelParameters): Model parameters of the engines
+        on_result (Optional[Callable[[BenchResult], None]]): Called with every result as soon as it's ready. Defaults to None.
+
+    Returns:
+        list[BenchResult]: Results named after the cases
+    """
+    room_types = parameters.ashrae.room_types.tolist()
+    results = []
+
+    with tempfile.TemporaryDirectory() as temporary_folder:
+        folder = Path(temporary_folder)
+
+        for name in names:
+            case = SUITE[name]
+            data = synthetic_rooms(case.rooms, room_types, case.seed)
+
+            seconds = time_benchmark(
+                BENCHMARKS[case.benchmark], data, parameters, folder, case.repeat
+            )
+            result = BenchResult(
+                name,
+                case.rooms,
+                case.rooms,
+                seconds,
+                case.rooms / seconds if seconds > 0 else None,
+                False,
+            )
+
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+
+    return results
+
+
+def compare_baseline(
+    results: list[BenchResult], baseline: dict[str, Any], threshold: float
+) -> list[Comparison]:
+    """Compares results with a baseline report of the same benchmarks.
+
+    Args:
+        results (list[BenchResult]): Results of `run_benchmarks` or `run_suite`
+        baseline (dict[str, Any]): Report saved from an earlier run, as built by `results_report`
+        threshold (float): Slowdown allowed, as a fraction of the baseline time
+
+    Returns:
+        list[Comparison]: Comparison of every result, regressed when slower than the baseline by more than the threshold
+    """
+    baseline_seconds = {
+        (result["benchmark"], result["rooms"]): result["seconds"]
+        for result in baseline["results"]
+    }
+    comparisons = []
+
+    for result in results:
+        reference = baseline_seconds.get((result.benchmark, result.rooms))
+
+        # Skipped benchmarks and ones missing from the baseline can't regress
+        if reference is None or result.seconds is None or reference <= 0:
+            change = None
+        else:
+            change = result.seconds / reference - 1
+
+        comparisons.append(
+            Comparison(
+                result.benchmark,
+                result.rooms,
+                reference,
+                result.seconds,
+                change,
+                change is not None and change > threshold,
+            )
+        )
+
+    return comparisons
+
+
+def comparison_table(comparisons: list[Comparison]) -> Table:
+    """Builds the table of the results against their baseline.
+
+    Args:
+        comparisons (list[Comparison]): Comparisons from `compare_baseline`
+
+    Returns:
+        Table: Rich table with the seconds of every benchmark, its baseline and the change, regressions in red
+    """
+    table = Table(title="Seconds against the baseline")
+
+    table.add_column("Benchmark")
+    table.add_column("Rooms", justify="right")
+    table.add_column("Baseline", justify="right")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Change", justify="right")
+
+    for comparison in comparisons:
+        if comparison.change is None:
+            change = ""
+        elif comparison.regressed:
+            change = f"[bold red]{comparison.change:+.1%}[/bold red]"
+        else:
+            change = f"{comparison.change:+.1%}"
+
+        table.add_row(
+            comparison.benchmark,
+            f"{comparison.rooms:,}",
+            f"{comparison.baseline:.3g}" if comparison.baseline is not None else "",
+            f"{comparison.seconds:.3g}"
+            if comparison.seconds is not None
+            else "skipped",
+            change,
+        )
+
+    return table
+
+
+def results_table(results: list[BenchResult]) -> Table:
+    """Builds the scaling table of the results, benchmarks by inventory size.
+
+    Args:
+        results (list[BenchResult]): Results of `run_benchmarks`
+
+    Returns:
+        Table: Rich table with the seconds of every benchmark and size, estimates are marked with ~
+    """
+    sizes = sorted({result.rooms for result in results})
+    table = Table(title="Seconds per inventory size (~ scaled from a sample)")
+
+    table.add_column("Benchmark")
+    for rooms in sizes:
+        table.add_column(f"{rooms:,} rooms", justify="right")
+
+    rows: dict[str, dict[int, str]] = {}
+    for result in results:
+        if result.skipped is not None:
+            cell = "skipped"
+        else:
+            cell = f"{'~' if result.estimated else ''}{result.seconds:.3g}"
+        rows.setdefault(result.benchmark, {})[result.rooms] = cell
+
+    for benchmark, cells in rows.items():
+        table.add_row(benchmark, *[cells.get(rooms, "") for rooms in sizes])
+
+    return table
+
+
+def results_report(results: list[BenchResult]) -> dict[str, Any]:
+    """Builds the JSON report of the results with the details of the machine they were run on.
+
+    Args:
+        results (list[BenchResult]): Results of `run_benchmarks`
+
+    Returns:
+        dict[str, Any]: Report ready to be dumped as JSON
+    """
+    try:
+        version = metadata.version("airborne-cli")
+    except metadata.PackageNotFoundError:
+        version = "unknown"
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "airborne_cli": version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "results": [asdict(result) for result in results],
+    }
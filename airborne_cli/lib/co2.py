@@ -0,0 +1,172 @@
+"""
+Ventilation required to keep the CO2 concentration of the rooms below a ceiling, solved for a whole inventory at once.
+"""
+from math import ceil
+from math import log2
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from .ach import CO2_BACKGROUND
+from .ach import TIME_STEPS
+from .ach import Co2Model
+from .ach import co2_levels
+from .ach import co2_model
+from .ach import occupancy
+
+
+# Newton's method starts from an upper bound of the root and converges from it in a few iterations,
+# rooms that barely need ventilation converge linearly and take the most
+NEWTON_ITERATIONS = 100
+# Resolution of the search for Gaussian occupancy, ACH
+ACH_TOLERANCE = 1e-4
+
+
+def fresh_ach_constant(
+    rate: npt.ArrayLike, permanence: npt.ArrayLike, headroom: float
+) -> np.ndarray:
+    """Solves the outdoor air ACH that brings the CO2 of rooms with a constant occupancy to the ceiling at the end of the permanence.
+
+    The CO2 over the background after t seconds is `rate / λ * (1 - exp(-λ t))`, rising for the whole permanence. Writing x = λ T, the ceiling is met at
+    the root of `1 - exp(-x) = k x`, with k the headroom over the CO2 added without ventilation. The root is Lambert's W, found with Newton's method.
+
+    Args:
+        rate (npt.ArrayLike): CO2 added per second by the occupants of each room, ppm/s
+        permanence (npt.ArrayLike): Time of permanence of each room, s
+        headroom (float): CO2 allowed over the background, ppm
+
+    Returns:
+        np.ndarray: Outdoor air ACH of each room, 0 where the ceiling is met without ventilation
+    """
+    (rate, permanence) = np.broadcast_arrays(
+        np.asarray(rate, dtype=float), np.asarray(permanence, dtype=float)
+    )
+    unventilated = rate * permanence
+
+    with np.errstate(divide="ignore"):
+        k = np.where(unventilated > headroom, headroom / unventilated, 0.5)
+
+    # g(x) = 1 - exp(-x) - k x is concave, from x = 1/k Newton's steps stay right of the root
+    x = 1 / k
+    for _ in range(NEWTON_ITERATIONS):
+        step = (-np.expm1(-x) - k * x) / (np.exp(-x) - k)
+        x -= step
+
+        if np.all(np.abs(step) <= 1e-15 * x):
+            break
+
+    return np.where(unventilated > headroom, x / permanence * 3600, 0.0)
+
+
+def fresh_ach_search(
+    people: np.ndarray, model: Co2Model, dt: npt.ArrayLike, max_co2: float
+) -> np.ndarray:
+    """Searches the outdoor air ACH that keeps the CO2 of rooms with a varying occupancy below the ceiling at every time step.
+
+    The CO2 at every step falls as the ventilation rises, so the ACH is bisected between no ventilation and the steady state at the peak occupancy,
+    which is above the CO2 of any step. Every room is bisected at once.
+
+    Args:
+        people (np.ndarray): People at every time step, rooms x steps
+        model (Co2Model): Volume and emission of each room, its loss rate is replaced by the search
+        dt (npt.ArrayLike): Length of a step of each room in seconds
+        max_co2 (float): CO2 ceiling, ppm
+
+    Returns:
+        np.ndarray: Outdoor air ACH of each room, within ACH_TOLERANCE above the minimum
+    """
+    shape = people.shape[:-1]
+    peak_rate = people.max(axis=-1) * model.emission / model.volume
+
+    def peak_co2(loss_rate: np.ndarray) -> np.ndarray:
+        levels = co2_levels(
+            people, Co2Model(model.volume, model.emission, loss_rate), dt
+        )
+        return levels.max(axis=-1)
+
+    lower = np.zeros(shape)
+    upper = np.broadcast_to(peak_rate / (max_co2 - CO2_BACKGROUND), shape).copy()
+    upper[peak_co2(lower) <= max_co2] = 0.0
+
+    # Halvings needed for the widest bracket to reach the tolerance
+    span = upper.max(initial=0.0) * 3600 / ACH_TOLERANCE
+    for _ in range(ceil(log2(span)) if span > 1 else 0):
+        middle = (lower + upper) / 2
+        below = peak_co2(middle) <= max_co2
+        upper = np.where(below, middle, upper)
+        lower = np.where(below, lower, middle)
+
+    return upper * 3600
+
+
+def co2_ach_calculation(
+    data: pd.DataFrame,
+    occupancy_perc: float,
+    max_co2: float,
+    outside_air: float = 100,
+    occupancy_type: int = 0,
+) -> pd.DataFrame:
+    """Calculates the ACH that keeps the CO2 concentration of every room below a ceiling during its permanence, and the percentage of outdoor air needed at its natural ACH.
+
+    Args:
+        data (pd.DataFrame): Data to process
+        occupancy_perc (float): Occupancy percentage
+        max_co2 (float): CO2 ceiling, ppm
+        outside_air (float, optional): Percentage of outdoor air in the supply. Defaults to 100.
+        occupancy_type (int, optional): Constant (0) or Gaussian (1) occupancy. Defaults to 0.
+
+    Raises:
+        ValueError: The ceiling isn't above the outdoor CO2 or there's no outdoor air, no ventilation can meet it
+
+    Returns:
+        pd.DataFrame: Data with the required ACH per occupancy, and the outdoor air percentage and whether the natural ACH falls short when it's known
+    """
+    if max_co2 <= CO2_BACKGROUND:
+        raise ValueError(
+            f"[bold red]Alert![/bold red] The CO2 ceiling of {max_co2} ppm must be above the {CO2_BACKGROUND} ppm outdoors"
+        )
+    if outside_air <= 0:
+        raise ValueError(
+            "[bold red]Alert![/bold red] Without outdoor air no ventilation lowers the CO2"
+        )
+
+    people = np.ceil(data["Aforo_100"].to_numpy(dtype=float) * (occupancy_perc / 100))
+    permanence = data["Permanencia"].to_numpy(dtype=float) * 60
+    model = co2_model(
+        Ar=data["Area"].to_numpy(dtype=float),
+        Hr=data["Altura"].to_numpy(dtype=float),
+        activity_type=data["Actividad"].to_numpy(dtype=int),
+    )
+
+    if occupancy_type == 0:
+        fresh_ach = fresh_ach_constant(
+            people * model.emission / model.volume,
+            permanence,
+            max_co2 - CO2_BACKGROUND,
+        )
+    else:
+        # Time steps of each room, as `time_grid` makes them
+        dt = permanence / TIME_STEPS
+        time_series = np.arange(TIME_STEPS) * dt[:, None]
+        fresh_ach = fresh_ach_search(
+            occupancy(time_series, people, occupancy_type, permanence),
+            model,
+            dt,
+            max_co2,
+        )
+
+    data[f"ACH_CO2_{occupancy_perc}"] = fresh_ach * 100 / outside_air
+
+    if "ACH_natural" in data.columns:
+        natural_ach = data["ACH_natural"].to_numpy(dtype=float)
+
+        # Rooms that need no outdoor air need none of their natural ACH, even without natural ventilation
+        with np.errstate(divide="ignore", invalid="ignore"):
+            data[f"Aire_exterior_CO2_{occupancy_perc}"] = np.where(
+                fresh_ach > 0, fresh_ach * 100 / natural_ach, 0.0
+            )
+        # Over 100%, or infinite without natural ventilation, the natural ACH can't keep the CO2 below the ceiling
+        data[f"Excede_ACH_natural_CO2_{occupancy_perc}"] = fresh_ach > natural_ach
+
+    return data
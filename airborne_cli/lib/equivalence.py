@@ -0,0 +1,852 @@
+"""
+Numerical equivalence of the engines with reference implementations of the current model, over a seeded corpus of scenarios.
+
+The references derive the rates and time steps with scalar math and integrate the model one time step at a time, as the engines were first written,
+without any code of the engines they check.
+Any faster replacement of `room_calculation`, `co2_concentration` or `ach_required` has to reproduce their numbers within the tolerances of its engine.
+"""
+from collections.abc import Callable
+from collections.abc import Sequence
+from dataclasses import dataclass
+from math import ceil
+from math import exp
+from math import isfinite
+from typing import Any
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from rich.table import Table
+
+from .ach import ACH_PRESETS
+from .ach import ach_required
+from .ach import co2_batch
+from .ach import co2_concentration
+from .ach import room_calculation
+from .ach import room_co2_calculation
+
+
+# Output columns of an engine for a scenario
+Columns = dict[str, np.ndarray]
+# Keyword arguments of an engine
+Scenario = dict[str, Any]
+
+
+@dataclass(frozen=True)
+class Tolerance:
+    """Largest difference allowed between a value and its reference, as in `numpy.isclose`."""
+
+    absolute: float
+    relative: float
+
+
+@dataclass(frozen=True)
+class Engine:
+    """Engine compared with its reference implementation."""
+
+    name: str
+    fast: Callable[..., Columns]
+    reference: Callable[..., Columns]
+    options: dict[str, Sequence[Any]]
+    draw: Callable[[np.random.Generator, dict[str, np.ndarray]], dict[str, np.ndarray]]
+    tolerances: dict[str, Tolerance]
+    corpus: int
+
+
+@dataclass(frozen=True)
+class ColumnError:
+    """Differences of an output column with its reference over a corpus."""
+
+    engine: str
+    column: str
+    scenarios: int
+    max_absolute: float
+    max_relative: float
+    failures: int
+    worst_scenario: Optional[int]
+    tolerance: Tolerance
+
+    @property
+    def passed(self) -> bool:
+        """Every value of the column is within the tolerance."""
+        return self.failures == 0
+
+
+def frame_columns(result: pd.DataFrame, columns: Sequence[str]) -> Columns:
+    """Takes the output columns of an engine as arrays.
+
+    Args:
+        result (pd.DataFrame): Result of the engine
+        columns (Sequence[str]): Output columns
+
+    Returns:
+        Columns: Values of every column
+    """
+    return {
+        column: result[column].to_numpy(dtype=float, copy=True) for column in columns
+    }
+
+
+ROOM_COLUMNS = (
+    "time",
+    "people",
+    "infected",
+    "virus_concentration",
+    "inhaled_virus",
+    "risk",
+)
+CO2_COLUMNS = ("time", "n_people", "co2")
+# Arguments of `room_calculation` the CO2 model takes
+CO2_ARGUMENTS = (
+    "Ar",
+    "Hr",
+    "inf_percent",
+    "inf_min",
+    "n_people",
+    "occupancy_type",
+    "inf_checked",
+    "activity_type",
+    "outside_air",
+    "permanence",
+    "ACH_custom",
+    "s_ACH_type",
+)
+
+
+def fast_room_calculation(**scenario: Any) -> Columns:
+    """Runs `room_calculation` on a scenario."""
+    return frame_columns(room_calculation(**scenario), ROOM_COLUMNS)
+
+
+def fast_co2_concentration(**scenario: Any) -> Columns:
+    """Runs `co2_concentration` on a scenario."""
+    return frame_columns(co2_concentration(**scenario), CO2_COLUMNS)
+
+
+def fast_co2_batch(**scenario: Any) -> Columns:
+    """Runs `co2_batch` on a scenario, as a batch of one room."""
+    return {
+        "co2": co2_batch(
+            Ar=scenario["Ar"],
+            Hr=scenario["Hr"],
+            n_people=scenario["n_people"],
+            permanence=scenario["permanence"],
+            ACH=scenario["ACH_custom"]
+            if scenario["s_ACH_type"] == 6
+            else ACH_PRESETS[scenario["s_ACH_type"]],
+            activity_type=scenario["activity_type"],
+            occupancy_type=scenario["occupancy_type"],
+            outside_air=scenario["outside_air"],
+        )
+    }
+
+
+def fast_room_co2_calculation(**scenario: Any) -> Columns:
+    """Runs `room_co2_calculation` on a scenario."""
+    result = room_co2_calculation(**scenario)
+
+    return {
+        column: np.asarray(getattr(result, column), dtype=float)
+        for column in (*ROOM_COLUMNS, "co2")
+    }
+
+
+def fast_ach_required(**scenario: Any) -> Columns:
+    """Runs `ach_required` on a scenario."""
+    return {"ach": np.array([ach_required(**scenario)])}
+
+
+# Tables of the model as the engines were first written, indexed by cutoff first then vertical velocity
+REFERENCE_PM1 = [0.1384, 0.0086, 0.0007, 0.0001, 0.0, 0.1384, 0.0086, 0.005, 0.0, 0.0]
+REFERENCE_PM2D5 = [
+    5.8893,
+    0.3673,
+    0.0293,
+    0.0022,
+    0.0004,
+    5.8893,
+    0.3673,
+    0.0229,
+    0.0014,
+    0.0002,
+]
+REFERENCE_PM5 = [
+    93.9723,
+    5.8605,
+    0.4682,
+    0.0358,
+    0.0059,
+    93.9723,
+    5.8605,
+    0.3658,
+    0.0227,
+    0.0037,
+]
+REFERENCE_PM10 = [
+    0.0,
+    93.7636,
+    7.4907,
+    0.573,
+    0.0947,
+    0.0,
+    93.7636,
+    5.8529,
+    0.364,
+    0.0587,
+]
+REFERENCE_PM20 = [0.0, 0.0, 92.0111, 9.179, 1.5175, 0.0, 0.0, 93.7578, 5.8303, 0.9411]
+REFERENCE_PM40 = [0.0, 0.0, 0.0, 90.2099, 23.9912, 0.0, 0.0, 0.0, 93.7815, 15.1371]
+REFERENCE_PM100 = [0.0, 0.0, 0.0, 0.0, 74.3903, 0.0, 0.0, 0.0, 0.0, 83.8592]
+REFERENCE_NGEN = [
+    0.4527,
+    0.4843,
+    0.589,
+    5.1152,
+    16.2196,
+    0.4728,
+    0.5058,
+    0.647,
+    8.6996,
+    30.073,
+]
+REFERENCE_KAPPA = [0.39, 0.39, 0.39, 0.39, 0.39, 0, 0, 0, 0, 0]
+# Filter efficiency in the PM1, PM2.5, PM10 and larger classes: none, HEPA, ePM1, ePM2.5, ePM10 and coarse
+REFERENCE_FILTERS = [
+    [0, 99.5, 90.0, 90.0, 90.0, 40.0],
+    [0, 100.0, 100.0, 90.0, 90.0, 40.0],
+    [0, 100.0, 100.0, 100.0, 90.0, 40.0],
+    [0, 100.0, 100.0, 100.0, 100.0, 100.0],
+]
+REFERENCE_ACTIVITY = [1, 2.5556, 6.1111]
+REFERENCE_MASKS = [0, 0.9, 0.59, 0.51, 0.35]
+REFERENCE_METABOLIC_RATES = [1.15, 1.3, 3.8]
+REFERENCE_ACH = [0.3, 1, 3, 5, 10, 20, 999]
+# ACH added on each iteration of the required ACH search
+REFERENCE_ACH_STEP = 0.1
+REFERENCE_RISK = 410
+REFERENCE_CO2_BACKGROUND = 415
+
+
+def reference_time_grid(permanence: float) -> tuple[list[float], float]:
+    """Start of the 400 time steps of a permanence in minutes, and the length of a step, in seconds."""
+    dt = permanence * 60 / 400
+
+    return ([step * dt for step in range(400)], dt)
+
+
+def reference_room_rates(
+    *,
+    Ar: float,
+    Hr: float,
+    s_ACH_type: int,
+    Vli: int,
+    mask_type: int,
+    activity_type: int,
+    mask_type_sick: int,
+    activity_type_sick: int,
+    cutoff_type: int,
+    verticalv_type: int,
+    ACH_custom: float,
+    s_filter_type: int,
+    outside_air: int,
+) -> tuple[float, float, float, float]:
+    """Volume, emission per infected person, inhalation and loss rates of the airborne transmission model.
+
+    Returns:
+        tuple[float, float, float, float]: Volume in m3, emission in PFU/s, inhalation in m3/s and loss rate in 1/s
+    """
+    index = cutoff_type + 5 * verticalv_type
+
+    PM1 = REFERENCE_PM1[index] / 100
+    PM2d5 = PM1 + REFERENCE_PM2D5[index] / 100
+    PM5 = PM2d5 + REFERENCE_PM5[index] / 100
+    PM10 = PM5 + REFERENCE_PM10[index] / 100
+    PM20 = PM10 + REFERENCE_PM20[index] / 100
+    PM40 = PM20 + REFERENCE_PM40[index] / 100
+    PM100 = PM40 + REFERENCE_PM100[index] / 100
+
+    (filter_pm1, filter_pm2d5, filter_pm10, filter_rest) = (
+        efficiencies[s_filter_type] for efficiencies in REFERENCE_FILTERS
+    )
+    filterEff = (
+        (filter_pm1 / 100.0) * PM1
+        + (filter_pm2d5 / 100.0) * (PM2d5 - PM1)
+        + (filter_pm10 / 100.0) * (PM10 - PM2d5)
+        + (filter_rest / 100.0) * (PM100 - PM10)
+    )
+
+    ACH = ACH_custom if s_ACH_type == 6 else REFERENCE_ACH[s_ACH_type]
+
+    inhRate = (
+        0.521 * (1 - REFERENCE_MASKS[mask_type]) * REFERENCE_ACTIVITY[activity_type]
+    )
+    base_N_r = (
+        REFERENCE_ACTIVITY[activity_type_sick] * REFERENCE_NGEN[index]
+    ) / 10**9
+    N_r = 10**Vli * base_N_r * (1 - REFERENCE_MASKS[mask_type_sick])
+
+    ACH_fresh = (ACH * outside_air) / 100
+    ACH_recirc = ACH * (1 - (outside_air / 100))
+    loss_rate = (
+        ACH_fresh / 3600
+        + filterEff * (ACH_recirc / 3600)
+        + REFERENCE_KAPPA[index] / 3600
+        + 0.636 / 3600
+    )
+
+    return (Ar * Hr, N_r, inhRate / 1000, loss_rate)
+
+
+def reference_co2_rates(
+    *,
+    Ar: float,
+    Hr: float,
+    activity_type: int,
+    outside_air: int,
+    ACH_custom: float,
+    s_ACH_type: int,
+) -> tuple[float, float, float]:
+    """Volume, emission per person and loss rate of the CO2 model.
+
+    Returns:
+        tuple[float, float, float]: Volume in m3, emission scaled to ppm in m3/s and loss rate in 1/s
+    """
+    # DuBois surface area of an average adult and respiratory quotient
+    co2_exhRate_without_met = (0.00276 * 1.8 * 0.85) / (0.23 * 0.85 + 0.77)
+    co2_exhRate_ref = co2_exhRate_without_met * 1.15
+    co2_exhRate = (co2_exhRate_ref * REFERENCE_METABOLIC_RATES[activity_type]) / 1.15
+    co2_exhRate = co2_exhRate / 1000 * 10**6
+
+    ACH = ACH_custom if s_ACH_type == 6 else REFERENCE_ACH[s_ACH_type]
+
+    return (Ar * Hr, co2_exhRate, ((ACH * outside_air) / 100) / 3600)
+
+
+def reference_people(
+    t: float,
+    n_people: int,
+    occupancy_type: int,
+    inf_percent: float,
+    inf_min: int,
+    inf_checked: bool,
+    permanence: float,
+) -> tuple[float, int]:
+    """People and infected people in the room at a time, for constant or gaussian occupancy.
+
+    Returns:
+        tuple[float, int]: People and infected people
+    """
+    if occupancy_type == 0:
+        people = n_people
+    else:
+        b = permanence / 2
+        c = permanence / 6
+        people = n_people * exp(-((t - b) ** 2) / ((2 * c) ** 2))
+
+    infected = ceil(ceil(people) * (inf_percent / 100)) if inf_checked else inf_min
+
+    return (people, infected)
+
+
+def reference_room_calculation(
+    *,
+    Ar: float,
+    Hr: float,
+    s_ACH_type: int,
+    n_people: int,
+    Vli: int,
+    mask_type: int,
+    activity_type: int,
+    mask_type_sick: int,
+    activity_type_sick: int,
+    cutoff_type: int,
+    verticalv_type: int,
+    permanence: float,
+    ACH_custom: float,
+    inf_checked: bool,
+    inf_percent: float,
+    inf_min: int,
+    occupancy_type: int,
+    s_filter_type: int,
+    outside_air: int,
+) -> Columns:
+    """Virus concentration, inhaled virus and risk over time, integrated one step at a time."""
+    (volume, emission, inhalation, loss_rate) = reference_room_rates(
+        Ar=Ar,
+        Hr=Hr,
+        s_ACH_type=s_ACH_type,
+        Vli=Vli,
+        mask_type=mask_type,
+        activity_type=activity_type,
+        mask_type_sick=mask_type_sick,
+        activity_type_sick=activity_type_sick,
+        cutoff_type=cutoff_type,
+        verticalv_type=verticalv_type,
+        ACH_custom=ACH_custom,
+        s_filter_type=s_filter_type,
+        outside_air=outside_air,
+    )
+    (time_series, dt) = reference_time_grid(permanence)
+    result = {column: np.zeros(len(time_series)) for column in ROOM_COLUMNS}
+
+    concentration = 0.0
+    inhaled = 0.0
+
+    for step, t in enumerate(time_series):
+        (people, infected) = reference_people(
+            t,
+            n_people,
+            occupancy_type,
+            inf_percent,
+            inf_min,
+            inf_checked,
+            permanence * 60,
+        )
+
+        steady_state = (infected * emission) / (volume * loss_rate)
+        concentration = steady_state + (concentration - steady_state) * exp(
+            -loss_rate * dt
+        )
+        inhaled = inhaled + inhalation * dt * concentration
+
+        result["time"][step] = t
+        result["people"][step] = people
+        result["infected"][step] = infected
+        result["virus_concentration"][step] = concentration
+        result["inhaled_virus"][step] = inhaled
+        result["risk"][step] = 1 - exp(-inhaled / REFERENCE_RISK)
+
+    return result
+
+
+def reference_co2_concentration(
+    *,
+    Ar: float,
+    Hr: float,
+    inf_percent: float,
+    inf_min: int,
+    n_people: int,
+    occupancy_type: int,
+    inf_checked: bool,
+    activity_type: int,
+    outside_air: int,
+    permanence: float,
+    ACH_custom: float,
+    s_ACH_type: int,
+) -> Columns:
+    """CO2 concentration over time, integrated one step at a time."""
+    (volume, emission, loss_rate) = reference_co2_rates(
+        Ar=Ar,
+        Hr=Hr,
+        activity_type=activity_type,
+        outside_air=outside_air,
+        ACH_custom=ACH_custom,
+        s_ACH_type=s_ACH_type,
+    )
+    (time_series, dt) = reference_time_grid(permanence)
+    result = {column: np.zeros(len(time_series)) for column in CO2_COLUMNS}
+
+    level = REFERENCE_CO2_BACKGROUND
+
+    for step, t in enumerate(time_series):
+        (people, _) = reference_people(
+            t,
+            n_people,
+            occupancy_type,
+            inf_percent,
+            inf_min,
+            inf_checked,
+            permanence * 60,
+        )
+
+        if loss_rate > 0:
+            steady_state = (people * emission) / volume / loss_rate
+            level = REFERENCE_CO2_BACKGROUND + (
+                steady_state
+                + (level - steady_state - REFERENCE_CO2_BACKGROUND)
+                * exp(-loss_rate * dt)
+            )
+        else:
+            level = level + ((people * emission) / volume) * dt
+
+        result["time"][step] = t
+        result["n_people"][step] = people
+        result["co2"][step] = level
+
+    return result
+
+
+def reference_room_co2_calculation(**scenario: Any) -> Columns:
+    """Risk of infection and CO2 concentration over time, from the references of each model."""
+    co2 = reference_co2_concentration(
+        **{name: scenario[name] for name in CO2_ARGUMENTS}
+    )
+
+    return {**reference_room_calculation(**scenario), "co2": co2["co2"]}
+
+
+def reference_ach_required(
+    *,
+    area: float,
+    altura: float,
+    aforo: int,
+    actividad: int,
+    permanencia: float,
+    set_risk: float,
+    mask_type: int,
+    inf_percent: float,
+    viral_load: int,
+    cutoff_type: int,
+) -> Columns:
+    """Required ACH, found by raising the ACH one step at a time until the final risk is below the maximum."""
+    max_risk = 1.0
+    ach = 0.0
+
+    while max_risk > set_risk:
+        ach += REFERENCE_ACH_STEP
+        room = reference_room_calculation(
+            Ar=area,
+            Hr=altura,
+            s_ACH_type=6,
+            n_people=aforo,
+            Vli=viral_load,
+            mask_type=mask_type,
+            activity_type=actividad,
+            mask_type_sick=mask_type,
+            activity_type_sick=actividad,
+            cutoff_type=cutoff_type,
+            verticalv_type=0,
+            permanence=permanencia,
+            ACH_custom=ach,
+            inf_checked=True,
+            inf_percent=inf_percent,
+            inf_min=1,
+            occupancy_type=0,
+            s_filter_type=0,
+            outside_air=100,
+        )
+        max_risk = room["risk"][-1]
+
+    return {"ach": np.array([ach])}
+
+
+def draw_room(
+    rng: np.random.Generator, options: dict[str, np.ndarray]
+) -> dict[str, np.ndarray]:
+    """Room sizes, occupancy, permanence and ventilation of the room and CO2 scenarios."""
+    size = len(next(iter(options.values())))
+
+    return {
+        "Ar": rng.uniform(10, 500, size),
+        "Hr": rng.uniform(2.4, 6, size),
+        "n_people": rng.integers(1, 101, size),
+        "permanence": rng.integers(10, 241, size),
+        "ACH_custom": np.exp(rng.uniform(np.log(0.1), np.log(50), size)),
+        "inf_percent": rng.uniform(1, 50, size),
+        "inf_min": rng.integers(1, 4, size),
+    }
+
+
+def draw_ach(
+    rng: np.random.Generator, options: dict[str, np.ndarray]
+) -> dict[str, np.ndarray]:
+    """Rooms of the ACH scenarios and the maximum risk of each one.
+
+    The maximum risk is the final risk of the room halfway between two steps of the solver, at an ACH drawn between 0.2 and 20.
+    Drawing it directly would leave most rooms below it without ventilation and a few unmasked ones thousands of steps away.
+    """
+    size = len(next(iter(options.values())))
+    rooms = {
+        "area": rng.uniform(30, 500, size),
+        "altura": rng.uniform(2.4, 4, size),
+        "aforo": rng.integers(1, 41, size),
+        "permanencia": rng.integers(15, 181, size),
+        "inf_percent": rng.uniform(1, 20, size),
+    }
+    steps = np.round(
+        np.exp(rng.uniform(np.log(0.2), np.log(20), size)) / REFERENCE_ACH_STEP
+    )
+
+    rooms["set_risk"] = np.array(
+        [
+            reference_room_calculation(
+                Ar=rooms["area"][room],
+                Hr=rooms["altura"][room],
+                s_ACH_type=6,
+                n_people=int(rooms["aforo"][room]),
+                Vli=options["viral_load"][room],
+                mask_type=options["mask_type"][room],
+                activity_type=options["actividad"][room],
+                mask_type_sick=options["mask_type"][room],
+                activity_type_sick=options["actividad"][room],
+                cutoff_type=options["cutoff_type"][room],
+                verticalv_type=0,
+                permanence=int(rooms["permanencia"][room]),
+                ACH_custom=(steps[room] - 0.5) * REFERENCE_ACH_STEP,
+                inf_checked=True,
+                inf_percent=rooms["inf_percent"][room],
+                inf_min=1,
+                occupancy_type=0,
+                s_filter_type=0,
+                outside_air=100,
+            )["risk"][-1]
+            for room in range(size)
+        ]
+    )
+
+    return rooms
+
+
+def scenario_corpus(engine: Engine, size: int, seed: int = 0) -> list[Scenario]:
+    """Generates the scenarios an engine is compared on.
+
+    Every value of every option appears in the corpus as long as it has as many scenarios as the option with the most values.
+    The options are shuffled independently, so their combinations vary with the seed.
+
+    Args:
+        engine (Engine): Engine the scenarios are for
+        size (int): Number of scenarios
+        seed (int): Seed of the generator. Defaults to 0.
+
+    Returns:
+        list[Scenario]: Keyword arguments of the engine for every scenario
+    """
+    rng = np.random.default_rng(seed)
+
+    values: dict[str, np.ndarray] = {}
+    for name, options in engine.options.items():
+        column = np.resize(np.array(options, dtype=object), size)
+        rng.shuffle(column)
+        values[name] = column
+    values.update(engine.draw(rng, values))
+
+    # Engines index their tables with the options, numpy scalars are turned into Python ones
+    return [
+        {name: np.asarray(column[scenario]).item() for name, column in values.items()}
+        for scenario in range(size)
+    ]
+
+
+# Tolerances of the time series, a few ulps over the hundreds of steps of a simulation
+SERIES_TOLERANCE = Tolerance(absolute=1e-12, relative=1e-9)
+
+# Levels are in ppm, hundreds over the background
+CO2_TOLERANCE = Tolerance(absolute=1e-9, relative=1e-9)
+
+ROOM_OPTIONS = {
+    "mask_type": range(5),
+    "activity_type": range(3),
+    "mask_type_sick": range(5),
+    "activity_type_sick": range(3),
+    "cutoff_type": range(5),
+    "verticalv_type": range(2),
+    "s_filter_type": range(6),
+    "occupancy_type": range(2),
+    "s_ACH_type": range(7),
+    "Vli": range(12),
+    "inf_checked": (True, False),
+    "outside_air": (0, 25, 50, 100),
+}
+
+ENGINES = {
+    engine.name: engine
+    for engine in [
+        Engine(
+            "room_calculation",
+            fast_room_calculation,
+            reference_room_calculation,
+            ROOM_OPTIONS,
+            draw_room,
+            {column: SERIES_TOLERANCE for column in ROOM_COLUMNS},
+            corpus=2000,
+        ),
+        Engine(
+            "room_co2_calculation",
+            fast_room_co2_calculation,
+            reference_room_co2_calculation,
+            ROOM_OPTIONS,
+            draw_room,
+            {
+                **{column: SERIES_TOLERANCE for column in ROOM_COLUMNS},
+                "co2": CO2_TOLERANCE,
+            },
+            corpus=2000,
+        ),
+        Engine(
+            "co2_concentration",
+            fast_co2_concentration,
+            reference_co2_concentration,
+            {
+                "activity_type": range(3),
+                "occupancy_type": range(2),
+                "s_ACH_type": range(7),
+                "inf_checked": (True, False),
+                "outside_air": (0, 25, 50, 100),
+            },
+            draw_room,
+            {
+                "time": SERIES_TOLERANCE,
+                "n_people": SERIES_TOLERANCE,
+                "co2": CO2_TOLERANCE,
+            },
+            corpus=2000,
+        ),
+        Engine(
+            "co2_batch",
+            fast_co2_batch,
+            reference_co2_concentration,
+            {
+                "activity_type": range(3),
+                "occupancy_type": range(2),
+                "s_ACH_type": range(7),
+                "inf_checked": (True, False),
+                "outside_air": (0, 25, 50, 100),
+            },
+            draw_room,
+            {"co2": CO2_TOLERANCE},
+            corpus=2000,
+        ),
+        Engine(
+            "ach_required",
+            fast_ach_required,
+            reference_ach_required,
+            {
+                "mask_type": range(5),
+                "actividad": range(3),
+                "cutoff_type": range(5),
+                "viral_load": range(12),
+            },
+            draw_ach,
+            # Far below a step of the solver, a replacement has to stop at the same step
+            {"ach": Tolerance(absolute=1e-9, relative=0)},
+            corpus=200,
+        ),
+    ]
+}
+
+
+def column_error(
+    engine: Engine, column: str, fast: list[Columns], reference: list[Columns]
+) -> ColumnError:
+    """Compares an output column of an engine with its reference over a corpus.
+
+    Args:
+        engine (Engine): Engine compared
+        column (str): Output column
+        fast (list[Columns]): Outputs of the engine for every scenario
+        reference (list[Columns]): Outputs of the reference for the same scenarios
+
+    Returns:
+        ColumnError: Largest differences and number of scenarios outside the tolerance
+    """
+    tolerance = engine.tolerances[column]
+    max_absolute = 0.0
+    max_relative = 0.0
+    failures = 0
+    worst_scenario = None
+
+    for scenario, (values, expected) in enumerate(zip(fast, reference)):
+        actual = values.get(column)
+
+        # A missing column or a different time grid can't be compared value by value
+        if actual is None or actual.shape != expected[column].shape:
+            failures += 1
+            max_absolute = max_relative = float("inf")
+            worst_scenario = scenario
+            continue
+
+        absolute = np.abs(actual - expected[column])
+        # Relative differences are only meaningful where the reference is above the absolute tolerance
+        significant = np.abs(expected[column]) > tolerance.absolute
+        relative = absolute[significant] / np.abs(expected[column][significant])
+
+        scenario_absolute = float(np.max(absolute, initial=0.0))
+        if scenario_absolute > max_absolute or not isfinite(scenario_absolute):
+            max_absolute = scenario_absolute
+            worst_scenario = scenario
+        max_relative = max(max_relative, float(np.max(relative, initial=0.0)))
+
+        if not np.all(
+            absolute
+            <= tolerance.absolute + tolerance.relative * np.abs(expected[column])
+        ):
+            failures += 1
+
+    return ColumnError(
+        engine.name,
+        column,
+        len(reference),
+        max_absolute,
+        max_relative,
+        failures,
+        worst_scenario,
+        tolerance,
+    )
+
+
+def run_equivalence(
+    names: Optional[list[str]] = None, scale: float = 1.0, seed: int = 0
+) -> list[ColumnError]:
+    """Compares the engines with their references over seeded corpora.
+
+    Args:
+        names (Optional[list[str]]): Engines to compare, keys of ENGINES. Defaults to all of them.
+        scale (float): Fraction of the corpus of every engine, never below the scenarios needed to cover all its options. Defaults to 1.0.
+        seed (int): Seed of the corpora. Defaults to 0.
+
+    Returns:
+        list[ColumnError]: Differences of every output column of every engine
+    """
+    errors = []
+
+    for name in names or list(ENGINES):
+        engine = ENGINES[name]
+        coverage = max(len(options) for options in engine.options.values())
+        scenarios = scenario_corpus(
+            engine, max(ceil(engine.corpus * scale), coverage), seed
+        )
+
+        fast = [engine.fast(**scenario) for scenario in scenarios]
+        reference = [engine.reference(**scenario) for scenario in scenarios]
+
+        errors.extend(
+            column_error(engine, column, fast, reference)
+            for column in engine.tolerances
+        )
+
+    return errors
+
+
+def equivalence_table(errors: list[ColumnError]) -> Table:
+    """Builds the table of the largest differences of every output column.
+
+    Args:
+        errors (list[ColumnError]): Differences from `run_equivalence`
+
+    Returns:
+        Table: Rich table with the differences, tolerances and failing scenarios of every column
+    """
+    table = Table(title="Engines vs. reference implementations")
+
+    table.add_column("Engine")
+    table.add_column("Column")
+    table.add_column("Scenarios", justify="right")
+    table.add_column("Max abs. error", justify="right")
+    table.add_column("Max rel. error", justify="right")
+    table.add_column("Tolerance (abs./rel.)", justify="right")
+    table.add_column("Failures", justify="right")
+
+    for error in errors:
+        table.add_row(
+            error.engine,
+            error.column,
+            f"{error.scenarios:,}",
+            f"{error.max_absolute:.3g}",
+            f"{error.max_relative:.3g}",
+            f"{error.tolerance.absolute:g} / {error.tolerance.relative:g}",
+            f"{error.failures:,}"
+            if error.passed
+            else f"[bold red]{error.failures:,}[/bold red]",
+        )
+
+    return table
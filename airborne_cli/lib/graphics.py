@@ -1,12 +1,17 @@
+from pathlib import Path
+
 import pandas as pd
 import plotly.graph_objects as go  # type:ignore
 import plotly.io as pio  # type:ignore
 
-from ..settings.config import settings
+from ..settings.io import load_config
+from ..utils.store import RISK_COLUMN
 
 
 def graphics_config() -> None:
     """Sets config options for graphics"""
+    settings = load_config()
+
     pio.templates.default = settings["graphics"]["template"]
     pio.kaleido.scope.default_format = settings["graphics"]["format"]
     pio.kaleido.scope.default_width = settings["graphics"]["default_width"]
@@ -14,6 +19,39 @@ def graphics_config() -> None:
     pio.kaleido.scope.default_scale = settings["graphics"]["scale"]
 
 
+def sweep_parameters(data: pd.DataFrame, unit: str) -> list[str]:
+    """Returns the infected percentages or aerosol cutoffs of a risk sweep, as written in its risk columns.
+
+    Args:
+        data (pd.DataFrame): Risk sweep
+        unit (str): `inf` for infected percentages or `um` for aerosol cutoffs
+
+    Returns:
+        list[str]: Parameters of the sweep in the order of its columns
+    """
+    parameters = []
+
+    for column in data.columns:
+        match = RISK_COLUMN.match(column)
+
+        if match and match["unit"] == unit and match["parameter"] not in parameters:
+            parameters.append(match["parameter"])
+
+    return parameters
+
+
+def export_figure(figure: go.Figure, path: Path) -> None:
+    """Writes a figure as an image with the configured size and format. Used to export figures from worker processes.
+
+    Args:
+        figure (go.Figure): Figure to export
+        path (Path): Path of the image
+    """
+    graphics_config()
+
+    figure.write_image(path)
+
+
 def risk_ach_inf_graph(data: pd.DataFrame, colors: list[str]) -> dict[str, go.Figure]:
     """Makes Risk vs ACH graphs for the data given. Considers different percentages of occupancy
 
@@ -35,7 +73,7 @@ def risk_ach_inf_graph(data: pd.DataFrame, colors: list[str]) -> dict[str, go.Fi
             graph_data = pabellon_data[pabellon_data["ambiente"] == ambiente]
             ach_natural = graph_data["ach_natural"].unique()[0]
 
-            for inf in graph_data["infected"].unique():
+            for inf in sweep_parameters(graph_data, "inf"):
                 fig.add_trace(
                     go.Scatter(
                         x=graph_data["ach"],
@@ -160,7 +198,7 @@ def risk_ach_aerosol_graph(
 
             graph_data = pabellon_data[pabellon_data["ambiente"] == ambiente]
 
-            for aerosol in data["aerosol"].unique():
+            for aerosol in sweep_parameters(graph_data, "um"):
                 fig.add_trace(
                     go.Scatter(
                         x=graph_data["flujo"],
@@ -169,7 +207,7 @@ def risk_ach_aerosol_graph(
                         name="Aforo 30%",
                         marker_color=colors[0],
                         legendgroup=f"{aerosol}_um",
-                        legendgrouptitle=f"Aerosol cutoff {aerosol}um",
+                        legendgrouptitle_text=f"Aerosol cutoff {aerosol}um",
                     )
                 )
 
@@ -181,7 +219,7 @@ def risk_ach_aerosol_graph(
                         name="Aforo 40%",
                         marker_color=colors[1],
                         legendgroup=f"{aerosol}_um",
-                        legendgrouptitle=f"Aerosol cutoff {aerosol}um",
+                        legendgrouptitle_text=f"Aerosol cutoff {aerosol}um",
                     )
                 )
                 fig.add_trace(
@@ -192,7 +230,7 @@ def risk_ach_aerosol_graph(
                         name="Aforo 50%",
                         marker_color=colors[2],
                         legendgroup=f"{aerosol}_um",
-                        legendgrouptitle=f"Aerosol cutoff {aerosol}um",
+                        legendgrouptitle_text=f"Aerosol cutoff {aerosol}um",
                     )
                 )
 
@@ -204,7 +242,7 @@ def risk_ach_aerosol_graph(
                         name="Aforo 70%",
                         marker_color=colors[3],
                         legendgroup=f"{aerosol}_um",
-                        legendgrouptitle=f"Aerosol cutoff {aerosol}um",
+                        legendgrouptitle_text=f"Aerosol cutoff {aerosol}um",
                     )
                 )
 
@@ -216,7 +254,7 @@ def risk_ach_aerosol_graph(
                         name="Aforo 90%",
                         marker_color=colors[4],
                         legendgroup=f"{aerosol}_um",
-                        legendgrouptitle=f"Aerosol cutoff {aerosol}um",
+                        legendgrouptitle_text=f"Aerosol cutoff {aerosol}um",
                     )
                 )
 
@@ -228,7 +266,7 @@ def risk_ach_aerosol_graph(
                         name="Aforo 100%",
                         marker_color=colors[5],
                         legendgroup=f"{aerosol}_um",
-                        legendgrouptitle=f"Aerosol cutoff {aerosol}um",
+                        legendgrouptitle_text=f"Aerosol cutoff {aerosol}um",
                     )
                 )
 
@@ -4,7 +4,35 @@ from math import ceil
 import numpy as np
 import pandas as pd
 
+from airborne_cli.lib.ach import CO2_BACKGROUND
+from airborne_cli.lib.ach import TIME_STEPS
+from airborne_cli.lib.ach import co2_levels
+from airborne_cli.lib.ach import co2_model
+from airborne_cli.lib.ach import infected_over_time
+from airborne_cli.lib.ach import infection_series
 from airborne_cli.lib.ach import room_calculation
+from airborne_cli.lib.ach import room_model
+from airborne_cli.settings.model import cutoff_index
+from airborne_cli.utils.options import AerosolCutoff
+
+
+# ACH values and occupancy percentages every room is simulated at in the risk sweeps
+ACH_SWEEP = np.geomspace(0.5, 50, num=25).tolist()
+OCCUPANCY_SWEEP = [30, 40, 50, 70, 90, 100]
+# Rooms the CO2 sweep solves at once, every series of a room holds ACH_SWEEP x OCCUPANCY_SWEEP x TIME_STEPS values
+CO2_BATCH_ROOMS = 16
+
+
+def sweep_simulations(sweep: pd.DataFrame) -> int:
+    """Returns the room simulations run to get the results of a risk sweep, one per risk column of every row.
+
+    Args:
+        sweep (pd.DataFrame): Results of `ach_risk_inf_percent_calculation`, `ach_risk_aerosol_calculation` or `ach_risk_co2_calculation`
+
+    Returns:
+        int: Number of room simulations
+    """
+    return len(sweep) * sum(column.startswith("riesgo_") for column in sweep.columns)
 
 
 def ach_risk_inf_percent_calculation(
@@ -19,8 +47,6 @@ def ach_risk_inf_percent_calculation(
     Returns:
         pd.DataFrame: Data frame with the risk evaluation for different occupancies at different rates of infections
     """
-    ach_list = np.geomspace(0.5, 50, num=25).tolist()
-    occupancy_list = [0.3, 0.4, 0.5, 0.7, 0.9, 1]
 
     results: dict[str, list[str | int | float | list[float]]] = {
         "ambiente": [],
@@ -46,7 +72,7 @@ def ach_risk_inf_percent_calculation(
         results[f"riesgo_100_{infected}_inf"] = []
 
     for ambiente, ach in product(
-        data.itertuples(index=False, name="Ambiente"), ach_list
+        data.itertuples(index=False, name="Ambiente"), ACH_SWEEP
     ):
         results["ambiente"].append(ambiente.Ambiente)
         results["pabellon"].append(ambiente.Pabellon)
@@ -54,24 +80,26 @@ def ach_risk_inf_percent_calculation(
         results["Aforo_100"].append(ambiente.Aforo_100)
         results["ach_natural"].append(ambiente.ACH_natural)
 
-        for infected in inf_percent:
-            results["infected"].append(inf_percent)
+        results["infected"].append(inf_percent)
 
-            for occupancy in occupancy_list:
-                (_, R, _, _, _, _, _) = room_calculation(
+        for infected in inf_percent:
+            for occupancy in OCCUPANCY_SWEEP:
+                room = room_calculation(
                     Ar=ambiente.Area,
                     Hr=ambiente.Altura,
-                    n_people=ceil(ambiente.Aforo_100 * occupancy),
+                    n_people=ceil(ambiente.Aforo_100 * occupancy / 100),
                     activity_type=ambiente.Actividad,
                     activity_type_sick=ambiente.Actividad,
                     permanence=ambiente.Permanencia,
                     ACH_custom=ach,
                     inf_percent=infected,
                 )
-                results[f"aforo_{occupancy * 100}_{infected}_inf"].append(
-                    ceil(ambiente.Aforo_100 * occupancy)
+                results[f"aforo_{occupancy}_{infected}_inf"].append(
+                    ceil(ambiente.Aforo_100 * occupancy / 100)
+                )
+                results[f"riesgo_{occupancy}_{infected}_inf"].append(
+                    room.iloc[-1]["risk"]
                 )
-                results[f"riesgo_{occupancy * 100}_{infected}_inf"].append(R[-1])
 
     results_df = pd.DataFrame.from_dict(results)
 
@@ -79,19 +107,17 @@ def ach_risk_inf_percent_calculation(
 
 
 def ach_risk_aerosol_calculation(
-    data: pd.DataFrame, aerosol_cutoff: list[int]
+    data: pd.DataFrame, aerosol_cutoff: list[str]
 ) -> pd.DataFrame:
     """ "Calculates the variation in risk at different ACH values at maximum occupancy for different aerosol cuttof values. Returns a dataframe rates of infection at different ach.
 
     Args:
         data (pd.DataFrame): Data for processing
-        aerosol_cutoff (list[int]): List of aerosol cuttoff values fo analysis
+        aerosol_cutoff (list[str]): List of aerosol cuttoff values fo analysis, in micrometers
 
     Returns:
         pd.DataFrame: Data frame with maximum values of risk for different ach/flow rates for different cutoff values
     """
-    ach_list = np.geomspace(0.5, 50, num=25).tolist()
-    occupancy_list = [0.3, 0.4, 0.5, 0.7, 0.9, 1]
 
     results: dict[str, list[str | int | float | list[float]]] = {
         "ambiente": [],
@@ -117,7 +143,7 @@ def ach_risk_aerosol_calculation(
         results[f"riesgo_100_{aerosol}_um"] = []
 
     for ambiente, ach in product(
-        data.itertuples(index=False, name="Ambiente"), ach_list
+        data.itertuples(index=False, name="Ambiente"), ACH_SWEEP
     ):
         results["ambiente"].append(ambiente.Ambiente)
         results["pabellon"].append(ambiente.Pabellon)
@@ -125,25 +151,25 @@ def ach_risk_aerosol_calculation(
         results["Aforo_100"].append(ambiente.Aforo_100)
         results["ach"].append(ach)
 
-        for cutoff in aerosol_cutoff:
-            results["aerosol"].append(cutoff)
+        results["aerosol"].append(aerosol_cutoff)
 
-            for occupancy in occupancy_list:
-                (_, R, _, _, _, _, _) = room_calculation(
+        for cutoff in aerosol_cutoff:
+            for occupancy in OCCUPANCY_SWEEP:
+                room = room_calculation(
                     Ar=ambiente.Area,
                     Hr=ambiente.Altura,
-                    n_people=ambiente.Aforo_100 * occupancy,
+                    n_people=ceil(ambiente.Aforo_100 * occupancy / 100),
                     activity_type=ambiente.Actividad,
                     activity_type_sick=ambiente.Actividad,
                     permanence=ambiente.Permanencia,
                     ACH_custom=ach,
                     inf_percent=10,
-                    cutoff_type=cutoff,
+                    cutoff_type=cutoff_index(AerosolCutoff(cutoff)),
                 )
-                results[f"aforo_{occupancy * 100}_{cutoff}_um"].append(
-                    ceil(ambiente.Aforo_100 * occupancy)
+                results[f"aforo_{occupancy}_{cutoff}_um"].append(
+                    ceil(ambiente.Aforo_100 * occupancy / 100)
                 )
-                results[f"riesgo_{occupancy * 100}_{cutoff}_um"].append(R[-1])
+                results[f"riesgo_{occupancy}_{cutoff}_um"].append(room.iloc[-1]["risk"])
 
     results_df = pd.DataFrame.from_dict(results)
 
@@ -152,5 +178,126 @@ def ach_risk_aerosol_calculation(
     return results_df
 
 
-# def ach_risk_co2_calculation():  # TODO: New CO2 risk feature
-#     """ """
+def co2_risk_batch(rooms: pd.DataFrame, inf_percent: float) -> dict[str, np.ndarray]:
+    """Solves the risk of infection and the CO2 concentration of a batch of rooms at every ACH and occupancy of the sweep at once.
+
+    Args:
+        rooms (pd.DataFrame): Rooms to solve
+        inf_percent (float): Percentage of infected people
+
+    Returns:
+        dict[str, np.ndarray]: People, risk, CO2 at the end of the permanence and steady state CO2, shaped rooms x ACH x occupancies
+    """
+    area = rooms["Area"].to_numpy(dtype=float)[:, None, None]
+    height = rooms["Altura"].to_numpy(dtype=float)[:, None, None]
+    activity = rooms["Actividad"].to_numpy(dtype=int)[:, None, None]
+    dt = rooms["Permanencia"].to_numpy(dtype=float)[:, None, None] * 60 / TIME_STEPS
+    ach = np.array(ACH_SWEEP)[None, :, None]
+
+    shape = (len(rooms), len(ACH_SWEEP), len(OCCUPANCY_SWEEP))
+    people = np.ceil(
+        rooms["Aforo_100"].to_numpy(dtype=float)[:, None, None]
+        * np.array(OCCUPANCY_SWEEP)[None, None, :]
+        / 100
+    )
+    # Occupancy is constant, a single time step stands for all of them
+    people_steps = np.broadcast_to(people, shape)[..., None]
+
+    model = room_model(
+        Ar=area,
+        Hr=height,
+        activity_type=activity,
+        activity_type_sick=activity,
+        ACH_custom=ach,
+    )
+    model_co2 = co2_model(Ar=area, Hr=height, activity_type=activity, ACH_custom=ach)
+
+    infected = infected_over_time(people_steps, inf_percent, 1, True)
+    (_, _, risk) = infection_series(infected, model, dt)
+    co2 = co2_levels(people_steps, model_co2, dt)
+
+    return {
+        "people": np.broadcast_to(people, shape),
+        "risk": risk[..., -1],
+        "co2": co2[..., -1],
+        "co2_steady": CO2_BACKGROUND
+        + people * model_co2.emission / (model_co2.volume * model_co2.loss_rate),
+    }
+
+
+def co2_at_risk(risk: np.ndarray, co2: np.ndarray, max_risk: float) -> np.ndarray:
+    """Finds the CO2 concentration a room reaches when its risk of infection is at the threshold, interpolating between the ACH of the sweep.
+    Risk and CO2 both fall as ACH rises, so a room that stays below that CO2 stays below the threshold.
+
+    Args:
+        risk (np.ndarray): Risk at the end of the permanence, with the ACH of the sweep as second axis
+        co2 (np.ndarray): CO2 at the end of the permanence in ppm, the shape of `risk`
+        max_risk (float): Risk threshold, as a fraction
+
+    Returns:
+        np.ndarray: CO2 at the threshold in ppm, the shape of `risk` without its second axis. NaN where the sweep doesn't cross the threshold
+    """
+    # Index of the first ACH below the threshold
+    crossing = np.sum(risk > max_risk, axis=1, keepdims=True)
+    bracketed = (crossing > 0) & (crossing < risk.shape[1])
+    upper = np.clip(crossing, 1, risk.shape[1] - 1)
+
+    (risk_above, risk_below) = (
+        np.take_along_axis(risk, upper - 1, axis=1),
+        np.take_along_axis(risk, upper, axis=1),
+    )
+    (co2_above, co2_below) = (
+        np.take_along_axis(co2, upper - 1, axis=1),
+        np.take_along_axis(co2, upper, axis=1),
+    )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = (risk_above - max_risk) / (risk_above - risk_below)
+
+    return np.where(bracketed, co2_above + fraction * (co2_below - co2_above), np.nan)[
+        :, 0
+    ]
+
+
+def ach_risk_co2_calculation(
+    data: pd.DataFrame, max_risk: float, inf_percent: float = 10
+) -> pd.DataFrame:
+    """Calculates the risk of infection and the CO2 concentration at different ACH values for different occupancy percentages, and the CO2 concentration at the risk threshold so CO2 monitors can be used as a proxy of the risk.
+    Rooms are solved in batches of CO2_BATCH_ROOMS, every ACH and occupancy at once.
+
+    Args:
+        data (pd.DataFrame): Data to process
+        max_risk (float): Risk threshold, as a fraction
+        inf_percent (float, optional): Percentage of infected people. Defaults to 10.
+
+    Returns:
+        pd.DataFrame: Data frame with the occupancy, risk, CO2 at the end of the permanence, steady state CO2 and CO2 at the risk threshold for every occupancy, per room and ACH
+    """
+    batches = [
+        co2_risk_batch(data.iloc[start : start + CO2_BATCH_ROOMS], inf_percent)
+        for start in range(0, len(data), CO2_BATCH_ROOMS)
+    ]
+    (people, risk, co2, co2_steady) = (
+        np.concatenate([batch[name] for batch in batches])
+        if batches
+        else np.empty((0, len(ACH_SWEEP), len(OCCUPANCY_SWEEP)))
+        for name in ("people", "risk", "co2", "co2_steady")
+    )
+    co2_threshold = np.repeat(co2_at_risk(risk, co2, max_risk), len(ACH_SWEEP), axis=0)
+
+    results = {
+        "ambiente": data["Ambiente"].to_numpy().repeat(len(ACH_SWEEP)),
+        "pabellon": data["Pabellon"].to_numpy().repeat(len(ACH_SWEEP)),
+        "volumen": data["Volumen"].to_numpy().repeat(len(ACH_SWEEP)),
+        "Aforo_100": data["Aforo_100"].to_numpy().repeat(len(ACH_SWEEP)),
+        "ach": np.tile(ACH_SWEEP, len(data)),
+    }
+
+    for index, occupancy in enumerate(OCCUPANCY_SWEEP):
+        results[f"aforo_{occupancy}_co2"] = people[:, :, index].reshape(-1).astype(int)
+        results[f"riesgo_{occupancy}_co2"] = risk[:, :, index].reshape(-1)
+        results[f"co2_{occupancy}_ppm"] = co2[:, :, index].reshape(-1)
+        results[f"co2_estable_{occupancy}_ppm"] = co2_steady[:, :, index].reshape(-1)
+        results[f"co2_umbral_{occupancy}_ppm"] = co2_threshold[:, index]
+
+    return pd.DataFrame(results)
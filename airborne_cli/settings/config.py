@@ -7,6 +7,7 @@ from rich.console import Console
 from typing_extensions import Annotated
 
 from ..utils.options import AerosolCutoff
+from ..utils.options import Compression
 from ..utils.options import GraphicFormat
 from ..utils.options import GraphicTemplate
 from ..utils.options import MaskType
@@ -121,9 +122,23 @@ def general(
         SaveFormat,
         typer.Option(
             case_sensitive=False,
-            help="Set the default format for saving calculation results. Currently supperted: csv and xlsx",
+            help="Set the default format for saving calculation results. Currently supperted: csv, xlsx, workbook, parquet, feather and sqlite",
         ),
     ] = SaveFormat(settings["general"]["save_format"]),
+    compression: Annotated[
+        Compression,
+        typer.Option(
+            case_sensitive=False,
+            help="Set the compression codec for parquet and feather results.",
+        ),
+    ] = Compression(settings["general"]["compression"]),
+    jobs: Annotated[
+        int,
+        typer.Option(
+            min=1,
+            help="Set the default number of worker processes used by each command.",
+        ),
+    ] = settings["general"]["jobs"],
     aforo: Annotated[
         list[float],
         typer.Option(
@@ -147,6 +162,8 @@ def general(
     settings["general"]["save_graphics"] = save_graphics
     settings["general"]["save"] = save
     settings["general"]["save_format"] = save_format
+    settings["general"]["compression"] = compression.value
+    settings["general"]["jobs"] = jobs
     settings["general"]["aforo"] = aforo
     settings["general"]["default_aerosol"] = default_aerosol
 
@@ -188,6 +205,21 @@ def required_ach(
             help="Maximum size of particles considered aerosol",
         ),
     ] = AerosolCutoff(settings["general"]["default_aerosol"]),
+    max_co2: Annotated[
+        float,
+        typer.Option(
+            min=0,
+            help="Set CO2 ceiling for required ACH calculations, in ppm",
+        ),
+    ] = settings["ach"]["max_co2"],
+    outside_air: Annotated[
+        float,
+        typer.Option(
+            min=0,
+            max=100,
+            help="Set percentage of outdoor air in the supply for required ACH calculations by CO2",
+        ),
+    ] = settings["ach"]["outside_air"],
 ) -> None:
     """
     Sets configuration for required ACH calculations.
@@ -199,6 +231,8 @@ def required_ach(
     settings["ach"]["inf_percent"] = inf_percent
     settings["ach"]["viral_load"] = viral_load
     settings["ach"]["aerosil"] = aerosol.value
+    settings["ach"]["max_co2"] = max_co2
+    settings["ach"]["outside_air"] = outside_air
 
     save_config(settings)
 
@@ -2,6 +2,7 @@
 Module tha hold the import and exprt functions for the configuration app.
 """
 
+import os
 from pathlib import Path
 from typing import Any
 
@@ -14,17 +15,45 @@ from tomlkit import nl
 from tomlkit import table
 
 
+# Parsed configuration per settings file, along with the modification time it was parsed at
+CONFIG_CACHE: dict[Path, tuple[int, dict[str, Any]]] = {}
+
+
+def settings_path() -> Path:
+    """Returns the path of the settings file. Defaults to the one installed with the package, can be changed with the AIRBORNE_CLI_SETTINGS environment variable.
+
+    Returns:
+        Path: Path of the settings file
+    """
+    return Path(
+        os.environ.get(
+            "AIRBORNE_CLI_SETTINGS", Path(__file__).parent.parent / "settings.toml"
+        )
+    )
+
+
 def load_config() -> dict[str, Any]:
     """Loads TOML configuration file and returns a dictionary with all the variables.
+    The file is parsed once per process, and again only when its modification time changes.
 
     Returns:
         TOMLDocument: Dictionary with settings
     """
-    if Path("airborne_cli/settings.toml").exists():
-        with open("airborne_cli/settings.toml", encoding="utf-8") as settings_file:
-            config = tomlkit.load(settings_file)
+    config_path = settings_path()
+
+    if config_path.exists():
+        modified = config_path.stat().st_mtime_ns
+        cached = CONFIG_CACHE.get(config_path)
 
-        return dict(config)
+        if cached is not None and cached[0] == modified:
+            return cached[1]
+
+        with open(config_path, encoding="utf-8") as settings_file:
+            config = dict(tomlkit.load(settings_file))
+
+        CONFIG_CACHE[config_path] = (modified, config)
+
+        return config
     else:
         print(
             "[bold red]Alert![/bold red] Settings file not found. Generating default file."
@@ -45,6 +74,7 @@ def generate_config() -> tomlkit.TOMLDocument:
     general = table()
     ach = table()
     ashrae = table()
+    risk = table()
     graphics = table()
 
     general["ach"] = False
@@ -55,6 +85,8 @@ def generate_config() -> tomlkit.TOMLDocument:
     general["save_graphics"] = True
     general["save"] = True
     general["save_format"] = "csv"
+    general["compression"] = "none"
+    general["jobs"] = 1
     general["aforo"] = [30.0, 40.0, 50.0, 70.0, 100.0]
     general["default_aerosol"] = "40"
 
@@ -63,6 +95,8 @@ def generate_config() -> tomlkit.TOMLDocument:
     ach["inf_percent"] = [10.0]
     ach["viral_load"] = "10"
     ach["aerosol"] = ["20", "40", "100"]
+    ach["max_co2"] = 1000.0
+    ach["outside_air"] = 100.0
 
     ashrae["oficina"] = {"rate_people": 2.5, "rate_area": 0.3}
     ashrae["teatro"] = {"rate_people": 5, "rate_area": 0.3}
@@ -71,6 +105,10 @@ def generate_config() -> tomlkit.TOMLDocument:
     ashrae["laboratorio"] = {"rate_people": 5, "rate_area": 0.9}
     ashrae["laboratorio_computacion"] = {"rate_people": 5, "rate_area": 0.6}
 
+    risk["risk_inf"] = True
+    risk["risk_aerosol"] = True
+    risk["risk_co2"] = False
+
     graphics["template"] = "plotly_white"
     graphics["color_scheme"] = [
         "#458588",
@@ -90,6 +128,11 @@ def generate_config() -> tomlkit.TOMLDocument:
     config.add(nl())
     config.add("ach", ach)
     config.add(nl())
+    config.add("ashrae", ashrae)
+    config.add(nl())
+    config.add("risk", risk)
+    config.add(nl())
+    config.add("graphics", graphics)
 
     return config
 
@@ -100,11 +143,13 @@ def save_config(config: dict[str, Any]) -> None:
     Args:
         config (tomlkit.TOMLDocument): Config object ready to save
     """
-    with open(
-        "airborne_cli/settings.toml", mode="w", encoding="utf-8"
-    ) as settings_file:
+    config_path = settings_path()
+
+    with open(config_path, mode="w", encoding="utf-8") as settings_file:
         settings_file.write(tomlkit.dumps(config))
 
+    CONFIG_CACHE[config_path] = (config_path.stat().st_mtime_ns, dict(config))
+
 
 def show_general() -> Panel:
     """Pretty prints general settings to console
@@ -0,0 +1,137 @@
+"""
+Model parameters compiled from the settings. Values the engines need are resolved once per run instead of on every row.
+"""
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from ..utils.options import AerosolCutoff
+from ..utils.options import MaskType
+from ..utils.options import OccupancyType
+from ..utils.options import ViralLoad
+
+
+@dataclass(frozen=True, slots=True)
+class AshraeRates:
+    """ASHRAE 62.1 ventilation rates per room type, stored as arrays for vectorized lookup."""
+
+    room_types: pd.Index
+    rate_people: npt.NDArray[np.float64]
+    rate_area: npt.NDArray[np.float64]
+
+    def lookup(
+        self, room_types: pd.Series
+    ) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+        """Returns the rates for every room.
+
+        Args:
+            room_types (pd.Series): Room type of each room
+
+        Returns:
+            tuple: Rates per person and per area for each room
+        """
+        indices = self.room_types.get_indexer(room_types)
+
+        if (indices < 0).any():
+            unknown = sorted(set(room_types[indices < 0].astype(str)))
+            raise ValueError(
+                f"[bold red]Alert![/bold red] Room types {', '.join(unknown)} have no ASHRAE rates. Add them with airborne config ashrae"
+            )
+
+        return (self.rate_people[indices], self.rate_area[indices])
+
+
+@dataclass(frozen=True, slots=True)
+class ModelParameters:
+    """Parameters for the ACH, ASHRAE and risk engines with the option indices already resolved."""
+
+    max_risk: float
+    mask_type: int | None
+    viral_load: int
+    cutoff_type: int
+    inf_percent: tuple[float, ...]
+    aerosol: tuple[str, ...]
+    aforo: tuple[float, ...]
+    ashrae: AshraeRates
+
+
+def compile_settings(settings: dict[str, Any]) -> ModelParameters:
+    """Compiles the settings into the parameters used by the engines.
+
+    Args:
+        settings (dict[str, Any]): Settings as loaded from the configuration file
+
+    Returns:
+        ModelParameters: Parameters ready for the engines
+    """
+    mask_type = MaskType(settings["ach"]["mask_default"])
+
+    return ModelParameters(
+        max_risk=float(settings["ach"]["max_risk"]) / 100,
+        mask_type=mask_index(mask_type),
+        viral_load=int(ViralLoad(settings["ach"]["viral_load"]).value),
+        cutoff_type=cutoff_index(AerosolCutoff(settings["general"]["default_aerosol"])),
+        inf_percent=tuple(float(percent) for percent in settings["ach"]["inf_percent"]),
+        aerosol=tuple(str(cutoff) for cutoff in settings["ach"]["aerosol"]),
+        aforo=tuple(float(occupancy) for occupancy in settings["general"]["aforo"]),
+        ashrae=compile_ashrae(settings["ashrae"]),
+    )
+
+
+def compile_ashrae(ashrae_settings: dict[str, Any]) -> AshraeRates:
+    """Compiles the ASHRAE room types into rate arrays.
+
+    Args:
+        ashrae_settings (dict[str, Any]): Rates per room type from the settings
+
+    Returns:
+        AshraeRates: Rates ready for vectorized lookup
+    """
+    return AshraeRates(
+        room_types=pd.Index(list(ashrae_settings)),
+        rate_people=np.array(
+            [float(rates["rate_people"]) for rates in ashrae_settings.values()]
+        ),
+        rate_area=np.array(
+            [float(rates["rate_area"]) for rates in ashrae_settings.values()]
+        ),
+    )
+
+
+def mask_index(mask_type: MaskType) -> int | None:
+    """Returns the index of the mask type used by the model.
+
+    Args:
+        mask_type (MaskType): Mask type option
+
+    Returns:
+        int | None: Index of the mask, None when it's read from the `Mask Type` column of each room
+    """
+    return None if mask_type == MaskType.i5 else int(mask_type.name[1:])
+
+
+def cutoff_index(aerosol: AerosolCutoff) -> int:
+    """Returns the index of the aerosol cutoff used by the model.
+
+    Args:
+        aerosol (AerosolCutoff): Aerosol cutoff option
+
+    Returns:
+        int: Index of the cutoff
+    """
+    return int(aerosol.name[1:])
+
+
+def occupancy_index(occupancy: OccupancyType) -> int:
+    """Returns the index of the occupancy type used by the model.
+
+    Args:
+        occupancy (OccupancyType): Occupancy type option
+
+    Returns:
+        int: Index of the occupancy type, 0 for constant and 1 for Gaussian
+    """
+    return int(occupancy.name[1:])
@@ -1,18 +1,44 @@
+import hashlib
+import os
+from importlib import metadata
+import sys
+from collections.abc import Iterator
+from concurrent.futures import Executor
+from concurrent.futures import Future
 from pathlib import Path
+from typing import Optional
+from typing import TextIO
 
 import pandas as pd
 import plotly.graph_objects as go  # type:ignore
+import pyarrow as pa
+from openpyxl import Workbook
+from pyarrow import csv as pa_csv
 
-from .validation import validate_data_types
-from .validation import validate_existing_columns
-from .validation import validate_input
+from ..lib.graphics import export_figure
+from .metrics import increment
+from .profiling import stage
+from .store import save_sqlite
+from .validation import ENGINE_COLUMNS
+from .validation import OPTIONAL_COLUMNS
+from .validation import SCHEMA
+from .validation import engine_columns
+from .validation import validate_schema
+from .workers import SerialExecutor
 
 
-def load_data(data_in: Path) -> tuple[pd.DataFrame, Path] | None:
-    """Loads the data from the specified path
+ARROW_TYPES = {"object": pa.string(), "float64": pa.float64(), "int64": pa.int64()}
+
+# Cached Excel inputs kept, the least recently used ones are removed past it
+INPUT_CACHE_ENTRIES = 32
+
+
+def load_data(data_in: Path, use_cache: bool = True) -> tuple[pd.DataFrame, Path]:
+    """Loads the data from the specified path. Excel files are parsed and validated once, later loads of the same file read a Parquet copy from the input cache.
 
     Args:
         data_path (str): Data path for processing
+        use_cache (bool): Read and write the input cache for Excel files
 
     Returns:
         tuple: Tuple containing the data frame as well as the path to the data folder.
@@ -21,38 +47,204 @@ def load_data(data_in: Path) -> tuple[pd.DataFrame, Path] | None:
     data_format = data_path.suffix
     data_folder = data_path.parent
 
+    with stage("load"):
+        if use_cache and data_format == ".xlsx":
+            cache_path = input_cache_path(data_path)
+
+            if cache_path.exists():
+                data = pd.read_parquet(cache_path)
+                # The modification time records the last use for the eviction
+                cache_path.touch()
+                increment("airborne_cache_hits_total", cache="input")
+                increment("airborne_rows_loaded_total", len(data))
+                return (data, data_folder)
+
+            increment("airborne_cache_misses_total", cache="input")
+
+        match data_format:
+            case ".xlsx":
+                data = pd.read_excel(data_path)
+            case ".csv":
+                data = read_csv_typed(data_path)
+            case ".json":
+                data = pd.read_json(data_path)
+            case ".parquet":
+                data = pd.read_parquet(data_path)
+            case ".feather" | ".arrow":
+                data = pd.read_feather(data_path)
+            case _:
+                raise ValueError(
+                    f"[bold red]Alesrt![/bold red]Format {data_format} not supported. Only .xlsx, .csv, .json, .parquet and .feather are supported"
+                )
+
+    data = check_data(data)
+    increment("airborne_rows_loaded_total", len(data))
+
+    if use_cache and data_format == ".xlsx":
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            data.to_parquet(cache_path)
+        except (TypeError, ValueError):
+            # Columns with mixed types can't be stored in Parquet, those files are always parsed
+            cache_path.unlink(missing_ok=True)
+
+        prune_input_cache(cache_path.parent)
+
+    return (data, data_folder)
+
+
+def read_csv_typed(data_path: Path) -> pd.DataFrame:
+    """Reads a CSV file with the multithreaded pyarrow reader, parsing the known columns straight into their schema types instead of inferring them.
+
+    Args:
+        data_path (Path): CSV file to read
+
+    Returns:
+        pd.DataFrame: Data with the known columns already typed, integer columns as floats until they're validated
+    """
+    # Integer columns are parsed as floats so a value like 10.0 doesn't make the whole file be parsed again,
+    # the validation casts the required and optional ones back when no decimals are lost, as for chunked inputs
+    column_types = {
+        column: ARROW_TYPES["float64" if rule.dtype == "int64" else rule.dtype]
+        for column, rule in {**SCHEMA, **OPTIONAL_COLUMNS}.items()
+    }
+
+    table = pa_csv.read_csv(
+        data_path,
+        read_options=pa_csv.ReadOptions(use_threads=True),
+        convert_options=pa_csv.ConvertOptions(column_types=column_types),
+    )
+
+    return table.to_pandas()
+
+
+def input_cache_path(data_path: Path) -> Path:
+    """Returns the path of the cached Parquet copy for an input file. The name is derived from the file path, size, modification time and content,
+    and from the package version and the schema the copy was validated with, so any change to the source or to the validation gets a new entry.
+
+    Args:
+        data_path (Path): Input file
+
+    Returns:
+        Path: Path of the cached copy, it may not exist yet
+    """
+    data_path = Path(data_path).resolve()
+    file_stat = data_path.stat()
+
+    content_hash = hashlib.sha256()
+    with open(data_path, mode="rb") as data_file:
+        for block in iter(lambda: data_file.read(1024 * 1024), b""):
+            content_hash.update(block)
+
+    cache_key = hashlib.sha256(
+        f"{data_path}:{file_stat.st_size}:{file_stat.st_mtime_ns}:{content_hash.hexdigest()}:{cache_version()}".encode()
+    ).hexdigest()
+
+    cache_root = Path(os.environ.get("XDG_CACHE_HOME", Path.home().joinpath(".cache")))
+
+    return cache_root.joinpath("airborne-cli", "inputs", f"{cache_key}.parquet")
+
+
+def cache_version() -> str:
+    """Returns the part of the input cache keys that changes with the validation: the package version and the rules and names of the schema columns.
+
+    Returns:
+        str: Version of the cached copies
+    """
+    try:
+        package_version = metadata.version("airborne-cli")
+    except metadata.PackageNotFoundError:
+        package_version = "unknown"
+
+    return f"{package_version}:{SCHEMA}:{OPTIONAL_COLUMNS}:{ENGINE_COLUMNS}"
+
+
+def prune_input_cache(cache_folder: Path, entries: int = INPUT_CACHE_ENTRIES) -> None:
+    """Removes the least recently used copies of the input cache past a number of entries.
+
+    Args:
+        cache_folder (Path): Folder of the input cache
+        entries (int): Copies kept. Defaults to INPUT_CACHE_ENTRIES.
+    """
+    cached = sorted(
+        cache_folder.glob("*.parquet"),
+        key=lambda path: path.stat().st_mtime_ns,
+        reverse=True,
+    )
+
+    for cache_path in cached[entries:]:
+        cache_path.unlink(missing_ok=True)
+
+
+def load_data_chunks(data_in: Path, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Loads the data from the specified path in chunks, validating each one before yielding it.
+    A path of `-` reads newline-delimited JSON records from stdin.
+
+    Args:
+        data_in (Path): Data path for processing
+        chunk_size (int): Number of rows read per chunk
+
+    Yields:
+        pd.DataFrame: Validated chunk of the input data
+    """
+    data_path: Path | TextIO = Path(data_in)
+    data_format = Path(data_in).suffix
+
+    if chunk_size < 1:
+        raise ValueError(
+            f"[bold red]Alert![/bold red] Chunk size must be at least 1, got {chunk_size}"
+        )
+
+    if str(data_in) == "-":
+        data_path = sys.stdin
+        data_format = ".ndjson"
+
     match data_format:
-        case ".xlsx":
-            data = pd.read_excel(data_path)
         case ".csv":
-            data = pd.read_csv(data_path)
-        case ".json":
-            data = pd.read_json(data_path)
+            # Integer columns are parsed as floats so a value like 10.0 doesn't stop the stream halfway,
+            # the validation casts them back when no decimals are lost
+            reader = pd.read_csv(
+                data_path,
+                chunksize=chunk_size,
+                dtype={
+                    column: "float64" if rule.dtype == "int64" else rule.dtype
+                    for column, rule in {**SCHEMA, **OPTIONAL_COLUMNS}.items()
+                },
+            )
+        case ".jsonl" | ".ndjson":
+            reader = pd.read_json(data_path, lines=True, chunksize=chunk_size)
         case _:
             raise ValueError(
-                f"[bold red]Alesrt![/bold red]Format {data_format} not supported. Only .xlsx, .csv and .json are supported"
+                f"[bold red]Alert![/bold red] Format {data_format} can't be read in chunks. Only .csv, .jsonl and .ndjson are supported"
             )
 
-    if check_data(data):
-        return (data, data_folder)
+    with reader:
+        chunks = iter(reader)
+
+        while True:
+            with stage("load"):
+                chunk = next(chunks, None)
+
+            if chunk is None:
+                return
 
-    return None
+            chunk = check_data(chunk)
+            increment("airborne_rows_loaded_total", len(chunk))
 
+            yield chunk
 
-def check_data(data_frame: pd.DataFrame) -> bool:
-    """Checks if the Data Frame entered has the appropriate columns and data types.
+
+def check_data(data_frame: pd.DataFrame) -> pd.DataFrame:
+    """Checks if the Data Frame entered has the appropriate columns, data types and values.
 
     Args:
         data (pd.DataFrame): Data frame entered
 
     Returns:
-        bool: does the data pass the validation
+        pd.DataFrame: Data frame with the columns coerced to their types, under the names the engines use
     """
-    validate_existing_columns(data_frame.columns)
-    validate_data_types(data_frame)
-    validate_input(data_frame)
-
-    return True
+    with stage("validate"):
+        return engine_columns(validate_schema(data_frame))
 
 
 def make_results_folder(data_folder: Path) -> Path:
@@ -71,7 +263,10 @@ def make_results_folder(data_folder: Path) -> Path:
 
 
 def save_data(
-    results_folder: Path, save_format: str, data_to_save: dict[str, pd.DataFrame]
+    results_folder: Path,
+    save_format: str,
+    data_to_save: dict[str, pd.DataFrame],
+    compression: str = "none",
 ) -> None:
     """Saves data results to folder in format specified.
 
@@ -79,39 +274,163 @@ def save_data(
         data_folder (Path): Folder where data is stored
         save_format (str): Format to store data
         data_to_save(dict[str, pd.DataFrame]): Names and pd.DataFrame to save
+        compression (str): Compression codec for parquet and feather files. One of none, zstd or lz4
     """
 
     match save_format:
         case "csv":
             for name, df in data_to_save.items():
                 df.to_csv(results_folder.joinpath(f"{name}.csv"))
-        case "xlsx":
+        case "xlsx" | "excel":
             for name, df in data_to_save.items():
                 df.to_excel(results_folder.joinpath(f"{name}.xlsx"))
+        case "workbook":
+            write_workbook(results_folder.joinpath("results.xlsx"), data_to_save)
+        case "sqlite":
+            save_sqlite(results_folder.joinpath("results.sqlite"), data_to_save)
+        case "parquet":
+            for name, df in data_to_save.items():
+                df.to_parquet(
+                    results_folder.joinpath(f"{name}.parquet"),
+                    compression=None if compression == "none" else compression,
+                )
+        case "feather":
+            for name, df in data_to_save.items():
+                df.to_feather(
+                    results_folder.joinpath(f"{name}.feather"),
+                    compression=(
+                        "uncompressed" if compression == "none" else compression
+                    ),
+                )
         case _:
             raise ValueError("[bold red]Alert![/bold red] Extension not supported")
 
 
+def write_workbook(workbook_path: Path, data_to_save: dict[str, pd.DataFrame]) -> None:
+    """Writes every result to a sheet of a single Excel workbook. Uses the write-only mode of openpyxl, rows are streamed to disk so memory doesn't grow with the size of the results.
+
+    Args:
+        workbook_path (Path): Path of the workbook to write
+        data_to_save (dict[str, pd.DataFrame]): Sheet names and pd.DataFrame to save
+    """
+    workbook = Workbook(write_only=True)
+
+    for name, df in data_to_save.items():
+        # Excel limits sheet names to 31 characters
+        sheet = workbook.create_sheet(title=name[:31])
+        sheet.append([df.index.name, *df.columns])
+
+        for row in df.itertuples(name=None):
+            sheet.append([workbook_cell(value) for value in row])
+
+    workbook.save(workbook_path)
+
+
+def workbook_cell(value: object) -> object:
+    """Converts a value to one openpyxl can write to a cell.
+
+    Args:
+        value (object): Value of a data frame cell
+
+    Returns:
+        object: None for missing values, the text of lists and other containers as `df.to_excel` writes them, the value otherwise
+    """
+    # Risk sweeps keep the parameters of each row as a list
+    if isinstance(value, (list, tuple, set, dict)):
+        return str(value)
+
+    return None if pd.isna(value) else value
+
+
+def write_ndjson(data: pd.DataFrame, stream: TextIO) -> None:
+    """Writes data as newline-delimited JSON records and flushes the stream, so the next stage of a pipeline gets every batch as soon as it's done.
+
+    Args:
+        data (pd.DataFrame): Data to write
+        stream (TextIO): Stream to write to, usually stdout
+    """
+    records = data.to_json(orient="records", lines=True)
+
+    stream.write(records if records.endswith("\n") else f"{records}\n")
+    stream.flush()
+
+
+def append_data(
+    results_folder: Path,
+    save_format: str,
+    data_to_save: dict[str, pd.DataFrame],
+    header: bool,
+) -> None:
+    """Appends data results to the files in the results folder, creating them if needed.
+
+    Args:
+        results_folder (Path): Folder where results are stored
+        save_format (str): Format to store data
+        data_to_save (dict[str, pd.DataFrame]): Names and pd.DataFrame to append
+        header (bool): Write the column names, only used for the first chunk
+    """
+    match save_format:
+        case "csv":
+            for name, df in data_to_save.items():
+                df.to_csv(
+                    results_folder.joinpath(f"{name}.csv"),
+                    mode="w" if header else "a",
+                    header=header,
+                )
+        case _:
+            raise ValueError(
+                f"[bold red]Alert![/bold red] Extension {save_format} can't be appended to. Only csv is supported when processing in chunks"
+            )
+
+
 def graphics_output(
     results_folder: Path,
     graphics: dict[str, dict[str, go.Figure]],
-) -> None:
+    executor: Optional[Executor] = None,
+) -> list[Future]:
     """Saves graphics to results folder.
 
     Args:
         results_folder (Path): Folder where the graphics are going to be stored
-        risk_ach_graphics (dict): Dictionary where risk graphics are stored
-        aerosol_risk_graphics (dict): Dictionary where aerosol graphics are stored
+        graphics (dict): Groups of figures, risk vs. ACH per infected percentage and per aerosol cutoff
+        executor (Optional[Executor]): Worker pool the figures are exported in. Defaults to None, exporting them one after the other.
+
+    Returns:
+        list[Future]: Futures of every export, already finished without an executor
     """
+    if executor is None:
+        executor = SerialExecutor()
+
+    futures = []
+
     for graphics_group, graphics_dict in graphics.items():
         match graphics_group:
             case "risk_ach_inf_graphics":
                 graph_path = results_folder.joinpath("risk_ach_inf")
-                graph_path.mkdir()
+                graph_path.mkdir(exist_ok=True)
 
             case "risk_ach_aerosol_graphics":
                 graph_path = results_folder.joinpath("risk_ach_aerosol")
-                graph_path.mkdir()
+                graph_path.mkdir(exist_ok=True)
 
         for name, figure in graphics_dict.items():
-            figure.write_image(graph_path.joinpath(f"{name}.png"))
+            futures.append(
+                executor.submit(
+                    export_figure, figure, graph_path.joinpath(f"{name}.png")
+                )
+            )
+
+    for future in futures:
+        future.add_done_callback(count_figure)
+
+    return futures
+
+
+def count_figure(future: Future) -> None:
+    """Counts a figure as rendered once its export finishes without errors.
+
+    Args:
+        future (Future): Export of the figure
+    """
+    if future.exception() is None:
+        increment("airborne_figures_rendered_total")
@@ -0,0 +1,182 @@
+"""
+Scenario manifests for `airborne batch`. Each scenario is a named set of overrides applied on top of the settings.
+"""
+import copy
+from collections.abc import Callable
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+from typing import Any
+from typing import Optional
+
+import tomlkit
+
+from .options import AerosolCutoff
+from .options import MaskType
+from .options import ViralLoad
+
+
+# Settings that a scenario can override and the settings table each one lives in
+SCENARIO_KEYS = {
+    "ach": "general",
+    "ashrae": "general",
+    "risk": "general",
+    "aforo": "general",
+    "default_aerosol": "general",
+    "max_risk": "ach",
+    "mask_default": "ach",
+    "inf_percent": "ach",
+    "viral_load": "ach",
+    "aerosol": "ach",
+}
+
+
+def is_number(value: Any) -> bool:
+    """Checks that a value is an integer or a float, booleans aren't numbers in a manifest."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def is_numbers(value: Any) -> bool:
+    """Checks that a value is a non empty list of numbers."""
+    return isinstance(value, list) and bool(value) and all(map(is_number, value))
+
+
+def option_check(option: type[Enum], many: bool = False) -> Callable[[Any], bool]:
+    """Builds the check of a setting that takes the values of an option, or a non empty list of them."""
+    values = [member.value for member in option]
+
+    if many:
+        return (
+            lambda value: isinstance(value, list)
+            and bool(value)
+            and all(item in values for item in value)
+        )
+
+    return lambda value: value in values
+
+
+def option_text(option: type[Enum], many: bool = False) -> str:
+    """Describes the values of an option for the alerts."""
+    values = ", ".join(f'"{member.value}"' for member in option)
+
+    return f"a list of {values}" if many else f"one of {values}"
+
+
+# Check of the values of every setting a scenario can override, and the values it expects
+SCENARIO_VALUES: dict[str, tuple[Callable[[Any], bool], str]] = {
+    "ach": (lambda value: isinstance(value, bool), "true or false"),
+    "ashrae": (lambda value: isinstance(value, bool), "true or false"),
+    "risk": (lambda value: isinstance(value, bool), "true or false"),
+    "aforo": (is_numbers, "a list of percentages"),
+    "default_aerosol": (option_check(AerosolCutoff), option_text(AerosolCutoff)),
+    "max_risk": (
+        lambda value: is_number(value) and 0 <= value <= 100,
+        "a percentage from 0 to 100",
+    ),
+    "mask_default": (option_check(MaskType), option_text(MaskType)),
+    "inf_percent": (is_numbers, "a list of percentages"),
+    "viral_load": (option_check(ViralLoad), option_text(ViralLoad)),
+    "aerosol": (
+        option_check(AerosolCutoff, many=True),
+        option_text(AerosolCutoff, many=True),
+    ),
+}
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """Named scenario with the settings it runs with."""
+
+    name: str
+    settings: dict[str, Any]
+
+
+@dataclass(frozen=True)
+class Manifest:
+    """Input data and scenarios of a batch run."""
+
+    data_in: Optional[Path]
+    scenarios: list[Scenario]
+
+
+def load_manifest(manifest_path: Path, settings: dict[str, Any]) -> Manifest:
+    """Reads a scenario manifest. Scenarios are listed as `[scenarios.<name>]` tables, an empty table runs with the settings as they are.
+    Every scenario is checked here, so a mistake in the last one is found before the first one runs.
+
+    Args:
+        manifest_path (Path): Path of the manifest
+        settings (dict[str, Any]): Settings the scenarios override
+
+    Raises:
+        ValueError: The manifest has no scenarios, or a scenario has a name that isn't a folder name or an invalid override
+
+    Returns:
+        Manifest: Input data, relative to the manifest, and scenarios in the order they are listed
+    """
+    with open(manifest_path, encoding="utf-8") as manifest_file:
+        manifest = tomlkit.load(manifest_file).unwrap()
+
+    scenarios = manifest.get("scenarios", {})
+
+    if not scenarios:
+        raise ValueError(
+            f"[bold red]Alert![/bold red] {manifest_path.name} has no [scenarios.<name>] tables"
+        )
+
+    data_in = manifest.get("input")
+
+    return Manifest(
+        data_in=manifest_path.parent.joinpath(data_in) if data_in else None,
+        scenarios=[
+            Scenario(name, scenario_settings(name, settings, overrides))
+            for (name, overrides) in scenarios.items()
+        ],
+    )
+
+
+def scenario_settings(
+    name: str, settings: dict[str, Any], overrides: dict[str, Any]
+) -> dict[str, Any]:
+    """Applies the overrides of a scenario to a copy of the settings.
+
+    Args:
+        name (str): Name of the scenario
+        settings (dict[str, Any]): Settings to override
+        overrides (dict[str, Any]): Values set by the scenario
+
+    Raises:
+        ValueError: The name isn't a folder name, an override is not a setting scenarios can change or its value is invalid
+
+    Returns:
+        dict[str, Any]: Settings of the scenario
+    """
+    # Results of each scenario are saved in a folder with its name
+    if name in ("", ".", "..") or "/" in name or "\\" in name:
+        raise ValueError(
+            f"[bold red]Alert![/bold red] Scenario {name!r} can't name a results folder, use a name without path separators"
+        )
+
+    unknown = [key for key in overrides if key not in SCENARIO_KEYS]
+
+    if unknown:
+        raise ValueError(
+            f"[bold red]Alert![/bold red] Scenario {name} sets {', '.join(unknown)}, only {', '.join(SCENARIO_KEYS)} can be changed per scenario"
+        )
+
+    invalid = [
+        f"{key} = {value!r} must be {SCENARIO_VALUES[key][1]}"
+        for (key, value) in overrides.items()
+        if not SCENARIO_VALUES[key][0](value)
+    ]
+
+    if invalid:
+        raise ValueError(
+            f"[bold red]Alert![/bold red] Scenario {name} has invalid settings: {'; '.join(invalid)}"
+        )
+
+    new_settings = copy.deepcopy(settings)
+
+    for key, value in overrides.items():
+        new_settings[SCENARIO_KEYS[key]][key] = value
+
+    return new_settings
@@ -0,0 +1,281 @@
+"""
+Memory of a command: resident memory and Python allocations per stage for `airborne --memory`, and the projected footprint of `airborne run` checked against `--memory-limit`.
+"""
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from dataclasses import field
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from ..lib.risk import ACH_SWEEP
+from ..lib.risk import OCCUPANCY_SWEEP
+from ..settings.model import ModelParameters
+
+
+# Windows has no resource module, resident memory isn't reported there
+try:
+    import resource
+except ImportError:
+    resource = None  # type: ignore[assignment]
+
+
+MIB = 2**20
+# Rows read from the input to measure the memory of a room
+SAMPLE_ROWS = 1000
+# Bytes of a plotly trace of a risk sweep, 25 points with its style
+TRACE_BYTES = 8 * 1024
+# Bytes openpyxl holds per cell while pandas writes an Excel file
+EXCEL_CELL_BYTES = 350
+# Save formats written with openpyxl holding every cell, the workbook format streams them
+EXCEL_FORMATS = ("xlsx", "excel")
+# Copies of the data held at once: while it's parsed and validated, and while results are joined and saved
+COPY_FACTOR = 3
+# Memory the stages take whatever the number of rooms: parser buffers and the modules they import
+STAGE_OVERHEAD = 16 * MIB
+# Allocating lines kept per stage
+TOP_ALLOCATIONS = 5
+# Allocations of the memory report itself and of the import system, left out of the top allocations
+IGNORED_FILES = (
+    __file__,
+    str(Path(__file__).with_name("profiling.py")),
+    tracemalloc.__file__,
+    "<frozen importlib._bootstrap>",
+    "<frozen importlib._bootstrap_external>",
+    "<unknown>",
+)
+
+
+@dataclass
+class StageMemory:
+    """Memory used by a stage over all its runs, the allocating lines are from its first run."""
+
+    peak_rss: int = 0
+    rss_growth: int = 0
+    traced_peak: int = 0
+    allocations: dict[str, int] = field(default_factory=dict)
+
+    def top_allocations(self, limit: int = TOP_ALLOCATIONS) -> dict[str, int]:
+        """Returns the lines that allocated the most memory during the stage.
+
+        Args:
+            limit (int): Number of lines. Defaults to TOP_ALLOCATIONS.
+
+        Returns:
+            dict[str, int]: Bytes added by each line during the first run of the stage, largest first
+        """
+        ranked = sorted(
+            self.allocations.items(), key=lambda item: item[1], reverse=True
+        )
+
+        return dict(ranked[:limit])
+
+
+@dataclass(frozen=True)
+class Footprint:
+    """Projected memory of a run."""
+
+    rows: int
+    baseline: int
+    row_bytes: float
+
+    @property
+    def total(self) -> float:
+        """Bytes projected for the whole input."""
+        return self.baseline + self.rows * self.row_bytes
+
+    def chunk_rows(self, limit: int) -> int:
+        """Returns the rows that can be processed at a time within a memory limit.
+
+        Args:
+            limit (int): Memory limit in bytes
+
+        Raises:
+            ValueError: The limit is below the memory the process already uses
+
+        Returns:
+            int: Rows per chunk
+        """
+        if limit <= self.baseline:
+            raise ValueError(
+                f"[bold red]Alert![/bold red] The memory limit of {limit / MIB:.0f} MiB is below the {self.baseline / MIB:.0f} MiB in use before loading the data"
+            )
+
+        return max(int((limit - self.baseline) // self.row_bytes), 1)
+
+
+def peak_rss(children: bool = False) -> int:
+    """Returns the peak resident memory of this process or of its largest finished worker.
+
+    Args:
+        children (bool): Report the largest worker process instead. Defaults to False.
+
+    Returns:
+        int: Peak resident memory in bytes, 0 where it isn't available
+    """
+    if resource is None:
+        return 0
+
+    usage = resource.getrusage(
+        resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    )
+
+    # Linux reports kilobytes and macOS bytes
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+def allocation_growth(
+    before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, limit: int
+) -> dict[str, int]:
+    """Returns the lines whose allocations grew the most between two snapshots.
+
+    Args:
+        before (tracemalloc.Snapshot): Snapshot at the start of a stage
+        after (tracemalloc.Snapshot): Snapshot at its end
+        limit (int): Number of lines
+
+    Returns:
+        dict[str, int]: Bytes added by each line, as `file:line`
+    """
+    growth: dict[str, int] = {}
+
+    # Differences are grouped per line and sorted from the largest growth
+    for difference in after.compare_to(before, "lineno"):
+        if difference.size_diff <= 0 or len(growth) == limit:
+            break
+
+        frame = difference.traceback[0]
+        if frame.filename not in IGNORED_FILES:
+            growth[f"{Path(frame.filename).name}:{frame.lineno}"] = difference.size_diff
+
+    return growth
+
+
+def input_rows(data_in: Path) -> Optional[pd.DataFrame]:
+    """Reads the first rows of an input that can be processed in chunks.
+
+    Args:
+        data_in (Path): Input file
+
+    Returns:
+        Optional[pd.DataFrame]: First rows, None for inputs that can't be read in chunks
+    """
+    match data_in.suffix:
+        case ".csv":
+            return pd.read_csv(data_in, nrows=SAMPLE_ROWS)
+        case ".jsonl" | ".ndjson":
+            return pd.read_json(data_in, lines=True, nrows=SAMPLE_ROWS)
+        case _:
+            return None
+
+
+def count_lines(data_in: Path) -> int:
+    """Counts the lines of a text file without parsing it.
+
+    Args:
+        data_in (Path): Input file
+
+    Returns:
+        int: Number of lines, the last one counted even without a line break
+    """
+    lines = 0
+    last_block = b""
+
+    with open(data_in, mode="rb") as data_file:
+        for block in iter(lambda: data_file.read(MIB), b""):
+            lines += block.count(b"\n")
+            last_block = block
+
+    return lines + (1 if last_block and not last_block.endswith(b"\n") else 0)
+
+
+def results_row_bytes(
+    parameters: ModelParameters,
+    ach: bool,
+    ashrae: bool,
+    risk_inf: bool,
+    risk_aerosol: bool,
+    graphics: bool,
+    save_format: str,
+    risk_co2: bool = False,
+) -> float:
+    """Projects the memory of the results of a room.
+
+    Args:
+        parameters (ModelParameters): Model parameters of the run
+        ach (bool): Required ACH is calculated
+        ashrae (bool): ASHRAE requirements are calculated
+        risk_inf (bool): Risk is swept over infected percentages
+        risk_aerosol (bool): Risk is swept over aerosol cutoffs
+        graphics (bool): Figures are made from the risk sweeps
+        save_format (str): Format the results are saved in
+        risk_co2 (bool): Risk and CO2 are swept over occupancies. Defaults to False.
+
+    Returns:
+        float: Bytes of the results of a room, including the copies made to join and save them
+    """
+    sweeps = []
+    if risk_inf:
+        sweeps.append(len(parameters.inf_percent))
+    if risk_aerosol:
+        sweeps.append(len(parameters.aerosol))
+
+    values = 0
+    if ach:
+        values += len(parameters.aforo) * len(parameters.inf_percent)
+    if ashrae:
+        values += 2 * len(parameters.aforo)
+    for sweep in sweeps:
+        # Six columns per sweep row plus an occupancy and a risk column per occupancy and parameter
+        values += len(ACH_SWEEP) * (6 + 2 * len(OCCUPANCY_SWEEP) * sweep)
+    if risk_co2:
+        # Five columns per sweep row plus occupancy, risk and three CO2 columns per occupancy
+        values += len(ACH_SWEEP) * (5 + 5 * len(OCCUPANCY_SWEEP))
+
+    row_bytes = 8 * values * COPY_FACTOR
+
+    if graphics:
+        row_bytes += TRACE_BYTES * len(OCCUPANCY_SWEEP) * sum(sweeps)
+
+    if save_format in EXCEL_FORMATS:
+        row_bytes += EXCEL_CELL_BYTES * values
+
+    return row_bytes
+
+
+def project_footprint(
+    data_in: Path, results_bytes: float, save_format: str
+) -> Optional[Footprint]:
+    """Projects the memory of processing a whole input at once, from the size of its first rows.
+
+    Args:
+        data_in (Path): Input file
+        results_bytes (float): Bytes of the results of a room, from `results_row_bytes`
+        save_format (str): Format the results are saved in
+
+    Returns:
+        Optional[Footprint]: Projected memory, None for inputs that can't be read in chunks
+    """
+    sample = input_rows(data_in)
+
+    if sample is None or sample.empty:
+        return None
+
+    if data_in.suffix == ".csv":
+        rows = count_lines(data_in) - 1
+    else:
+        rows = count_lines(data_in)
+
+    input_bytes = sample.memory_usage(deep=True).sum() / len(sample) * COPY_FACTOR
+
+    # The input columns are saved along with the results
+    if save_format in EXCEL_FORMATS:
+        input_bytes += EXCEL_CELL_BYTES * len(sample.columns)
+
+    return Footprint(
+        rows=rows,
+        baseline=peak_rss() + STAGE_OVERHEAD,
+        row_bytes=input_bytes + results_bytes,
+    )
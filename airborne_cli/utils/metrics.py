@@ -0,0 +1,367 @@
+"""
+Metrics of a command, enabled with `airborne --metrics <path>`. They are written on exit as JSON, or as a Prometheus textfile when the path ends in `.prom`.
+
+The registry lives in the process of the command: calls made inside `--jobs` workers aren't merged back, so the work of the worker pool is counted
+here from its results once they're gathered.
+"""
+import json
+import os
+import sys
+import time
+from bisect import bisect_left
+from dataclasses import dataclass
+from dataclasses import field
+from pathlib import Path
+from typing import Any
+from typing import Optional
+
+
+# Seconds, from the Prometheus client defaults up to the length of a large risk sweep
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+# Steps of 0.1 ACH taken by the ACH solver, 1000 steps reach 100 ACH
+ITERATION_BUCKETS = (5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+@dataclass(frozen=True)
+class Metric:
+    """Definition of a metric."""
+
+    kind: str
+    help: str
+    buckets: tuple[float, ...] = ()
+
+
+METRICS = {
+    "airborne_run_success": Metric(
+        "gauge", "1 when the command finished without errors"
+    ),
+    "airborne_run_duration_seconds": Metric("gauge", "Wall time of the command"),
+    "airborne_run_timestamp_seconds": Metric(
+        "gauge", "Unix time when the command finished"
+    ),
+    "airborne_simulations_total": Metric(
+        "counter", "Room simulations run by the ACH solver and the risk sweeps"
+    ),
+    "airborne_cache_hits_total": Metric(
+        "counter", "Results and inputs reused from a cache"
+    ),
+    "airborne_cache_misses_total": Metric(
+        "counter", "Results and inputs missing from a cache"
+    ),
+    "airborne_ach_solver_iterations": Metric(
+        "histogram", "Iterations of the ACH solver per room", ITERATION_BUCKETS
+    ),
+    "airborne_rows_loaded_total": Metric("counter", "Rooms read from the input"),
+    "airborne_figures_rendered_total": Metric("counter", "Figures exported"),
+    "airborne_bytes_written_total": Metric(
+        "counter", "Bytes of results written to the results folders"
+    ),
+    "airborne_stage_seconds": Metric(
+        "histogram", "Wall time of each run of a stage", LATENCY_BUCKETS
+    ),
+}
+
+# Labels of a sample, as sorted name and value pairs
+Labels = tuple[tuple[str, str], ...]
+
+
+@dataclass
+class Histogram:
+    """Observations of a histogram, counted per bucket."""
+
+    buckets: tuple[float, ...]
+    counts: list[int] = field(default_factory=list)
+    sum: float = 0.0
+    count: int = 0
+
+    def __post_init__(self) -> None:
+        if not self.counts:
+            self.counts = [0] * len(self.buckets)
+
+    def observe(self, value: float) -> None:
+        """Counts an observation in the first bucket it fits in, larger values are only counted in +Inf.
+
+        Args:
+            value (float): Observed value
+        """
+        position = bisect_left(self.buckets, value)
+        if position < len(self.buckets):
+            self.counts[position] += 1
+
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[int]:
+        """Returns the observations less than or equal to each bucket bound.
+
+        Returns:
+            list[int]: Cumulative count of every bucket
+        """
+        totals = []
+        running = 0
+
+        for count in self.counts:
+            running += count
+            totals.append(running)
+
+        return totals
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms of a command."""
+
+    def __init__(self, command: str, path: Path) -> None:
+        """Starts collecting the metrics of a command.
+
+        Args:
+            command (str): Name of the command, added as a label to every sample
+            path (Path): File the metrics are written to
+        """
+        self.command = command
+        self.path = path
+        self.values: dict[tuple[str, Labels], float] = {}
+        self.histograms: dict[tuple[str, Labels], Histogram] = {}
+        self.folders: list[Path] = []
+        self.start = time.perf_counter()
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        """Adds to a counter.
+
+        Args:
+            name (str): Name of the counter
+            value (float): Amount to add. Defaults to 1.
+        """
+        key = (name, self.labels(labels))
+        self.values[key] = self.values.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        """Sets a gauge.
+
+        Args:
+            name (str): Name of the gauge
+            value (float): Value of the gauge
+        """
+        self.values[(name, self.labels(labels))] = value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Adds an observation to a histogram.
+
+        Args:
+            name (str): Name of the histogram
+            value (float): Observed value
+        """
+        key = (name, self.labels(labels))
+
+        if key not in self.histograms:
+            self.histograms[key] = Histogram(METRICS[name].buckets)
+
+        self.histograms[key].observe(value)
+
+    def labels(self, labels: dict[str, str]) -> Labels:
+        """Adds the command to the labels of a sample.
+
+        Args:
+            labels (dict[str, str]): Labels of the sample
+
+        Returns:
+            Labels: Sorted labels, command included
+        """
+        return tuple(sorted({"command": self.command, **labels}.items()))
+
+    def finish(self, success: bool) -> Path:
+        """Records the outcome of the command and the bytes written, and writes the metrics file.
+
+        Args:
+            success (bool): The command finished without errors
+
+        Returns:
+            Path: Path of the metrics file
+        """
+        self.set("airborne_run_success", int(success))
+        self.set("airborne_run_duration_seconds", time.perf_counter() - self.start)
+        self.set("airborne_run_timestamp_seconds", time.time())
+
+        for folder in self.folders:
+            self.increment(
+                "airborne_bytes_written_total",
+                sum(
+                    path.stat().st_size for path in folder.rglob("*") if path.is_file()
+                ),
+            )
+
+        text = prometheus_text(self) if self.path.suffix == ".prom" else json_text(self)
+
+        # Written to a temporary file and renamed, so collectors never read a partial file
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = self.path.with_name(f".{self.path.name}.{os.getpid()}")
+        temporary_path.write_text(text, encoding="utf-8")
+        temporary_path.replace(self.path)
+
+        return self.path
+
+
+# Metrics of the running command, None when they aren't collected
+ACTIVE_METRICS: Optional[MetricsRegistry] = None
+
+
+def start_metrics(command: str, path: Path) -> MetricsRegistry:
+    """Starts collecting the metrics of the running command.
+
+    Args:
+        command (str): Name of the command
+        path (Path): File the metrics are written to
+
+    Returns:
+        MetricsRegistry: Metrics of the command
+    """
+    global ACTIVE_METRICS
+    ACTIVE_METRICS = MetricsRegistry(command, path)
+    return ACTIVE_METRICS
+
+
+def finish_metrics() -> Optional[Path]:
+    """Writes the metrics of the running command, if collected. Meant to run when the command closes, an exception on its way out marks the run as failed.
+
+    Returns:
+        Optional[Path]: Path of the metrics file, None when no metrics were collected
+    """
+    global ACTIVE_METRICS
+    (metrics, ACTIVE_METRICS) = (ACTIVE_METRICS, None)
+
+    if metrics is None:
+        return None
+
+    error = sys.exc_info()[1]
+    # typer.Exit carries the exit code, only a non zero code is a failure
+    success = error is None or getattr(error, "exit_code", 1) == 0
+
+    return metrics.finish(success)
+
+
+def increment(name: str, value: float = 1, **labels: str) -> None:
+    """Adds to a counter of the running command. Does nothing when metrics aren't collected.
+
+    Args:
+        name (str): Name of the counter
+        value (float): Amount to add. Defaults to 1.
+    """
+    if ACTIVE_METRICS is not None:
+        ACTIVE_METRICS.increment(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels: str) -> None:
+    """Adds an observation to a histogram of the running command. Does nothing when metrics aren't collected.
+
+    Args:
+        name (str): Name of the histogram
+        value (float): Observed value
+    """
+    if ACTIVE_METRICS is not None:
+        ACTIVE_METRICS.observe(name, value, **labels)
+
+
+def count_written(folder: Path) -> None:
+    """Counts the files in a results folder, subfolders included, as written by the running command once it finishes.
+
+    Args:
+        folder (Path): Results folder
+    """
+    if ACTIVE_METRICS is not None:
+        ACTIVE_METRICS.folders.append(folder)
+
+
+def format_labels(labels: Labels) -> str:
+    """Formats labels for the Prometheus text format.
+
+    Args:
+        labels (Labels): Labels of a sample
+
+    Returns:
+        str: Labels between braces, with quotes, backslashes and new lines escaped
+    """
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for (name, value) in labels
+    )
+
+    return "{" + ",".join(f'{name}="{value}"' for (name, value) in escaped) + "}"
+
+
+def prometheus_text(metrics: MetricsRegistry) -> str:
+    """Formats the metrics in the Prometheus text format, as read by the node exporter textfile collector.
+
+    Args:
+        metrics (MetricsRegistry): Metrics of a command
+
+    Returns:
+        str: Samples of every metric recorded, with their HELP and TYPE lines
+    """
+    lines = []
+
+    for name, metric in METRICS.items():
+        values = [
+            (labels, value)
+            for ((key, labels), value) in metrics.values.items()
+            if key == name
+        ]
+        histograms = [
+            (labels, histogram)
+            for ((key, labels), histogram) in metrics.histograms.items()
+            if key == name
+        ]
+
+        if not values and not histograms:
+            continue
+
+        lines.append(f"# HELP {name} {metric.help}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+
+        for labels, value in values:
+            lines.append(f"{name}{format_labels(labels)} {value}")
+
+        for labels, histogram in histograms:
+            for bound, count in zip(histogram.buckets, histogram.cumulative()):
+                lines.append(
+                    f"{name}_bucket{format_labels(labels + (('le', f'{bound:g}'),))} {count}"
+                )
+            lines.append(
+                f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {histogram.count}"
+            )
+            lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+
+    return "\n".join(lines) + "\n"
+
+
+def json_text(metrics: MetricsRegistry) -> str:
+    """Formats the metrics as JSON.
+
+    Args:
+        metrics (MetricsRegistry): Metrics of a command
+
+    Returns:
+        str: Every sample recorded, grouped by metric
+    """
+    report: dict[str, Any] = {}
+
+    for (name, labels), value in metrics.values.items():
+        report.setdefault(name, []).append({"labels": dict(labels), "value": value})
+
+    for (name, labels), histogram in metrics.histograms.items():
+        report.setdefault(name, []).append(
+            {
+                "labels": dict(labels),
+                "buckets": dict(
+                    zip(
+                        (f"{bound:g}" for bound in histogram.buckets),
+                        histogram.cumulative(),
+                    )
+                ),
+                "sum": histogram.sum,
+                "count": histogram.count,
+            }
+        )
+
+    return json.dumps(
+        {name: report[name] for name in METRICS if name in report}, indent=2
+    )
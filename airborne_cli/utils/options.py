@@ -8,7 +8,22 @@ from enum import Enum
 class SaveFormat(str, Enum):
     csv = "csv"
     excel = "excel"
+    workbook = "workbook"
     json = "json"
+    parquet = "parquet"
+    feather = "feather"
+    sqlite = "sqlite"
+
+
+class RiskAnalysis(str, Enum):
+    infected = "infected"
+    aerosol = "aerosol"
+
+
+class Compression(str, Enum):
+    none = "none"
+    zstd = "zstd"
+    lz4 = "lz4"
 
 
 class GraphicFormat(str, Enum):
@@ -55,3 +70,8 @@ class AerosolCutoff(Enum):
     i2 = "20"
     i3 = "40"
     i4 = "100"
+
+
+class OccupancyType(Enum):
+    i0 = "constant"
+    i1 = "gaussian"
@@ -0,0 +1,435 @@
+"""
+Profiling of a command, enabled with `airborne --profile`. Records the wall and CPU time of each stage, with `--cprofile` the functions where the time goes and with `--memory` the memory each stage uses.
+"""
+import cProfile
+import json
+import pstats
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextlib import nullcontext
+from dataclasses import asdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import ContextManager
+from typing import Optional
+
+from rich.console import Console
+from rich.table import Table
+
+from . import metrics
+from .memory import MIB
+from .memory import TOP_ALLOCATIONS
+from .memory import StageMemory
+from .memory import allocation_growth
+from .memory import peak_rss
+
+
+@dataclass
+class StageTime:
+    """Time spent in a stage, without the time of the stages nested in it."""
+
+    wall: float = 0.0
+    cpu: float = 0.0
+    calls: int = 0
+
+
+@dataclass
+class OpenStage:
+    """Stage that is running, with the usage when it started and the usage of the stages nested in it."""
+
+    wall: float
+    cpu: float
+    nested_wall: float = 0.0
+    nested_cpu: float = 0.0
+    rss: int = 0
+    nested_rss: int = 0
+    traced_peak: int = 0
+    snapshot: Optional[tracemalloc.Snapshot] = None
+
+
+@dataclass(frozen=True)
+class Hotspot:
+    """Function of the cProfile summary."""
+
+    function: str
+    calls: int
+    total_seconds: float
+    cumulative_seconds: float
+
+
+class RunProfile:
+    """Stage times and optional cProfile of a command."""
+
+    def __init__(
+        self, command: str, cprofile: bool = False, memory: bool = False
+    ) -> None:
+        """Starts profiling a command.
+
+        Args:
+            command (str): Name of the command
+            cprofile (bool): Collect a cProfile of the command. Defaults to False.
+            memory (bool): Record the memory of every stage. Defaults to False.
+        """
+        self.command = command
+        self.stages: dict[str, StageTime] = {}
+        self.memory: Optional[dict[str, StageMemory]] = {} if memory else None
+        self.folder = Path.cwd()
+        self.profile = cProfile.Profile() if cprofile else None
+        self.open_stages: list[OpenStage] = []
+
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+
+        if self.memory is not None:
+            tracemalloc.start()
+
+        if self.profile is not None:
+            self.profile.enable()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Records the time spent in a stage.
+
+        Args:
+            name (str): Name of the stage
+        """
+        snapshot = None
+
+        if self.memory is not None:
+            # Snapshots of a large heap take seconds, allocations are only compared on the first run of a stage
+            if name not in self.memory:
+                snapshot = tracemalloc.take_snapshot()
+
+            # The peak is reset for this stage, the stage it's nested in keeps the peak so far
+            if self.open_stages:
+                self.open_stages[-1].traced_peak = max(
+                    self.open_stages[-1].traced_peak, tracemalloc.get_traced_memory()[1]
+                )
+            tracemalloc.reset_peak()
+
+        # Started after the snapshot, so the time of the stage leaves it out
+        open_stage = OpenStage(
+            time.perf_counter(), time.process_time(), rss=peak_rss(), snapshot=snapshot
+        )
+        self.open_stages.append(open_stage)
+
+        try:
+            yield
+        finally:
+            self.open_stages.pop()
+            wall = time.perf_counter() - open_stage.wall
+            cpu = time.process_time() - open_stage.cpu
+
+            stage_time = self.stages.setdefault(name, StageTime())
+            stage_time.wall += wall - open_stage.nested_wall
+            stage_time.cpu += cpu - open_stage.nested_cpu
+            stage_time.calls += 1
+
+            if self.open_stages:
+                self.open_stages[-1].nested_wall += wall
+                self.open_stages[-1].nested_cpu += cpu
+
+            if self.memory is not None:
+                self.record_memory(name, open_stage)
+
+    def record_memory(self, name: str, open_stage: OpenStage) -> None:
+        """Adds the memory used by a stage that just ended.
+
+        Args:
+            name (str): Name of the stage
+            open_stage (OpenStage): Usage when the stage started
+        """
+        assert self.memory is not None
+
+        rss = peak_rss()
+        traced_peak = max(open_stage.traced_peak, tracemalloc.get_traced_memory()[1])
+
+        stage_memory = self.memory.setdefault(name, StageMemory())
+        stage_memory.peak_rss = max(stage_memory.peak_rss, rss)
+        stage_memory.rss_growth += rss - open_stage.rss - open_stage.nested_rss
+        stage_memory.traced_peak = max(stage_memory.traced_peak, traced_peak)
+
+        if open_stage.snapshot is not None:
+            stage_memory.allocations = allocation_growth(
+                open_stage.snapshot, tracemalloc.take_snapshot(), TOP_ALLOCATIONS
+            )
+
+        if self.open_stages:
+            self.open_stages[-1].nested_rss += rss - open_stage.rss
+            self.open_stages[-1].traced_peak = max(
+                self.open_stages[-1].traced_peak, traced_peak
+            )
+
+    def finish(self, console: Optional[Console] = None, limit: int = 15) -> Path:
+        """Stops profiling, prints the summary and writes the JSON report, and the cProfile dump when collected, to the results folder.
+
+        Args:
+            console (Optional[Console]): Console to print on. Defaults to None, printing on stderr.
+            limit (int): Number of functions in the hot spot summary. Defaults to 15.
+
+        Returns:
+            Path: Path of the JSON report
+        """
+        wall = time.perf_counter() - self.start_wall
+        cpu = time.process_time() - self.start_cpu
+
+        if console is None:
+            console = Console(stderr=True)
+
+        hotspots = []
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile.dump_stats(self.folder.joinpath("profile.prof"))
+            hotspots = hot_functions(pstats.Stats(self.profile), limit)
+
+        memory = {}
+        if self.memory is not None:
+            tracemalloc.stop()
+            memory = {
+                "peak_rss": peak_rss(),
+                "workers_peak_rss": peak_rss(children=True),
+                "stages": {
+                    name: {
+                        "peak_rss": stage_memory.peak_rss,
+                        "rss_growth": stage_memory.rss_growth,
+                        "traced_peak": stage_memory.traced_peak,
+                        "top_allocations": stage_memory.top_allocations(),
+                    }
+                    for (name, stage_memory) in self.memory.items()
+                },
+            }
+
+        console.print(stages_table(self.stages, wall, cpu))
+        if hotspots:
+            console.print(hotspots_table(hotspots))
+        if self.memory:
+            console.print(memory_table(self.memory))
+
+        report_path = self.folder.joinpath("profile.json")
+        report_path.write_text(
+            json.dumps(
+                {
+                    "command": self.command,
+                    "wall_seconds": wall,
+                    "cpu_seconds": cpu,
+                    "stages": {
+                        name: asdict(stage_time)
+                        for (name, stage_time) in self.stages.items()
+                    },
+                    "hotspots": [asdict(hotspot) for hotspot in hotspots],
+                    "memory": memory,
+                },
+                indent=2,
+            ),
+            encoding="utf-8",
+        )
+
+        return report_path
+
+
+# Profile of the running command, None when it isn't being profiled
+ACTIVE_PROFILE: Optional[RunProfile] = None
+
+
+def start_profile(
+    command: str, cprofile: bool = False, memory: bool = False
+) -> RunProfile:
+    """Starts profiling the running command.
+
+    Args:
+        command (str): Name of the command
+        cprofile (bool): Collect a cProfile of the command. Defaults to False.
+        memory (bool): Record the memory of every stage. Defaults to False.
+
+    Returns:
+        RunProfile: Profile of the command
+    """
+    global ACTIVE_PROFILE
+    ACTIVE_PROFILE = RunProfile(command, cprofile, memory)
+    return ACTIVE_PROFILE
+
+
+def finish_profile() -> Optional[Path]:
+    """Finishes the profile of the running command, if any.
+
+    Returns:
+        Optional[Path]: Path of the JSON report, None when the command wasn't profiled
+    """
+    global ACTIVE_PROFILE
+    (profile, ACTIVE_PROFILE) = (ACTIVE_PROFILE, None)
+
+    return profile.finish() if profile is not None else None
+
+
+def stage(name: str) -> ContextManager[None]:
+    """Records the time spent in a stage of the running command, in its profile and its stage latency metric. Does nothing when it isn't being profiled nor its metrics collected.
+
+    Args:
+        name (str): Name of the stage
+
+    Returns:
+        ContextManager[None]: Context wrapping the stage
+    """
+    if metrics.ACTIVE_METRICS is not None:
+        return measured_stage(name)
+
+    return ACTIVE_PROFILE.stage(name) if ACTIVE_PROFILE is not None else nullcontext()
+
+
+@contextmanager
+def measured_stage(name: str) -> Iterator[None]:
+    """Records the wall time of a stage in the stage latency metric, and in the profile when there's one.
+
+    Args:
+        name (str): Name of the stage
+    """
+    start = time.perf_counter()
+
+    try:
+        with ACTIVE_PROFILE.stage(
+            name
+        ) if ACTIVE_PROFILE is not None else nullcontext():
+            yield
+    finally:
+        metrics.observe(
+            "airborne_stage_seconds", time.perf_counter() - start, stage=name
+        )
+
+
+def report_to(folder: Path) -> None:
+    """Writes the profile of the running command to a folder, next to its results.
+
+    Args:
+        folder (Path): Results folder
+    """
+    if ACTIVE_PROFILE is not None:
+        ACTIVE_PROFILE.folder = folder
+
+
+def hot_functions(stats: pstats.Stats, limit: int) -> list[Hotspot]:
+    """Ranks the functions of a cProfile by the time spent in them.
+
+    Args:
+        stats (pstats.Stats): Profile statistics
+        limit (int): Number of functions
+
+    Returns:
+        list[Hotspot]: Functions with the most time spent in their own code
+    """
+    functions = [
+        Hotspot(
+            function=f"{name} ({Path(filename).name}:{line})",
+            calls=calls,
+            total_seconds=total,
+            cumulative_seconds=cumulative,
+        )
+        for (
+            (filename, line, name),
+            (_, calls, total, cumulative, _),
+        ) in stats.stats.items()  # type: ignore[attr-defined]
+    ]
+
+    return sorted(functions, key=lambda hotspot: hotspot.total_seconds, reverse=True)[
+        :limit
+    ]
+
+
+def stages_table(stages: dict[str, StageTime], wall: float, cpu: float) -> Table:
+    """Builds the table of time per stage.
+
+    Args:
+        stages (dict[str, StageTime]): Time of each stage
+        wall (float): Wall time of the command
+        cpu (float): CPU time of the command
+
+    Returns:
+        Table: Rich table with the wall and CPU time of every stage and the rest of the command
+    """
+    table = Table(title="Time per stage")
+
+    table.add_column("Stage")
+    table.add_column("Calls", justify="right")
+    table.add_column("Wall (s)", justify="right")
+    table.add_column("CPU (s)", justify="right")
+    table.add_column("Wall %", justify="right")
+
+    for name, stage_time in stages.items():
+        table.add_row(
+            name,
+            f"{stage_time.calls}",
+            f"{stage_time.wall:.3f}",
+            f"{stage_time.cpu:.3f}",
+            f"{100 * stage_time.wall / wall:.1f}" if wall > 0 else "-",
+        )
+
+    other_wall = wall - sum(stage_time.wall for stage_time in stages.values())
+    other_cpu = cpu - sum(stage_time.cpu for stage_time in stages.values())
+    table.add_row(
+        "other",
+        "",
+        f"{other_wall:.3f}",
+        f"{other_cpu:.3f}",
+        f"{100 * other_wall / wall:.1f}" if wall > 0 else "-",
+    )
+    table.add_row("total", "", f"{wall:.3f}", f"{cpu:.3f}", "100.0", style="bold")
+
+    return table
+
+
+def hotspots_table(hotspots: list[Hotspot]) -> Table:
+    """Builds the table of the hottest functions.
+
+    Args:
+        hotspots (list[Hotspot]): Functions ranked by their own time
+
+    Returns:
+        Table: Rich table with calls, own time and cumulative time of every function
+    """
+    table = Table(title="Hottest functions")
+
+    table.add_column("Function")
+    table.add_column("Calls", justify="right")
+    table.add_column("Own (s)", justify="right")
+    table.add_column("Cumulative (s)", justify="right")
+
+    for hotspot in hotspots:
+        table.add_row(
+            hotspot.function,
+            f"{hotspot.calls}",
+            f"{hotspot.total_seconds:.3f}",
+            f"{hotspot.cumulative_seconds:.3f}",
+        )
+
+    return table
+
+
+def memory_table(memory: dict[str, StageMemory]) -> Table:
+    """Builds the table of memory per stage.
+
+    Args:
+        memory (dict[str, StageMemory]): Memory of each stage
+
+    Returns:
+        Table: Rich table with the resident memory, Python allocations and top allocating line of every stage
+    """
+    table = Table(title="Memory per stage")
+
+    table.add_column("Stage")
+    table.add_column("Peak RSS (MiB)", justify="right")
+    table.add_column("RSS growth (MiB)", justify="right")
+    table.add_column("Python peak (MiB)", justify="right")
+    table.add_column("Top allocation")
+
+    for name, stage_memory in memory.items():
+        top = stage_memory.top_allocations(limit=1)
+        table.add_row(
+            name,
+            f"{stage_memory.peak_rss / MIB:.1f}",
+            f"{stage_memory.rss_growth / MIB:.1f}",
+            f"{stage_memory.traced_peak / MIB:.1f}",
+            ", ".join(f"{line} ({size / MIB:.1f} MiB)" for (line, size) in top.items()),
+        )
+
+    return table
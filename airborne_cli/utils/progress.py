@@ -0,0 +1,171 @@
+"""
+Live progress of the stages of a command. It's drawn on stderr and only when stderr is a terminal, so piped output and logs stay clean.
+"""
+from concurrent.futures import Future
+from pathlib import Path
+from types import TracebackType
+from typing import Optional
+
+from rich.console import Console
+from rich.progress import BarColumn
+from rich.progress import DownloadColumn
+from rich.progress import MofNCompleteColumn
+from rich.progress import Progress
+from rich.progress import ProgressColumn
+from rich.progress import Task
+from rich.progress import TaskID
+from rich.progress import TextColumn
+from rich.progress import TimeRemainingColumn
+from rich.progress import TransferSpeedColumn
+from rich.text import Text
+
+
+BYTES_WRITTEN = "Bytes written"
+
+
+class RateColumn(ProgressColumn):
+    """Items completed per second."""
+
+    def render(self, task: Task) -> Text:
+        """Renders the rate of a task.
+
+        Args:
+            task (Task): Task to render
+
+        Returns:
+            Text: Rate, or a dash before the first item is completed
+        """
+        if task.description == BYTES_WRITTEN:
+            return TransferSpeedColumn().render(task)
+
+        if task.speed is None:
+            return Text("-/s", style="progress.data.speed")
+
+        return Text(f"{task.speed:.1f}/s", style="progress.data.speed")
+
+
+class CountColumn(ProgressColumn):
+    """Completed and total items, or bytes for the bytes written."""
+
+    def render(self, task: Task) -> Text:
+        """Renders the count of a task.
+
+        Args:
+            task (Task): Task to render
+
+        Returns:
+            Text: Completed and total items
+        """
+        if task.description == BYTES_WRITTEN:
+            return DownloadColumn().render(task)
+
+        return MofNCompleteColumn().render(task)
+
+
+class StageProgress:
+    """Progress bars per stage, advanced by the tasks of the worker pool as they finish."""
+
+    def __init__(self, console: Optional[Console] = None) -> None:
+        """Creates the progress bars, disabled when the console isn't a terminal.
+
+        Args:
+            console (Optional[Console]): Console to draw on. Defaults to None, drawing on stderr.
+        """
+        if console is None:
+            console = Console(stderr=True)
+
+        self.progress = Progress(
+            TextColumn("{task.description}"),
+            BarColumn(),
+            CountColumn(),
+            RateColumn(),
+            TimeRemainingColumn(),
+            console=console,
+            disable=not console.is_terminal,
+        )
+        self.tasks: dict[str, TaskID] = {}
+        self.written: dict[Path, int] = {}
+
+    def __enter__(self) -> "StageProgress":
+        self.progress.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.progress.stop()
+
+    def expect(self, stage: str, items: int) -> None:
+        """Adds items to the total of a stage, creating the stage the first time.
+
+        Args:
+            stage (str): Name of the stage
+            items (int): Number of items to add
+        """
+        if stage not in self.tasks:
+            self.tasks[stage] = self.progress.add_task(stage, total=items)
+        else:
+            total = self.progress.tasks[self.tasks[stage]].total or 0
+            self.progress.update(self.tasks[stage], total=total + items)
+
+    def advance(self, stage: str, items: int = 1) -> None:
+        """Marks items of a stage as completed.
+
+        Args:
+            stage (str): Name of the stage
+            items (int): Number of items completed. Defaults to 1.
+        """
+        self.progress.advance(self.tasks[stage], items)
+
+    def track(
+        self, stage: str, futures: list[Future], sizes: Optional[list[int]] = None
+    ) -> list[Future]:
+        """Counts the items of each future of a stage when it finishes.
+
+        Args:
+            stage (str): Name of the stage
+            futures (list[Future]): Tasks of the stage
+            sizes (Optional[list[int]]): Items of every task, like the rooms of a block. Defaults to None, one item per task.
+
+        Returns:
+            list[Future]: The same futures
+        """
+        if sizes is None:
+            sizes = [1] * len(futures)
+
+        self.expect(stage, sum(sizes))
+
+        for future, size in zip(futures, sizes):
+            future.add_done_callback(lambda _, items=size: self.advance(stage, items))
+
+        return futures
+
+    def track_written(self, folder: Path, future: Optional[Future] = None) -> None:
+        """Adds the bytes written to a folder to the bytes written, once the future writing them finishes.
+
+        Args:
+            folder (Path): Folder written to
+            future (Optional[Future]): Task writing to the folder. Defaults to None, counting what's already written.
+        """
+        if future is None:
+            self.count_written(folder)
+        else:
+            future.add_done_callback(lambda _: self.count_written(folder))
+
+    def count_written(self, folder: Path) -> None:
+        """Updates the bytes written with the size of the files in a folder, subfolders are counted on their own.
+
+        Args:
+            folder (Path): Folder written to
+        """
+        size = sum(path.stat().st_size for path in folder.iterdir() if path.is_file())
+        self.written[folder] = size
+
+        if BYTES_WRITTEN not in self.tasks:
+            self.tasks[BYTES_WRITTEN] = self.progress.add_task(BYTES_WRITTEN)
+
+        total = sum(self.written.values())
+        self.progress.update(self.tasks[BYTES_WRITTEN], completed=total, total=total)
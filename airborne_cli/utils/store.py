@@ -0,0 +1,200 @@
+"""
+SQLite store for results. Risk sweeps are normalized into rooms, scenarios and results tables so they can be queried without loading them back into memory.
+"""
+import re
+import sqlite3
+from collections.abc import Iterator
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+
+# Only needed for annotations, `airborne query` runs without loading pandas
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rooms (
+    room_id INTEGER PRIMARY KEY,
+    pabellon TEXT NOT NULL,
+    ambiente TEXT NOT NULL,
+    UNIQUE (pabellon, ambiente)
+);
+CREATE TABLE IF NOT EXISTS scenarios (
+    scenario_id INTEGER PRIMARY KEY,
+    analysis TEXT NOT NULL,
+    parameter REAL NOT NULL,
+    occupancy REAL NOT NULL,
+    UNIQUE (analysis, parameter, occupancy)
+);
+CREATE TABLE IF NOT EXISTS results (
+    room_id INTEGER NOT NULL REFERENCES rooms (room_id),
+    scenario_id INTEGER NOT NULL REFERENCES scenarios (scenario_id),
+    ach REAL NOT NULL,
+    aforo INTEGER,
+    risk REAL
+);
+CREATE INDEX IF NOT EXISTS rooms_pabellon ON rooms (pabellon);
+CREATE INDEX IF NOT EXISTS rooms_ambiente ON rooms (ambiente);
+CREATE INDEX IF NOT EXISTS scenarios_occupancy ON scenarios (occupancy);
+CREATE INDEX IF NOT EXISTS results_room_ach ON results (room_id, ach);
+CREATE INDEX IF NOT EXISTS results_scenario_ach ON results (scenario_id, ach);
+"""
+
+# Risk columns are named riesgo_{occupancy}_{infected percentage}_inf or riesgo_{occupancy}_{cutoff}_um
+RISK_COLUMN = re.compile(
+    r"^riesgo_(?P<occupancy>[\d.]+)_(?P<parameter>[\d.]+)_(?P<unit>inf|um)$"
+)
+
+ANALYSIS = {"inf": "infected", "um": "aerosol"}
+
+
+def save_sqlite(database_path: Path, data_to_save: dict[str, "pd.DataFrame"]) -> None:
+    """Saves results to a SQLite database. Risk sweeps are stored in the normalized tables, every other result is stored as a table with its own name.
+
+    Args:
+        database_path (Path): Path of the database, it's created if it doesn't exist
+        data_to_save (dict[str, pd.DataFrame]): Names and pd.DataFrame to save
+    """
+    with sqlite3.connect(database_path) as connection:
+        connection.executescript(SCHEMA)
+
+        for name, df in data_to_save.items():
+            risk_columns = [
+                column for column in df.columns if RISK_COLUMN.match(column)
+            ]
+
+            if risk_columns:
+                insert_risk_sweep(connection, df, risk_columns)
+            else:
+                df.to_sql(
+                    name.replace("-", "_"),
+                    connection,
+                    if_exists="replace",
+                    chunksize=10_000,
+                )
+
+    connection.close()
+
+
+def insert_risk_sweep(
+    connection: sqlite3.Connection, data: "pd.DataFrame", risk_columns: list[str]
+) -> None:
+    """Normalizes a wide risk sweep and inserts it in bulk in a single transaction.
+
+    Args:
+        connection (sqlite3.Connection): Open database connection
+        data (pd.DataFrame): Risk sweep with one row per room and ACH
+        risk_columns (list[str]): Risk columns of the sweep
+    """
+    room_keys = list(zip(data["pabellon"].tolist(), data["ambiente"].tolist()))
+
+    connection.executemany(
+        "INSERT OR IGNORE INTO rooms (pabellon, ambiente) VALUES (?, ?)",
+        set(room_keys),
+    )
+    room_ids = {
+        (pabellon, ambiente): room_id
+        for (room_id, pabellon, ambiente) in connection.execute(
+            "SELECT room_id, pabellon, ambiente FROM rooms"
+        )
+    }
+    rooms = [room_ids[key] for key in room_keys]
+
+    for column in risk_columns:
+        match = RISK_COLUMN.match(column)
+        assert match is not None  # noqa: S101
+        scenario = (
+            ANALYSIS[match["unit"]],
+            float(match["parameter"]),
+            float(match["occupancy"]),
+        )
+
+        connection.execute(
+            "INSERT OR IGNORE INTO scenarios (analysis, parameter, occupancy) VALUES (?, ?, ?)",
+            scenario,
+        )
+        (scenario_id,) = connection.execute(
+            "SELECT scenario_id FROM scenarios WHERE analysis = ? AND parameter = ? AND occupancy = ?",
+            scenario,
+        ).fetchone()
+
+        aforo_column = column.replace("riesgo_", "aforo_", 1)
+        aforo = (
+            data[aforo_column].tolist()
+            if aforo_column in data.columns
+            else [None] * len(data)
+        )
+
+        connection.executemany(
+            "INSERT INTO results (room_id, scenario_id, ach, aforo, risk) VALUES (?, ?, ?, ?, ?)",
+            zip(
+                rooms,
+                [scenario_id] * len(data),
+                data["ach"].tolist(),
+                aforo,
+                data[column].tolist(),
+            ),
+        )
+
+
+def query_results(
+    database_path: Path,
+    pabellon: str | None = None,
+    ambiente: str | None = None,
+    analysis: str | None = None,
+    parameter: float | None = None,
+    occupancy: float | None = None,
+    min_ach: float | None = None,
+    max_ach: float | None = None,
+    min_risk: float | None = None,
+) -> Iterator[tuple[str, str, str, float, float, float, int | None, float]]:
+    """Runs a filtered lookup over the stored risk sweeps. Rows are yielded from the cursor one at a time.
+
+    Args:
+        database_path (Path): Path of the database
+        pabellon (str | None): Only rooms of this pavilion
+        ambiente (str | None): Only this room
+        analysis (str | None): Only `infected` or `aerosol` sweeps
+        parameter (float | None): Only this percentage of infected or aerosol cutoff
+        occupancy (float | None): Only this occupancy percentage
+        min_ach (float | None): Only ACH values greater or equal than this
+        max_ach (float | None): Only ACH values lower than this
+        min_risk (float | None): Only risks greater than this, as a fraction
+
+    Yields:
+        tuple: pabellon, ambiente, analysis, parameter, occupancy, ach, aforo and risk
+    """
+    filters = {
+        "rooms.pabellon = ?": pabellon,
+        "rooms.ambiente = ?": ambiente,
+        "scenarios.analysis = ?": analysis,
+        "scenarios.parameter = ?": parameter,
+        "scenarios.occupancy = ?": occupancy,
+        "results.ach >= ?": min_ach,
+        "results.ach < ?": max_ach,
+        "results.risk > ?": min_risk,
+    }
+    conditions = [
+        condition for condition, value in filters.items() if value is not None
+    ]
+    parameters = [value for value in filters.values() if value is not None]
+
+    query = (
+        "SELECT rooms.pabellon, rooms.ambiente, scenarios.analysis, scenarios.parameter,"
+        " scenarios.occupancy, results.ach, results.aforo, results.risk"
+        " FROM results"
+        " JOIN rooms USING (room_id)"
+        " JOIN scenarios USING (scenario_id)"
+    )
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += (
+        " ORDER BY rooms.pabellon, rooms.ambiente, scenarios.scenario_id, results.ach"
+    )
+
+    connection = sqlite3.connect(database_path)
+    try:
+        yield from connection.execute(query, parameters)
+    finally:
+        connection.close()
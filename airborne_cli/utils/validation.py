@@ -1,102 +1,210 @@
 """
 Validate input file for required fields, datatypes and values.
 """
+from dataclasses import dataclass
+from dataclasses import field
 
 import pandas as pd
 from numpy import dtype
+from pandas.api.types import is_numeric_dtype
 
 
-def validate_existing_columns(columns: pd.Index) -> bool:
-    """Validates the existence of all the required columns.
+@dataclass(frozen=True)
+class ColumnRule:
+    """Rule for a required column: the dtype it's coerced to, and optionally a lower bound and the allowed values."""
+
+    dtype: str
+    greater_than: float | None = None
+    allowed: frozenset[int] | None = None
+
+
+@dataclass(frozen=True)
+class Violation:
+    """A rule broken by one or more rows of the input."""
+
+    column: str
+    problem: str
+    rows: list[int] = field(default_factory=list)
+
+    def __str__(self) -> str:
+        rows = ", ".join(str(row) for row in self.rows[:10])
+        if len(self.rows) > 10:
+            rows += f" and {len(self.rows) - 10} more"
+
+        return f"Column {self.column} {self.problem}" + (
+            f" (rows {rows})" if self.rows else ""
+        )
+
+
+class SchemaError(ValueError):
+    """Raised when the input breaks the schema, holds every violation found."""
+
+    def __init__(self, violations: list[Violation]) -> None:
+        self.violations = violations
+        super().__init__(
+            f"[bold red]Alert![/bold red] Found {len(violations)} problems in the input data:\n"
+            + "\n".join(f"  - {violation}" for violation in violations)
+        )
+
+
+SCHEMA = {
+    "ambiente": ColumnRule("object"),
+    "area": ColumnRule("float64", greater_than=0),
+    "altura": ColumnRule("float64", greater_than=0),
+    "aforo_100": ColumnRule("int64", greater_than=0),
+    "actividad": ColumnRule("int64", allowed=frozenset({0, 1, 2})),
+    "permanencia": ColumnRule("float64", greater_than=0),
+}
+
+# Per room parameters that are not required, only their types are known when reading the input
+OPTIONAL_COLUMNS = {
+    "pabellon": ColumnRule("object"),
+    "Tipo": ColumnRule("object"),
+    "ACH_natural": ColumnRule("float64"),
+    "Mask Type": ColumnRule("int64"),
+}
+
+# Names the engines read the columns of the schema by, given to them once the input is validated
+ENGINE_COLUMNS = {
+    "ambiente": "Ambiente",
+    "pabellon": "Pabellon",
+    "area": "Area",
+    "altura": "Altura",
+    "aforo_100": "Aforo_100",
+    "actividad": "Actividad",
+    "permanencia": "Permanencia",
+}
+
+
+def engine_columns(data_frame: pd.DataFrame) -> pd.DataFrame:
+    """Renames the columns of a validated input to the names the engines use, and adds the volume of every room.
 
     Args:
-        columns (pd.Series): List of colummns in existing Data Frame
+        data_frame (pd.DataFrame): Data frame validated with `validate_schema`
 
     Returns:
-        bool: All the columns exist of not"""
-
-    REQUIRED_COLUMNS = [
-        "ambiente",
-        "area",
-        "altura",
-        "aforo_100",
-        "actividad",
-        "permanencia",
-    ]
-
-    for column_name in REQUIRED_COLUMNS:
-        if column_name not in columns:
-            raise ValueError(
-                f"[bold red]Alert![/bold red] Column {column_name} not found. Is a required column"
-            )
+        pd.DataFrame: Data frame with the engine columns
+    """
+    renamed = data_frame.rename(columns=ENGINE_COLUMNS)
 
-    return True
+    return renamed.assign(Volumen=renamed["Area"] * renamed["Altura"])
 
 
-def validate_data_types(data_frame: pd.DataFrame) -> bool:
-    """Validates dtypes for required columns
+def coerce_column(column: pd.Series, column_type: str) -> tuple[pd.Series, pd.Series]:
+    """Coerces a column to the type of its rule, when it can be done without losing information.
+    Integers are read as floats, and floats without decimals as integers.
 
     Args:
-        data_frame (pd.DataFrame): Data frame to validate data types
+        column (pd.Series): Column as read from the input
+        column_type (str): dtype of the rule
 
     Returns:
-        bool: Columns are the correct type or not
+        tuple[pd.Series, pd.Series]: Coerced column and mask of the values that couldn't be coerced
     """
-    REQUIRED_COLUMNS = {
-        "ambiente": dtype("object"),
-        "area": dtype("float64"),
-        "altura": dtype("float64"),
-        "aforo_100": dtype("int64"),
-        "actividad": dtype("int64"),
-        "permanencia": dtype("float64"),
-    }
-
-    for column_name, column_type in REQUIRED_COLUMNS.items():
-        if data_frame[column_name].dtype != column_type:
-            raise ValueError(
-                f"[bold red]Alert![/bold red] Column {column_name} is not the correct type {column_type}"
-            )
+    invalid = column.isna()
+
+    if column_type == "object":
+        if column.dtype != dtype("object"):
+            column = column.astype(str).astype("object")
+
+        return (column, invalid)
+
+    if not is_numeric_dtype(column.dtype):
+        column = pd.to_numeric(column, errors="coerce")
+        invalid = column.isna()
 
-    return True
+    if column_type == "int64":
+        invalid |= column.mod(1).ne(0)
 
+        if not invalid.any():
+            column = column.astype("int64")
+    else:
+        column = column.astype("float64")
 
-def validate_input(data_frame: pd.DataFrame) -> bool:
-    """Validate allowed values for the required columns
+    return (column, invalid)
+
+
+def validate_schema(
+    data_frame: pd.DataFrame,
+    schema: dict[str, ColumnRule] = SCHEMA,
+    optional: dict[str, ColumnRule] = OPTIONAL_COLUMNS,
+) -> pd.DataFrame:
+    """Validates the input against the schema in a single pass over each column, coercing dtypes where it's safe.
+    Instead of stopping at the first problem, every violation is collected with the rows where it happens.
 
     Args:
-        data_frame (pd.DataFrame): Data frame for analysis.
+        data_frame (pd.DataFrame): Data frame to validate
+        schema (dict[str, ColumnRule]): Rules for the required columns
+        optional (dict[str, ColumnRule]): Rules for the optional columns, checked when they are present
 
     Returns:
-        bool: The data is valid or not
+        pd.DataFrame: Data frame with the required and present optional columns coerced to their types
     """
-    # Validating area
-    if data_frame["area"].min() <= 0:
-        raise ValueError(
-            f"[bold red]Alert![/bold red] One of the area value in the document is equal to {data_frame['area'].min()} below 0"
-        )
-
-    # Validating altura
-    if data_frame["altura"].min() <= 0:
-        raise ValueError(
-            f"[bold red]Alert![/bold red] One of the height values in the document is equal to {data_frame['altura'].min()} below 0"
-        )
+    violations = []
+    coerced = data_frame.copy(deep=False)
+
+    for column_name, rule in schema.items():
+        if column_name not in data_frame.columns:
+            violations.append(Violation(column_name, "not found. Is a required column"))
+            continue
+
+        (column, invalid) = coerce_column(data_frame[column_name], rule.dtype)
+
+        if invalid.any():
+            violations.append(
+                Violation(
+                    column_name,
+                    f"has values that can't be read as {rule.dtype}",
+                    data_frame.index[invalid].tolist(),
+                )
+            )
 
-    # Validating aforo
-    if data_frame["aforo_100"].min() <= 0:
-        raise ValueError(
-            f"[bold red]Alert![/bold red] One of the occupancy values in the document is equal to {data_frame['aforo_100'].min()} below 0"
-        )
+        if rule.greater_than is not None:
+            out_of_range = column.le(rule.greater_than) & ~invalid
+            if out_of_range.any():
+                violations.append(
+                    Violation(
+                        column_name,
+                        f"has values equal to or below {rule.greater_than}",
+                        data_frame.index[out_of_range].tolist(),
+                    )
+                )
+
+        if rule.allowed is not None:
+            not_allowed = ~column.isin(rule.allowed) & ~invalid
+            if not_allowed.any():
+                violations.append(
+                    Violation(
+                        column_name,
+                        f"has values outside of the permitted input values {', '.join(str(value) for value in sorted(rule.allowed))}",
+                        data_frame.index[not_allowed].tolist(),
+                    )
+                )
+
+        coerced[column_name] = column
+
+    for column_name, rule in optional.items():
+        if column_name not in data_frame.columns:
+            continue
+
+        (column, invalid) = coerce_column(data_frame[column_name], rule.dtype)
+
+        # Rooms can leave an optional value empty, except in integer columns that can't hold it
+        if rule.dtype != "int64":
+            invalid &= data_frame[column_name].notna()
+
+        if invalid.any():
+            violations.append(
+                Violation(
+                    column_name,
+                    f"has values that can't be read as {rule.dtype}",
+                    data_frame.index[invalid].tolist(),
+                )
+            )
 
-    # Validating activity
-    if not data_frame["actividad"].between(0, 2, inclusive="both").all():
-        raise ValueError(
-            "[bold red]Alert![/bold red] One of the activity values in the document is outside of the permitted input values 0, 1, 2"
-        )
+        coerced[column_name] = column
 
-    # Validating permanencia
-    if data_frame["permanencia"].min() <= 0:
-        raise ValueError(
-            f"[bold red]Alert![/bold red] I also wish time could me negative, but it's not. Permanence on a space cannot be equal to {data_frame['permanencia'].min()}"
-        )
+    if violations:
+        raise SchemaError(violations)
 
-    return True
+    return coerced
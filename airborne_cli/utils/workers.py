@@ -0,0 +1,127 @@
+"""
+Worker pool shared by the stages of a command. Set the number of processes with `airborne --jobs`.
+"""
+from collections.abc import Callable
+from concurrent.futures import Executor
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil
+from typing import Any
+
+import pandas as pd
+
+
+# Blocks of rooms a stage hands to each worker. Every task pays for pickling its rooms and results, a few blocks per worker
+# keep that cost low while a slow block still leaves the other workers busy
+BLOCKS_PER_JOB = 4
+
+
+class SerialExecutor(Executor):
+    """Executor that runs every task as soon as it's submitted, used when a single job is requested to skip the cost of starting processes."""
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        """Runs a task and returns its finished future.
+
+        Args:
+            fn (Callable): Task to run
+
+        Returns:
+            Future: Future with the result or the exception of the task
+        """
+        future: Future = Future()
+
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as error:
+            future.set_exception(error)
+
+        return future
+
+
+def make_executor(jobs: int) -> Executor:
+    """Starts the worker pool of a command.
+
+    Args:
+        jobs (int): Number of worker processes
+
+    Returns:
+        Executor: Process pool, or an executor that runs tasks in this process for a single job
+    """
+    return SerialExecutor() if jobs == 1 else ProcessPoolExecutor(max_workers=jobs)
+
+
+def stage_parts(jobs: int) -> int:
+    """Returns the number of blocks the rooms of a stage are split in for a worker pool.
+
+    Args:
+        jobs (int): Number of worker processes of the pool, the one the command was given
+
+    Returns:
+        int: BLOCKS_PER_JOB per worker process, or per this process when tasks run in it
+    """
+    return jobs * BLOCKS_PER_JOB
+
+
+def split_rows(data: pd.DataFrame, parts: int) -> list[pd.DataFrame]:
+    """Splits a data set into blocks of consecutive rooms.
+
+    Args:
+        data (pd.DataFrame): Data to split
+        parts (int): Number of blocks
+
+    Returns:
+        list[pd.DataFrame]: Blocks with the rows in order, there are less of them when there are less rows than parts and a single empty one for empty data
+    """
+    size = max(ceil(len(data) / max(parts, 1)), 1)
+
+    return [
+        data.iloc[start : start + size] for start in range(0, max(len(data), 1), size)
+    ]
+
+
+def submit_chunks(
+    executor: Executor,
+    function: Callable[..., pd.DataFrame],
+    data: pd.DataFrame,
+    parts: int,
+    *args: Any,
+) -> list[Future]:
+    """Submits a function over blocks of rooms. The results are joined back with `gather_chunks`.
+
+    Args:
+        executor (Executor): Worker pool
+        function (Callable[..., pd.DataFrame]): Function taking the rooms as first argument
+        data (pd.DataFrame): Rooms to process
+        parts (int): Number of blocks
+
+    Returns:
+        list[Future]: Futures of every block, in order
+    """
+    return [
+        executor.submit(function, chunk, *args) for chunk in split_rows(data, parts)
+    ]
+
+
+def chunk_sizes(data: pd.DataFrame, parts: int) -> list[int]:
+    """Returns the rooms of every block `submit_chunks` submits, to count progress in rooms.
+
+    Args:
+        data (pd.DataFrame): Rooms to process
+        parts (int): Number of blocks
+
+    Returns:
+        list[int]: Number of rooms of every block, in order
+    """
+    return [len(chunk) for chunk in split_rows(data, parts)]
+
+
+def gather_chunks(futures: list[Future]) -> pd.DataFrame:
+    """Waits for the blocks submitted with `submit_chunks` and joins their results.
+
+    Args:
+        futures (list[Future]): Futures of every block, in order
+
+    Returns:
+        pd.DataFrame: Results of every block
+    """
+    return pd.concat([future.result() for future in futures], ignore_index=True)
@@ -183,6 +183,34 @@ def coverage(session: Session) -> None:
     session.run("coverage", *args)
 
 
+@session(python=python_versions[-1])
+def equivalence(session: Session) -> None:
+    """Compare the engines with their reference implementations."""
+    session.install(".")
+    session.install("pytest")
+    session.run(
+        "pytest",
+        "-rP",
+        "tests/lib/test_equivalence.py",
+        *session.posargs,
+        env={"AIRBORNE_EQUIVALENCE_SCALE": "1"},
+    )
+
+
+@session(python=python_versions[-1])
+def benchmarks(session: Session) -> None:
+    """Run the benchmark suite and compare it with the baseline."""
+    session.install(".")
+    session.run(
+        "airborne",
+        "bench",
+        "--suite",
+        "--baseline",
+        "benchmarks/baseline.json",
+        *session.posargs,
+    )
+
+
 @session(python=python_versions[0])
 def typeguard(session: Session) -> None:
     """Runtime type checking using Typeguard."""
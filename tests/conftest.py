@@ -6,6 +6,18 @@ from pathlib import Path
 from random import uniform, randint
 
 
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path_factory, monkeypatch) -> Path:
+    """Keeps the input cache of every test away from the user cache folder.
+
+    Returns:
+        Path: Folder used as cache home
+    """
+    cache_home_path = tmp_path_factory.mktemp("cache_home")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(cache_home_path))
+    return cache_home_path
+
+
 @pytest.fixture(scope="session")
 def general_data() -> pd.DataFrame:
     """Generates test data in the supported formats
@@ -29,12 +41,12 @@ def general_data() -> pd.DataFrame:
     for _ in range(0, 10, 1):
         data["ambiente"].append(fake.sentence(nb_words=2))
         data["pabellon"].append(fake.sentence(nb_words=2))
-        data["area"].append(uniform(0, 1000))
-        data["altura"].append(uniform(0, 15))
-        data["aforo_100"].append(randint(0, 100))
+        data["area"].append(uniform(1, 1000))
+        data["altura"].append(uniform(2, 15))
+        data["aforo_100"].append(randint(1, 100))
         data["ACH_natural"].append(uniform(0, 50))
-        data["actividad"].append(randint(0, 3))
-        data["permanencia"].append(uniform(0, 500))
+        data["actividad"].append(randint(0, 2))
+        data["permanencia"].append(uniform(1, 500))
 
     data_frame = pd.DataFrame.from_dict(data)
 
@@ -101,15 +113,47 @@ def json_input_file(general_data: pd.DataFrame, file_structure_root: Path) -> Pa
 
 @pytest.fixture(scope="session")
 def feather_input_file(general_data: pd.DataFrame, file_structure_root: Path) -> Path:
-    """Returns the path for the Excel test file
+    """Returns the path for the Feather test file
 
     Args:
         general_data (pd.DataFrame): Pandas DataFrame with fake data
         file_structure_root (Path): Path of the root of the temporary test file
 
     Returns:
-        Path: Path of the Excel test file
+        Path: Path of the Feather test file
     """
-    feather_file_path = file_structure_root.joinpath("feather_input.json")
+    feather_file_path = file_structure_root.joinpath("feather_input.feather")
     general_data.to_feather(feather_file_path)
     return feather_file_path
+
+
+@pytest.fixture(scope="session")
+def parquet_input_file(general_data: pd.DataFrame, file_structure_root: Path) -> Path:
+    """Returns the path for the Parquet test file
+
+    Args:
+        general_data (pd.DataFrame): Pandas DataFrame with fake data
+        file_structure_root (Path): Path of the root of the temporary test file
+
+    Returns:
+        Path: Path of the Parquet test file
+    """
+    parquet_file_path = file_structure_root.joinpath("parquet_input.parquet")
+    general_data.to_parquet(parquet_file_path)
+    return parquet_file_path
+
+
+@pytest.fixture(scope="session")
+def jsonl_input_file(general_data: pd.DataFrame, file_structure_root: Path) -> Path:
+    """Returns the path for the JSON lines test file
+
+    Args:
+        general_data (pd.DataFrame): Pandas DataFrame with fake data
+        file_structure_root (Path): Path of the root of the temporary test file
+
+    Returns:
+        Path: Path of the JSON lines test file
+    """
+    jsonl_file_path = file_structure_root.joinpath("jsonl_input.jsonl")
+    general_data.to_json(jsonl_file_path, orient="records", lines=True)
+    return jsonl_file_path
@@ -0,0 +1,136 @@
+from math import ceil
+
+import numpy as np
+import pytest
+
+from airborne_cli.lib.ach import CO2_BACKGROUND
+from airborne_cli.lib.ach import TIME_STEPS
+from airborne_cli.lib.ach import ach_required
+from airborne_cli.lib.ach import ach_required_rooms
+from airborne_cli.lib.ach import co2_batch
+from airborne_cli.lib.ach import co2_concentration
+from airborne_cli.lib.ach import co2_model
+from airborne_cli.lib.ach import max_occupancy
+from airborne_cli.lib.ach import room_calculation
+from airborne_cli.lib.ach import room_co2_calculation
+from airborne_cli.lib.ach import time_grid
+from airborne_cli.lib.bench import synthetic_rooms
+from airborne_cli.utils.validation import engine_columns
+from airborne_cli.utils.validation import validate_schema
+
+
+def test_time_grid_ends_before_permanence():
+    # Stepping up to the permanence added a 401st step for 29 minutes
+    (time_series, dt) = time_grid(29)
+
+    assert len(time_series) == TIME_STEPS
+    assert time_series[-1] == pytest.approx(29 * 60 - dt)
+
+
+def test_co2_reaches_steady_state():
+    model = co2_model(Ar=50, Hr=3, ACH_custom=4)
+    result = co2_concentration(Ar=50, Hr=3, n_people=20, ACH_custom=4, permanence=600)
+
+    steady_state = CO2_BACKGROUND + 20 * model.emission / model.volume / model.loss_rate
+
+    assert result["co2"].is_monotonic_increasing
+    assert result["co2"].iloc[-1] == pytest.approx(steady_state, rel=1e-6)
+
+
+def test_co2_without_outdoor_air_grows_linearly():
+    result = co2_concentration(n_people=10, outside_air=0, permanence=60)
+
+    assert np.diff(result["co2"]) == pytest.approx(np.diff(result["co2"])[0])
+    assert result["co2"].iloc[0] > CO2_BACKGROUND
+
+
+def test_co2_batch_matches_rooms():
+    area = np.array([30.0, 80.0, 250.0])
+    people = np.array([10, 40, 25])
+    occupancy_type = np.array([0, 1, 1])
+    outside_air = np.array([100, 0, 50])
+    ach = np.array([0.5, 3.0, 12.0])
+
+    levels = co2_batch(
+        area[:, None],
+        3.0,
+        people[:, None],
+        90,
+        ach[None, :],
+        occupancy_type=occupancy_type[:, None],
+        outside_air=outside_air[:, None],
+    )
+
+    assert levels.shape == (3, 3, TIME_STEPS)
+    for room in range(3):
+        for rate in range(3):
+            result = co2_concentration(
+                Ar=area[room],
+                Hr=3.0,
+                n_people=people[room],
+                permanence=90,
+                ACH_custom=ach[rate],
+                occupancy_type=occupancy_type[room],
+                outside_air=outside_air[room],
+            )
+            np.testing.assert_allclose(levels[room, rate], result["co2"], rtol=1e-12)
+
+
+def test_room_co2_matches_separate_engines():
+    arguments = dict(Ar=60, Hr=2.8, n_people=25, permanence=45, ACH_custom=3)
+    result = room_co2_calculation(**arguments, occupancy_type=1, mask_type=0)
+    risk = room_calculation(**arguments, occupancy_type=1, mask_type=0)
+    co2 = co2_concentration(**arguments, occupancy_type=1)
+
+    frame = result.to_frame()
+
+    assert list(frame.columns) == [*risk.columns, "co2"]
+    for column in risk.columns:
+        np.testing.assert_allclose(frame[column], risk[column], rtol=1e-12)
+    np.testing.assert_allclose(frame["co2"], co2["co2"], rtol=1e-12)
+
+
+def test_max_occupancy_is_last_safe_count():
+    area = np.array([40.0, 120.0, 300.0])
+    results = max_occupancy(area, 3.0, 0, 90, 4.0, set_risk=0.03)
+
+    for room in range(3):
+        risks = [
+            room_calculation(
+                Ar=area[room], Hr=3.0, n_people=people, permanence=90, ACH_custom=4.0
+            )["risk"].iloc[-1]
+            for people in (results["aforo"][room], results["aforo"][room] + 1)
+        ]
+
+        assert risks[0] == pytest.approx(results["riesgo"][room])
+        assert risks[0] <= 0.03 < risks[1]
+
+
+def test_ach_required_rooms_matches_rooms():
+    data = engine_columns(validate_schema(synthetic_rooms(3, ["aula"], seed=1))).assign(
+        **{"Mask Type": [0, 1, 2]}
+    )
+    results = ach_required_rooms(data, 70.0, None, inf_percent=5)
+
+    assert results == [
+        ach_required(
+            room["Area"],
+            room["Altura"],
+            ceil(room["Aforo_100"] * (70.0 / 100)),
+            room["Actividad"],
+            room["Permanencia"],
+            mask_type=room["Mask Type"],
+            inf_percent=5,
+        )
+        for (_, room) in data.iterrows()
+    ]
+
+
+def test_ach_required_rooms_occupancy():
+    # Fuller rooms need more ventilation, every ACH_{occupancy}_aforo column is solved at its own occupancy
+    data = engine_columns(validate_schema(synthetic_rooms(3, ["aula"], seed=1)))
+
+    partial = ach_required_rooms(data, 30.0, 0)
+    full = ach_required_rooms(data, 100.0, 0)
+
+    assert all(low < high for (low, high) in zip(partial, full))
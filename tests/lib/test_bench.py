@@ -0,0 +1,135 @@
+import json
+
+import pandas as pd
+import pytest
+from rich.console import Console
+
+from airborne_cli.lib.bench import BenchResult
+from airborne_cli.lib.bench import compare_baseline
+from airborne_cli.lib.bench import comparison_table
+from airborne_cli.lib.bench import results_report
+from airborne_cli.lib.bench import results_table
+from airborne_cli.lib.bench import run_benchmarks
+from airborne_cli.lib.bench import run_suite
+from airborne_cli.lib.bench import synthetic_rooms
+from airborne_cli.settings.model import compile_settings
+from airborne_cli.utils.validation import OPTIONAL_COLUMNS
+from airborne_cli.utils.validation import SCHEMA
+from airborne_cli.utils.validation import validate_schema
+
+
+@pytest.fixture(scope="module")
+def parameters():
+    return compile_settings(
+        {
+            "general": {"aforo": [50.0, 100.0], "default_aerosol": "40"},
+            "ach": {
+                "max_risk": 3.0,
+                "mask_default": "KN95",
+                "inf_percent": [10.0],
+                "viral_load": "10",
+                "aerosol": ["40"],
+            },
+            "ashrae": {
+                "aula": {"rate_people": 3.8, "rate_area": 0.3},
+                "taller": {"rate_people": 5, "rate_area": 0.9},
+            },
+        }
+    )
+
+
+def test_synthetic_rooms_are_valid():
+    rooms = synthetic_rooms(500, ["aula", "taller"])
+
+    validate_schema(rooms)
+    assert set(rooms.columns) <= {*SCHEMA, *OPTIONAL_COLUMNS}
+    assert len(rooms) == 500
+    assert set(rooms["Tipo"]) == {"aula", "taller"}
+
+
+def test_synthetic_rooms_are_reproducible():
+    pd.testing.assert_frame_equal(
+        synthetic_rooms(50, ["aula"], seed=3), synthetic_rooms(50, ["aula"], seed=3)
+    )
+
+
+def test_whole_inventory_benchmarks(parameters):
+    results = run_benchmarks(
+        [10, 100], ["ashrae_calculation", "load_data_csv"], parameters, repeat=1
+    )
+
+    assert [(result.benchmark, result.rooms) for result in results] == [
+        ("ashrae_calculation", 10),
+        ("ashrae_calculation", 100),
+        ("load_data_csv", 10),
+        ("load_data_csv", 100),
+    ]
+    assert all(result.rooms_timed == result.rooms for result in results)
+    assert not any(result.estimated for result in results)
+
+
+def test_per_room_benchmarks_are_scaled(parameters):
+    results = run_benchmarks([2, 20], ["room_calculation"], parameters, sample=2)
+
+    assert [result.estimated for result in results] == [False, True]
+    assert results[1].seconds == pytest.approx(results[0].seconds * 10)
+
+
+def test_missing_requirement_is_skipped(parameters, monkeypatch):
+    monkeypatch.setattr("importlib.util.find_spec", lambda name: None)
+
+    (result,) = run_benchmarks([10], ["figure_export"], parameters)
+
+    assert result.skipped == "kaleido is not installed"
+    console = Console(record=True, width=120)
+    console.print(results_table([result]))
+    assert "skipped" in console.export_text()
+
+
+def test_report_is_json(parameters):
+    results = run_benchmarks([10], ["save_data_parquet"], parameters, repeat=1)
+
+    report = json.loads(json.dumps(results_report(results)))
+
+    assert report["results"][0]["benchmark"] == "save_data_parquet"
+
+
+def test_suite_times_whole_inventory(parameters):
+    (simulation, round_trip) = run_suite(
+        ["single_simulation", "round_trip_parquet_100k"], parameters
+    )
+
+    assert (simulation.benchmark, simulation.rooms_timed) == ("single_simulation", 1)
+    assert round_trip.rooms_timed == 100_000
+    assert not simulation.estimated
+
+
+def test_regressions_over_threshold(parameters):
+    results = [
+        BenchResult("single_simulation", 1, 1, 1.3, 1 / 1.3, False),
+        BenchResult("ach_solve", 1, 1, 1.1, 1 / 1.1, False),
+        BenchResult("ashrae_100k", 100_000, 100_000, 0.5, 200_000, False),
+    ]
+    baseline = json.loads(
+        json.dumps(
+            results_report(
+                [
+                    BenchResult("single_simulation", 1, 1, 1.0, 1.0, False),
+                    BenchResult("ach_solve", 1, 1, 1.0, 1.0, False),
+                ]
+            )
+        )
+    )
+
+    comparisons = compare_baseline(results, baseline, threshold=0.2)
+
+    assert [comparison.regressed for comparison in comparisons] == [
+        True,
+        False,
+        False,
+    ]
+    assert comparisons[0].change == pytest.approx(0.3)
+    assert comparisons[2].baseline is None
+    console = Console(record=True, width=120)
+    console.print(comparison_table(comparisons))
+    assert "+30.0%" in console.export_text()
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from airborne_cli.lib.ach import co2_concentration
+from airborne_cli.lib.bench import synthetic_rooms
+from airborne_cli.lib.co2 import ACH_TOLERANCE
+from airborne_cli.lib.co2 import co2_ach_calculation
+from airborne_cli.utils.validation import engine_columns
+from airborne_cli.utils.validation import validate_schema
+
+
+@pytest.mark.parametrize("occupancy_type", [0, 1])
+def test_required_ach_meets_ceiling(occupancy_type):
+    data = engine_columns(validate_schema(synthetic_rooms(30, ["aula"], seed=2)))
+    result = co2_ach_calculation(
+        data, 70, 900, outside_air=50, occupancy_type=occupancy_type
+    )
+
+    ventilated = result[result["ACH_CO2_70"] > 0]
+
+    assert len(ventilated) > 5
+    for room in ventilated.head(5).itertuples():
+        arguments = dict(
+            Ar=room.Area,
+            Hr=room.Altura,
+            n_people=np.ceil(room.Aforo_100 * 0.7),
+            activity_type=room.Actividad,
+            permanence=room.Permanencia,
+            occupancy_type=occupancy_type,
+            outside_air=50,
+        )
+        required = getattr(room, "ACH_CO2_70")
+        # Less ventilation than the tolerance of the search goes over the ceiling
+        less = max(required - 3 * ACH_TOLERANCE, 0)
+
+        assert co2_concentration(ACH_custom=required, **arguments)["co2"].max() <= (
+            900 + 1e-9
+        )
+        assert co2_concentration(ACH_custom=less, **arguments)["co2"].max() > 900
+
+
+def test_outdoor_air_at_natural_ach():
+    data = engine_columns(
+        validate_schema(synthetic_rooms(10, ["aula"], seed=2))
+    ).assign(ACH_natural=4.0)
+    result = co2_ach_calculation(data, 100, 1000, outside_air=25)
+
+    np.testing.assert_allclose(
+        result["Aire_exterior_CO2_100"], result["ACH_CO2_100"] * 25 / 4.0
+    )
+
+
+def test_ceiling_below_outdoor_co2():
+    data = engine_columns(validate_schema(synthetic_rooms(3, ["aula"])))
+
+    with pytest.raises(ValueError, match="above the 415 ppm outdoors"):
+        co2_ach_calculation(data, 100, 400)
+
+
+def test_natural_ach_short_of_outdoor_air():
+    data = engine_columns(validate_schema(synthetic_rooms(30, ["aula"], seed=2)))
+    data["ACH_natural"] = np.resize([0.0, 0.5, 50.0], len(data))
+    result = co2_ach_calculation(data, 100, 800)
+
+    needed = result["ACH_CO2_100"] > 0
+    short = result["Excede_ACH_natural_CO2_100"]
+    percentage = result["Aire_exterior_CO2_100"]
+
+    assert short.dtype == bool
+    assert short.any() and not short.all()
+    assert (short == (percentage > 100)).all()
+    assert np.isinf(percentage[needed & (result["ACH_natural"] == 0)]).all()
+    assert (percentage[~needed] == 0).all()
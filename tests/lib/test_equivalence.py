@@ -0,0 +1,69 @@
+import os
+from dataclasses import replace
+
+import numpy as np
+import pytest
+from rich.console import Console
+
+from airborne_cli.lib import ach
+from airborne_cli.lib.equivalence import ENGINES
+from airborne_cli.lib.equivalence import column_error
+from airborne_cli.lib.equivalence import equivalence_table
+from airborne_cli.lib.equivalence import run_equivalence
+from airborne_cli.lib.equivalence import scenario_corpus
+
+
+# The nox session runs the whole corpus, the test suite a sample of it
+SCALE = float(os.environ.get("AIRBORNE_EQUIVALENCE_SCALE", "0.01"))
+
+
+@pytest.mark.parametrize("engine", list(ENGINES))
+def test_engine_matches_reference(engine):
+    errors = run_equivalence([engine], scale=SCALE)
+    Console(width=120).print(equivalence_table(errors))
+
+    assert [error.column for error in errors if not error.passed] == []
+
+
+def test_corpus_covers_every_option():
+    engine = ENGINES["room_calculation"]
+    scenarios = scenario_corpus(engine, 12, seed=3)
+
+    for name, options in engine.options.items():
+        assert {scenario[name] for scenario in scenarios} == set(options)
+    assert scenarios == scenario_corpus(engine, 12, seed=3)
+
+
+def test_differences_are_reported():
+    engine = ENGINES["co2_concentration"]
+    scenarios = scenario_corpus(engine, 7)
+    reference = [engine.reference(**scenario) for scenario in scenarios]
+    fast = [{**columns, "co2": columns["co2"] * (1 + 1e-6)} for columns in reference]
+    fast[2] = {**fast[2], "co2": np.zeros(3)}
+
+    error = column_error(engine, "co2", fast, reference)
+    exact = column_error(replace(engine, name="same"), "co2", reference, reference)
+
+    assert not error.passed
+    assert error.failures == 7
+    assert error.worst_scenario == 2
+    assert error.max_absolute == float("inf")
+    assert exact.passed
+    assert exact.max_absolute == 0
+
+
+def test_references_do_not_share_the_rates(monkeypatch):
+    room_model = ach.room_model
+    monkeypatch.setattr(
+        ach,
+        "room_model",
+        lambda **options: replace(
+            room_model(**options), emission=room_model(**options).emission * 2
+        ),
+    )
+
+    errors = run_equivalence(["room_calculation"], scale=SCALE)
+
+    assert "virus_concentration" in [
+        error.column for error in errors if not error.passed
+    ]
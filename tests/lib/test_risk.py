@@ -0,0 +1,60 @@
+from math import ceil
+
+import numpy as np
+import pytest
+
+from airborne_cli.lib.ach import co2_concentration
+from airborne_cli.lib.ach import room_calculation
+from airborne_cli.lib.bench import synthetic_rooms
+from airborne_cli.lib.risk import ACH_SWEEP
+from airborne_cli.lib.risk import OCCUPANCY_SWEEP
+from airborne_cli.lib.risk import ach_risk_co2_calculation
+from airborne_cli.lib.risk import co2_at_risk
+from airborne_cli.utils.validation import engine_columns
+from airborne_cli.utils.validation import validate_schema
+
+
+def test_co2_sweep_matches_rooms():
+    data = engine_columns(validate_schema(synthetic_rooms(20, ["aula"], seed=1)))
+    sweep = ach_risk_co2_calculation(data, max_risk=0.03)
+
+    assert len(sweep) == len(data) * len(ACH_SWEEP)
+
+    room = data.iloc[17]
+    row = sweep.iloc[17 * len(ACH_SWEEP) + 9]
+    for occupancy in OCCUPANCY_SWEEP:
+        people = ceil(room.Aforo_100 * occupancy / 100)
+        risk = room_calculation(
+            Ar=room.Area,
+            Hr=room.Altura,
+            n_people=people,
+            activity_type=room.Actividad,
+            activity_type_sick=room.Actividad,
+            permanence=room.Permanencia,
+            ACH_custom=ACH_SWEEP[9],
+            inf_percent=10,
+        )
+        co2 = co2_concentration(
+            Ar=room.Area,
+            Hr=room.Altura,
+            n_people=people,
+            activity_type=room.Actividad,
+            permanence=room.Permanencia,
+            ACH_custom=ACH_SWEEP[9],
+        )
+
+        assert row[f"aforo_{occupancy}_co2"] == people
+        assert row[f"riesgo_{occupancy}_co2"] == pytest.approx(risk["risk"].iloc[-1])
+        assert row[f"co2_{occupancy}_ppm"] == pytest.approx(co2["co2"].iloc[-1])
+        assert row[f"co2_estable_{occupancy}_ppm"] >= row[f"co2_{occupancy}_ppm"]
+
+
+def test_co2_at_risk_interpolates_crossing():
+    risk = np.array([[[0.5], [0.04], [0.02]], [[0.01], [0.005], [0.001]]])
+    co2 = np.array([[[2000.0], [1000.0], [800.0]], [[900.0], [700.0], [600.0]]])
+
+    threshold = co2_at_risk(risk, co2, max_risk=0.03)
+
+    assert threshold[0, 0] == pytest.approx(900)
+    # Below the threshold at every ACH of the sweep
+    assert np.isnan(threshold[1, 0])
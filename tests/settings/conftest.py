@@ -11,6 +11,7 @@ def test_config_data() -> tomlkit.TOMLDocument:
     general = table()
     ach = table()
     ashrae = table()
+    risk = table()
     graphics = table()
 
     general["ach"] = False
@@ -21,6 +22,8 @@ def test_config_data() -> tomlkit.TOMLDocument:
     general["save_graphics"] = True
     general["save"] = True
     general["save_format"] = "csv"
+    general["compression"] = "none"
+    general["jobs"] = 1
     general["aforo"] = [30.0, 40.0, 50.0, 70.0, 100.0]
     general["default_aerosol"] = "40"
 
@@ -29,6 +32,8 @@ def test_config_data() -> tomlkit.TOMLDocument:
     ach["inf_percent"] = [10.0]
     ach["viral_load"] = "10"
     ach["aerosol"] = ["20", "40", "100"]
+    ach["max_co2"] = 1000.0
+    ach["outside_air"] = 100.0
 
     ashrae["oficina"] = {"rate_people": 2.5, "rate_area": 0.3}
     ashrae["teatro"] = {"rate_people": 5, "rate_area": 0.3}
@@ -37,6 +42,10 @@ def test_config_data() -> tomlkit.TOMLDocument:
     ashrae["laboratorio"] = {"rate_people": 5, "rate_area": 0.9}
     ashrae["laboratorio_computacion"] = {"rate_people": 5, "rate_area": 0.6}
 
+    risk["risk_inf"] = True
+    risk["risk_aerosol"] = True
+    risk["risk_co2"] = False
+
     graphics["template"] = "plotly_white"
     graphics["color_scheme"] = [
         "#458588",
@@ -56,5 +65,10 @@ def test_config_data() -> tomlkit.TOMLDocument:
     config.add(nl())
     config.add("ach", ach)
     config.add(nl())
+    config.add("ashrae", ashrae)
+    config.add(nl())
+    config.add("risk", risk)
+    config.add(nl())
+    config.add("graphics", graphics)
 
     return config
@@ -1,7 +1,69 @@
+import os
+
+import pytest
+import tomlkit
+
 from airborne_cli.settings.io import generate_config
+from airborne_cli.settings.io import load_config
+from airborne_cli.settings.io import save_config
+from airborne_cli.settings.io import settings_path
 
 
 def test_generate_config(test_config_data):
     default_config = generate_config()
 
     assert test_config_data == default_config
+
+
+def test_generate_config_has_every_setting():
+    default_config = generate_config()
+
+    with open(settings_path(), mode="rb") as settings_file:
+        settings = tomlkit.load(settings_file)
+
+    assert {name: set(section) for (name, section) in default_config.items()} == {
+        name: set(section) for (name, section) in settings.items()
+    }
+
+
+class TestLoadConfig:
+    @pytest.fixture
+    def settings_file(self, tmp_path, monkeypatch):
+        settings_file = tmp_path.joinpath("settings.toml")
+        settings_file.write_text(tomlkit.dumps(generate_config()), encoding="utf-8")
+        monkeypatch.setenv("AIRBORNE_CLI_SETTINGS", str(settings_file))
+        return settings_file
+
+    def test_parsed_once(self, settings_file, monkeypatch):
+        config = load_config()
+
+        def fail_load(*args, **kwargs):
+            raise AssertionError("Settings parsed again without changes")
+
+        monkeypatch.setattr(tomlkit, "load", fail_load)
+        assert load_config() is config
+
+    def test_invalidated_on_change(self, settings_file):
+        config = load_config()
+
+        updated = generate_config()
+        updated["general"]["save_format"] = "parquet"
+        settings_file.write_text(tomlkit.dumps(updated), encoding="utf-8")
+        os.utime(settings_file, ns=(0, settings_file.stat().st_mtime_ns + 10**9))
+
+        assert load_config() is not config
+        assert load_config()["general"]["save_format"] == "parquet"
+
+    def test_save_updates_cache(self, settings_file):
+        config = load_config()
+        config["general"]["save_format"] = "feather"
+        save_config(config)
+
+        assert load_config()["general"]["save_format"] == "feather"
+
+    def test_independent_of_working_directory(self, tmp_path, monkeypatch):
+        monkeypatch.delenv("AIRBORNE_CLI_SETTINGS", raising=False)
+        monkeypatch.chdir(tmp_path)
+
+        assert settings_path().exists()
+        assert "general" in load_config()
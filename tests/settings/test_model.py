@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from airborne_cli.settings.model import compile_ashrae
+from airborne_cli.settings.model import compile_settings
+from airborne_cli.settings.model import mask_index
+from airborne_cli.utils.options import MaskType
+
+
+@pytest.fixture
+def default_config():
+    return {
+        "general": {"aforo": [30.0, 40.0, 50.0, 70.0, 100.0], "default_aerosol": "40"},
+        "ach": {
+            "max_risk": 3.0,
+            "mask_default": "KN95",
+            "inf_percent": [10.0],
+            "viral_load": "10",
+            "aerosol": ["20", "40", "100"],
+        },
+        "ashrae": {
+            "aula": {"rate_people": 3.8, "rate_area": 0.3},
+            "taller": {"rate_people": 5, "rate_area": 0.9},
+        },
+    }
+
+
+def test_compile_settings(default_config):
+    parameters = compile_settings(default_config)
+
+    assert parameters.max_risk == pytest.approx(0.03)
+    assert parameters.mask_type == 1
+    assert parameters.viral_load == 10
+    assert parameters.cutoff_type == 3
+    assert parameters.inf_percent == (10.0,)
+    assert parameters.aerosol == ("20", "40", "100")
+    assert parameters.aforo == (30.0, 40.0, 50.0, 70.0, 100.0)
+
+
+def test_parameters_are_frozen(default_config):
+    parameters = compile_settings(default_config)
+
+    with pytest.raises(AttributeError):
+        parameters.max_risk = 0.5  # type: ignore
+
+
+def test_mask_on_file():
+    assert mask_index(MaskType.i5) is None
+
+
+class TestAshraeRates:
+    def test_lookup(self, default_config):
+        rates = compile_ashrae(default_config["ashrae"])
+
+        (rate_people, rate_area) = rates.lookup(pd.Series(["aula", "taller", "aula"]))
+
+        np.testing.assert_array_equal(rate_people, [3.8, 5.0, 3.8])
+        np.testing.assert_array_equal(rate_area, [0.3, 0.9, 0.3])
+
+    def test_unknown_room_type(self, default_config):
+        rates = compile_ashrae(default_config["ashrae"])
+
+        with pytest.raises(ValueError, match="cocina"):
+            rates.lookup(pd.Series(["aula", "cocina"]))
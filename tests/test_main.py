@@ -1,2 +1,137 @@
 """Test cases for the __main__ module."""
+import subprocess
+import sys
+
+import pandas as pd
 import pytest
+
+
+HEAVY_MODULES = ["pandas", "numpy", "plotly", "pyarrow", "openpyxl"]
+
+# Import time of airborne_cli.cli, in microseconds
+IMPORT_BUDGET = 200_000
+
+
+def import_times() -> dict[str, int]:
+    """Imports the CLI module in a new interpreter.
+
+    Returns:
+        dict[str, int]: Cumulative import time of every module imported, in microseconds
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import airborne_cli.cli"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        (_, cumulative, module) = line.split("|")
+        if cumulative.strip().isdigit():
+            times[module.strip()] = int(cumulative)
+
+    return times
+
+
+def test_import_time_budget() -> None:
+    """The CLI module is imported without the heavy dependencies and within budget. The fastest of a few imports is used so a busy machine doesn't fail the budget."""
+    runs = [import_times() for _ in range(3)]
+
+    assert [module for module in HEAVY_MODULES if module in runs[0]] == []
+    assert min(times["airborne_cli.cli"] for times in runs) < IMPORT_BUDGET
+
+
+@pytest.mark.parametrize(
+    "arguments",
+    [
+        ["--help"],
+        ["config", "show"],
+        ["query", "--help"],
+        ["batch", "--help"],
+        ["bench", "--help"],
+        ["co2-ach", "--help"],
+        ["occupancy", "--help"],
+    ],
+)
+def test_lightweight_commands(arguments: list[str]) -> None:
+    """Commands that don't process data don't load the heavy dependencies.
+
+    Args:
+        arguments (list[str]): Command line arguments
+    """
+    script = (
+        "import sys\n"
+        "from airborne_cli.cli import app\n"
+        "try:\n"
+        f"    app({arguments!r})\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"print([module for module in {HEAVY_MODULES!r} if module in sys.modules])\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    )
+
+    assert result.stdout.splitlines()[-1] == "[]"
+
+
+@pytest.mark.parametrize("options", [["--chunk-size", "5"], ["--memory-limit", "1"]])
+def test_graphics_need_the_whole_input(
+    tmp_path, monkeypatch, options: list[str]
+) -> None:
+    """Figures aren't made chunk by chunk, where each chunk would overwrite the figures of the one before.
+
+    Args:
+        options (list[str]): Options that process the input in chunks
+    """
+    from typer.testing import CliRunner
+
+    from airborne_cli import cli
+    from airborne_cli.lib.bench import synthetic_rooms
+
+    data_in = tmp_path.joinpath("rooms.csv")
+    synthetic_rooms(20, ["aula"]).to_csv(data_in, index=False)
+    # The projection depends on the memory in use, the budget is taken as too small for the whole input
+    monkeypatch.setattr(cli, "budget_chunk_size", lambda *args: 5)
+
+    result = CliRunner().invoke(cli.app, ["run", str(data_in), "--graphics", *options])
+
+    assert isinstance(result.exception, ValueError)
+    assert "--graphics" in str(result.exception)
+    assert not tmp_path.joinpath("results").exists()
+
+
+@pytest.mark.parametrize(
+    ("arguments", "result_file"),
+    [
+        (["occupancy"], "max_occupancy.csv"),
+        (["co2-ach"], "required_co2_ach.csv"),
+        (["risk"], "risk_ach_inf_data.csv"),
+        (["risk", "--risk-co2"], "risk_ach_co2_data.csv"),
+        (["run", "--ach", "--risk"], "ach-ashrae.csv"),
+    ],
+)
+def test_commands_on_schema_input(
+    tmp_path, general_data, arguments: list[str], result_file: str
+) -> None:
+    """Commands run on an input with only the columns of the schema, the engines get their names once it's validated.
+
+    Args:
+        arguments (list[str]): Command and options to run
+        result_file (str): Results file the command writes, with the same number of rows for every room
+    """
+    from typer.testing import CliRunner
+
+    from airborne_cli import cli
+
+    data_in = tmp_path.joinpath("rooms.csv")
+    # run looks up the ASHRAE rates by room type, one of the optional columns of the schema
+    general_data.assign(Tipo="aula").to_csv(data_in, index=False)
+
+    result = CliRunner().invoke(cli.app, [arguments[0], str(data_in), *arguments[1:]])
+
+    assert result.exception is None
+    results = pd.read_csv(tmp_path.joinpath("results", result_file))
+    assert len(results) > 0
+    assert len(results) % len(general_data) == 0
@@ -1,9 +1,31 @@
+import io
+import json
+import os
 import pytest
 import pandas as pd
 
 from loguru import logger
+from pathlib import Path
+from pyarrow import csv as pa_csv
 
-from airborne_cli.utils.io import load_data, make_results_folder
+from airborne_cli.lib.bench import synthetic_rooms
+from airborne_cli.lib.risk import (
+    ach_risk_aerosol_calculation,
+    ach_risk_inf_percent_calculation,
+)
+from airborne_cli.utils import io as io_module
+from airborne_cli.utils.io import (
+    append_data,
+    load_data,
+    input_cache_path,
+    load_data_chunks,
+    make_results_folder,
+    prune_input_cache,
+    save_data,
+    write_ndjson,
+)
+from airborne_cli.utils.validation import engine_columns
+from airborne_cli.utils.validation import validate_schema
 
 
 class TestDataLoading:
@@ -21,6 +43,48 @@ class TestDataLoading:
 
         logger.info(f"Data: {data.head()} - Data Folder: {data_folder}")
 
+    def test_csv_typed_input(self, general_data, tmp_path):
+        csv_file = tmp_path.joinpath("typed.csv")
+        general_data.assign(
+            area=general_data["area"].round().clip(lower=1).astype("int64"),
+            aforo_100=general_data["aforo_100"].astype("float64"),
+            Tipo="aula",
+        ).to_csv(csv_file, index=False)
+
+        (data, _) = load_data(csv_file)
+
+        assert data["Area"].dtype == "float64"
+        assert data["Aforo_100"].dtype == "int64"
+        assert data["Tipo"].dtype == "object"
+
+    def test_csv_mask_type(self, general_data, tmp_path):
+        csv_file = tmp_path.joinpath("masks.csv")
+        general_data.assign(**{"Mask Type": 2}).to_csv(csv_file, index=False)
+
+        (data, _) = load_data(csv_file)
+        chunk = next(load_data_chunks(csv_file, 3))
+
+        assert data["Mask Type"].dtype == "int64"
+        assert chunk["Mask Type"].dtype == "int64"
+        assert (data["Mask Type"] == 2).all()
+
+    def test_csv_decimal_integers(self, general_data, tmp_path, monkeypatch):
+        csv_file = tmp_path.joinpath("decimals.csv")
+        general_data.assign(aforo_100=general_data["aforo_100"] + 0.5).to_csv(
+            csv_file, index=False
+        )
+        reads = []
+        read_csv = pa_csv.read_csv
+        monkeypatch.setattr(
+            pa_csv,
+            "read_csv",
+            lambda *args, **kwargs: reads.append(args) or read_csv(*args, **kwargs),
+        )
+
+        with pytest.raises(ValueError):
+            load_data(csv_file)
+        assert len(reads) == 1
+
     def test_json_input(self, json_input_file):
         (data, data_folder) = load_data(json_input_file)
         assert isinstance(data, pd.DataFrame)
@@ -28,9 +92,173 @@ class TestDataLoading:
 
         logger.info(f"Data: {data.head()} - Data Folder: {data_folder}")
 
-    def test_feather_input(self, feather_input_file):
+    def test_feather_input(self, feather_input_file, general_data):
+        (data, data_folder) = load_data(feather_input_file)
+        pd.testing.assert_frame_equal(data, engine_columns(general_data))
+        assert data_folder.exists()
+
+    def test_parquet_input(self, parquet_input_file, general_data):
+        (data, data_folder) = load_data(parquet_input_file)
+        pd.testing.assert_frame_equal(data, engine_columns(general_data))
+        assert data_folder.exists()
+
+    def test_unsupported_input(self, file_structure_root):
+        with pytest.raises(ValueError):
+            load_data(file_structure_root.joinpath("input.txt"))
+
+
+class TestDataSaving:
+    @pytest.mark.parametrize("save_format", ["parquet", "feather"])
+    @pytest.mark.parametrize("compression", ["none", "zstd"])
+    def test_columnar_round_trip(
+        self, general_data, tmp_path, save_format, compression
+    ):
+        save_data(tmp_path, save_format, {"results": general_data}, compression)
+
+        (data, _) = load_data(tmp_path.joinpath(f"results.{save_format}"))
+        pd.testing.assert_frame_equal(data, engine_columns(general_data))
+
+    def test_workbook(self, general_data, tmp_path):
+        results = {
+            "ach-ashrae": general_data,
+            "risk_ach_inf_data": general_data.head(3),
+        }
+        save_data(tmp_path, "workbook", results)
+
+        sheets = pd.read_excel(
+            tmp_path.joinpath("results.xlsx"), sheet_name=None, index_col=0
+        )
+        assert list(sheets) == list(results)
+        for name, df in results.items():
+            pd.testing.assert_frame_equal(sheets[name], df, check_index_type=False)
+
+    def test_workbook_risk_sweeps(self, tmp_path):
+        data = engine_columns(validate_schema(synthetic_rooms(2, ["aula"])))
+        results = {
+            "risk_ach_inf_data": ach_risk_inf_percent_calculation(data, [10.0]),
+            "risk_ach_aerosol_data": ach_risk_aerosol_calculation(data, ["20", "40"]),
+        }
+        save_data(tmp_path, "workbook", results)
+
+        sheets = pd.read_excel(
+            tmp_path.joinpath("results.xlsx"), sheet_name=None, index_col=0
+        )
+        assert list(sheets) == list(results)
+        assert sheets["risk_ach_inf_data"]["infected"].iloc[0] == "[10.0]"
+        assert sheets["risk_ach_aerosol_data"]["aerosol"].iloc[0] == "['20', '40']"
+        pd.testing.assert_series_equal(
+            sheets["risk_ach_inf_data"]["riesgo_100_10.0_inf"],
+            results["risk_ach_inf_data"]["riesgo_100_10.0_inf"],
+        )
+
+    def test_unsupported_format(self, general_data, tmp_path):
+        with pytest.raises(ValueError):
+            save_data(tmp_path, "txt", {"results": general_data})
+
+
+class TestInputCache:
+    def test_excel_cache(self, xlsx_input_file):
+        (data, _) = load_data(xlsx_input_file)
+        cache_path = input_cache_path(xlsx_input_file)
+        assert cache_path.exists()
+
+        (cached_data, _) = load_data(xlsx_input_file)
+        pd.testing.assert_frame_equal(cached_data, data)
+
+    def test_cache_skips_parsing(self, xlsx_input_file, monkeypatch):
+        load_data(xlsx_input_file)
+
+        def fail_read_excel(*args, **kwargs):
+            raise AssertionError("Excel file parsed with a valid cache")
+
+        monkeypatch.setattr(pd, "read_excel", fail_read_excel)
+        (data, _) = load_data(xlsx_input_file)
+        assert isinstance(data, pd.DataFrame)
+
+    def test_cache_key_changes(self, general_data, tmp_path):
+        excel_file = tmp_path.joinpath("changing.xlsx")
+        general_data.to_excel(excel_file)
+        first_path = input_cache_path(excel_file)
+
+        general_data.head(5).to_excel(excel_file)
+        assert input_cache_path(excel_file) != first_path
+
+    def test_cache_key_follows_validation(self, xlsx_input_file, monkeypatch):
+        first_path = input_cache_path(xlsx_input_file)
+
+        monkeypatch.setattr(io_module, "cache_version", lambda: "2.0.0")
+        assert input_cache_path(xlsx_input_file) != first_path
+
+    def test_no_cache(self, xlsx_input_file):
+        load_data(xlsx_input_file, use_cache=False)
+        assert not input_cache_path(xlsx_input_file).exists()
+
+    def test_cache_evicts_least_recently_used(self, general_data, tmp_path):
+        excel_files = []
+        for number in range(3):
+            excel_file = tmp_path.joinpath(f"rooms_{number}.xlsx")
+            general_data.head(number + 1).to_excel(excel_file)
+            load_data(excel_file)
+            # Copies written a second apart, oldest first
+            os.utime(input_cache_path(excel_file), ns=(0, number * 10**9))
+            excel_files.append(excel_file)
+
+        # The first input is used again, the second one is then the least recent
+        load_data(excel_files[0])
+        prune_input_cache(input_cache_path(excel_files[0]).parent, entries=2)
+
+        assert input_cache_path(excel_files[0]).exists()
+        assert not input_cache_path(excel_files[1]).exists()
+        assert input_cache_path(excel_files[2]).exists()
+
+
+class TestChunkedLoading:
+    def test_csv_chunks(self, csv_input_file, general_data):
+        chunks = list(load_data_chunks(csv_input_file, 3))
+
+        assert [len(chunk) for chunk in chunks] == [3, 3, 3, 1]
+        assert sum(len(chunk) for chunk in chunks) == len(general_data)
+
+    def test_jsonl_chunks(self, jsonl_input_file, general_data):
+        chunks = list(load_data_chunks(jsonl_input_file, 4))
+
+        assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+        assert (
+            pd.concat(chunks)["Ambiente"].tolist() == general_data["ambiente"].tolist()
+        )
+
+    def test_stdin_chunks(self, jsonl_input_file, general_data, monkeypatch):
+        with open(jsonl_input_file, encoding="utf-8") as jsonl_file:
+            monkeypatch.setattr("sys.stdin", io.StringIO(jsonl_file.read()))
+
+        chunks = list(load_data_chunks(Path("-"), 6))
+
+        assert [len(chunk) for chunk in chunks] == [6, 4]
+
+    def test_unsupported_format(self, xlsx_input_file):
         with pytest.raises(ValueError):
-            load_data(feather_input_file)
+            next(load_data_chunks(xlsx_input_file, 3))
+
+    def test_append_data(self, csv_input_file, tmp_path):
+        for chunk_number, chunk in enumerate(load_data_chunks(csv_input_file, 3)):
+            append_data(tmp_path, "csv", {"chunked": chunk}, header=chunk_number == 0)
+
+        result = pd.read_csv(tmp_path.joinpath("chunked.csv"), index_col=0)
+        assert len(result) == 10
+
+    def test_append_unsupported_format(self, general_data, tmp_path):
+        with pytest.raises(ValueError):
+            append_data(tmp_path, "xlsx", {"chunked": general_data}, header=True)
+
+
+def test_write_ndjson(general_data):
+    stream = io.StringIO()
+    write_ndjson(general_data.head(3), stream)
+    write_ndjson(general_data.tail(2), stream)
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 5
+    assert json.loads(lines[0])["ambiente"] == general_data["ambiente"][0]
 
 
 def test_make_results_folder(file_structure_root):
@@ -0,0 +1,81 @@
+import pytest
+
+from airborne_cli.utils.manifest import load_manifest
+
+
+@pytest.fixture
+def base_settings() -> dict:
+    return {
+        "general": {"ach": False, "ashrae": True, "risk": False, "aforo": [30.0]},
+        "ach": {"max_risk": 3.0, "mask_default": "KN95", "viral_load": "10"},
+    }
+
+
+def test_load_manifest(tmp_path, base_settings):
+    manifest_path = tmp_path.joinpath("manifest.toml")
+    manifest_path.write_text(
+        'input = "rooms.csv"\n'
+        "\n"
+        "[scenarios.baseline]\n"
+        "\n"
+        "[scenarios.mask_mandate]\n"
+        'mask_default = "surgical"\n'
+        "ach = true\n"
+        "aforo = [50.0]\n",
+        encoding="utf-8",
+    )
+
+    manifest = load_manifest(manifest_path, base_settings)
+
+    assert manifest.data_in == tmp_path.joinpath("rooms.csv")
+    assert [scenario.name for scenario in manifest.scenarios] == [
+        "baseline",
+        "mask_mandate",
+    ]
+    assert manifest.scenarios[0].settings == base_settings
+
+    mask_mandate = manifest.scenarios[1].settings
+    assert mask_mandate["ach"]["mask_default"] == "surgical"
+    assert mask_mandate["general"]["ach"] is True
+    assert mask_mandate["general"]["aforo"] == [50.0]
+    assert base_settings["ach"]["mask_default"] == "KN95"
+
+
+def test_no_scenarios(tmp_path, base_settings):
+    manifest_path = tmp_path.joinpath("manifest.toml")
+    manifest_path.write_text('input = "rooms.csv"\n', encoding="utf-8")
+
+    with pytest.raises(ValueError, match="no"):
+        load_manifest(manifest_path, base_settings)
+
+
+def test_unknown_setting(tmp_path, base_settings):
+    manifest_path = tmp_path.joinpath("manifest.toml")
+    manifest_path.write_text("[scenarios.wrong]\ntemplate = 'dark'\n", encoding="utf-8")
+
+    with pytest.raises(ValueError, match="template"):
+        load_manifest(manifest_path, base_settings)
+
+
+def test_every_scenario_is_checked_on_load(tmp_path, base_settings):
+    manifest_path = tmp_path.joinpath("manifest.toml")
+    manifest_path.write_text(
+        "[scenarios.baseline]\n"
+        "\n"
+        "[scenarios.unmasked]\n"
+        'mask_default = "No mask"\n'
+        'aerosol = ["15"]\n',
+        encoding="utf-8",
+    )
+
+    with pytest.raises(ValueError, match="unmasked.*mask_default.*aerosol"):
+        load_manifest(manifest_path, base_settings)
+
+
+@pytest.mark.parametrize("name", ["../outside", "rooms/masks", "..", "a\\\\b"])
+def test_scenario_names_are_folder_names(tmp_path, base_settings, name):
+    manifest_path = tmp_path.joinpath("manifest.toml")
+    manifest_path.write_text(f'[scenarios."{name}"]\n', encoding="utf-8")
+
+    with pytest.raises(ValueError, match="path separators"):
+        load_manifest(manifest_path, base_settings)
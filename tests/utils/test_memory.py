@@ -0,0 +1,65 @@
+import pytest
+
+from airborne_cli.settings.model import compile_settings
+from airborne_cli.utils.memory import EXCEL_CELL_BYTES
+from airborne_cli.utils.memory import MIB
+from airborne_cli.utils.memory import Footprint
+from airborne_cli.utils.memory import count_lines
+from airborne_cli.utils.memory import project_footprint
+from airborne_cli.utils.memory import results_row_bytes
+
+
+@pytest.fixture
+def parameters():
+    return compile_settings(
+        {
+            "general": {"aforo": [50.0, 100.0], "default_aerosol": "40"},
+            "ach": {
+                "max_risk": 3.0,
+                "mask_default": "KN95",
+                "inf_percent": [5.0, 10.0],
+                "viral_load": "10",
+                "aerosol": ["20", "40", "100"],
+            },
+            "ashrae": {"aula": {"rate_people": 3.8, "rate_area": 0.3}},
+        }
+    )
+
+
+def test_results_grow_with_stages(parameters):
+    ashrae = results_row_bytes(parameters, False, True, False, False, False, "csv")
+    risk = results_row_bytes(parameters, False, True, True, True, False, "csv")
+    graphics = results_row_bytes(parameters, False, True, True, True, True, "csv")
+    excel = results_row_bytes(parameters, False, True, False, False, False, "excel")
+
+    assert 0 < ashrae < risk < graphics
+    assert excel == ashrae + EXCEL_CELL_BYTES * 4
+
+
+def test_chunk_rows_within_limit():
+    footprint = Footprint(rows=100 * 1024, baseline=100 * MIB, row_bytes=1024)
+
+    assert footprint.total == 200 * MIB
+    assert footprint.chunk_rows(150 * MIB) == 50 * 1024
+
+
+def test_limit_below_baseline():
+    footprint = Footprint(rows=10, baseline=100 * MIB, row_bytes=1)
+
+    with pytest.raises(ValueError):
+        footprint.chunk_rows(50 * MIB)
+
+
+def test_count_lines(tmp_path):
+    data_path = tmp_path.joinpath("rooms.csv")
+    data_path.write_text("a,b\n1,2\n3,4")
+
+    assert count_lines(data_path) == 3
+
+
+def test_project_footprint(general_data, csv_input_file, xlsx_input_file):
+    footprint = project_footprint(csv_input_file, 1000, "csv")
+
+    assert footprint.rows == len(general_data)
+    assert footprint.row_bytes > 1000
+    assert project_footprint(xlsx_input_file, 1000, "csv") is None
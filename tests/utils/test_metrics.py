@@ -0,0 +1,56 @@
+import json
+
+from airborne_cli.utils import metrics
+from airborne_cli.utils.metrics import Histogram
+from airborne_cli.utils.metrics import MetricsRegistry
+from airborne_cli.utils.metrics import prometheus_text
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram((1, 5, 10))
+
+    for value in [0.5, 1, 3, 20]:
+        histogram.observe(value)
+
+    assert histogram.cumulative() == [2, 3, 3]
+    assert (histogram.count, histogram.sum) == (4, 24.5)
+
+
+def test_prometheus_text(tmp_path):
+    registry = MetricsRegistry("run", tmp_path.joinpath("airborne.prom"))
+    registry.increment("airborne_rows_loaded_total", 10)
+    registry.increment("airborne_cache_hits_total", cache="results")
+    registry.observe("airborne_ach_solver_iterations", 30)
+
+    text = prometheus_text(registry)
+
+    assert "# TYPE airborne_rows_loaded_total counter" in text
+    assert 'airborne_rows_loaded_total{command="run"} 10' in text
+    assert 'airborne_cache_hits_total{cache="results",command="run"} 1' in text
+    assert 'airborne_ach_solver_iterations_bucket{command="run",le="20"} 0' in text
+    assert 'airborne_ach_solver_iterations_bucket{command="run",le="50"} 1' in text
+    assert 'airborne_ach_solver_iterations_bucket{command="run",le="+Inf"} 1' in text
+    assert "airborne_figures_rendered_total" not in text
+
+
+def test_finish_writes_report(tmp_path):
+    results_folder = tmp_path.joinpath("results")
+    results_folder.mkdir()
+    results_folder.joinpath("results.csv").write_text("a" * 100)
+
+    metrics.start_metrics("ach", tmp_path.joinpath("metrics", "airborne.json"))
+    metrics.increment("airborne_simulations_total", 5)
+    metrics.count_written(results_folder)
+    report_path = metrics.finish_metrics()
+    report = json.loads(report_path.read_text())
+
+    assert metrics.ACTIVE_METRICS is None
+    assert report["airborne_run_success"][0]["value"] == 1
+    assert report["airborne_simulations_total"][0]["value"] == 5
+    assert report["airborne_bytes_written_total"][0]["value"] == 100
+
+
+def test_increment_without_metrics_does_nothing():
+    metrics.increment("airborne_rows_loaded_total", 10)
+
+    assert metrics.finish_metrics() is None
@@ -13,7 +13,9 @@ from airborne_cli.utils.options import (
 
 
 class TestSaveFormat:
-    @pytest.mark.parametrize("save_format", ["csv", "excel", "json"])
+    @pytest.mark.parametrize(
+        "save_format", ["csv", "excel", "workbook", "json", "parquet", "feather"]
+    )
     def test_correct_format(self, save_format):
         assert isinstance(SaveFormat(save_format), Enum)
 
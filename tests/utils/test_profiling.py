@@ -0,0 +1,64 @@
+import io
+import json
+import time
+
+from rich.console import Console
+
+from airborne_cli.utils import profiling
+from airborne_cli.utils.profiling import RunProfile
+
+
+def test_nested_stages_are_exclusive():
+    profile = RunProfile("run")
+
+    with profile.stage("risk"):
+        time.sleep(0.02)
+        with profile.stage("save"):
+            time.sleep(0.05)
+
+    assert profile.stages["save"].wall >= 0.05
+    assert 0.02 <= profile.stages["risk"].wall < 0.05
+    assert profile.stages["risk"].calls == 1
+
+
+def test_stage_without_profile_does_nothing():
+    with profiling.stage("load"):
+        pass
+
+    assert profiling.ACTIVE_PROFILE is None
+    assert profiling.finish_profile() is None
+
+
+def test_report_written_to_results(tmp_path):
+    profiling.start_profile("ach", cprofile=True)
+    profiling.report_to(tmp_path)
+
+    with profiling.stage("ach"):
+        sum(range(1000))
+
+    profile = profiling.ACTIVE_PROFILE
+    report_path = profile.finish(Console(file=io.StringIO()))
+    profiling.ACTIVE_PROFILE = None
+    report = json.loads(report_path.read_text())
+
+    assert report_path == tmp_path.joinpath("profile.json")
+    assert tmp_path.joinpath("profile.prof").exists()
+    assert report["command"] == "ach"
+    assert report["stages"]["ach"]["calls"] == 1
+    assert report["hotspots"]
+
+
+def test_memory_per_stage(tmp_path):
+    profile = RunProfile("run", memory=True)
+    profile.folder = tmp_path
+
+    with profile.stage("risk"):
+        results = [bytearray(1024) for _ in range(1000)]
+
+    profile.finish(Console(file=io.StringIO()))
+    stage_memory = profile.memory["risk"]
+
+    assert len(results) == 1000
+    assert stage_memory.traced_peak >= 1000 * 1024
+    assert stage_memory.peak_rss > 0
+    assert next(iter(stage_memory.top_allocations())).startswith("test_profiling.py")
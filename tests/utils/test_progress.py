@@ -0,0 +1,48 @@
+import io
+
+from rich.console import Console
+
+from airborne_cli.utils.progress import BYTES_WRITTEN
+from airborne_cli.utils.progress import StageProgress
+from airborne_cli.utils.workers import SerialExecutor
+
+
+def test_disabled_without_terminal():
+    output = io.StringIO()
+
+    with StageProgress(Console(file=output)) as progress:
+        progress.track("Rooms solved", [SerialExecutor().submit(abs, -1)])
+
+    assert output.getvalue() == ""
+
+
+def test_tracked_futures_are_counted():
+    executor = SerialExecutor()
+    progress = StageProgress(Console(file=io.StringIO()))
+
+    progress.track("Rooms solved", [executor.submit(abs, -1) for _ in range(3)])
+    progress.track("Rooms solved", [executor.submit(abs, -1) for _ in range(2)])
+
+    task = progress.progress.tasks[progress.tasks["Rooms solved"]]
+    assert (task.completed, task.total) == (5, 5)
+
+
+def test_tracked_blocks_count_their_rooms():
+    executor = SerialExecutor()
+    progress = StageProgress(Console(file=io.StringIO()))
+
+    progress.track("Rooms swept", [executor.submit(abs, -1) for _ in range(2)], [3, 4])
+
+    task = progress.progress.tasks[progress.tasks["Rooms swept"]]
+    assert (task.completed, task.total) == (7, 7)
+
+
+def test_bytes_written(tmp_path):
+    progress = StageProgress(Console(file=io.StringIO()))
+    tmp_path.joinpath("results.csv").write_text("a" * 100)
+    future = SerialExecutor().submit(abs, -1)
+
+    progress.track_written(tmp_path, future)
+
+    task = progress.progress.tasks[progress.tasks[BYTES_WRITTEN]]
+    assert task.completed == 100
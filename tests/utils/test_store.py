@@ -0,0 +1,79 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from airborne_cli.lib.bench import synthetic_rooms
+from airborne_cli.utils.io import save_data
+from airborne_cli.utils.store import query_results
+from airborne_cli.utils.validation import engine_columns
+from airborne_cli.utils.validation import validate_schema
+
+
+@pytest.fixture
+def risk_data() -> pd.DataFrame:
+    """Risk sweep in the wide format returned by the risk calculations.
+
+    Returns:
+        pd.DataFrame: Risk for two rooms at three ACH values
+    """
+    return pd.DataFrame.from_dict(
+        {
+            "ambiente": ["A101", "A101", "A101", "B201", "B201", "B201"],
+            "pabellon": ["A", "A", "A", "B", "B", "B"],
+            "Aforo_100": [40, 40, 40, 20, 20, 20],
+            "ach": [1.0, 5.0, 10.0, 1.0, 5.0, 10.0],
+            "aforo_50_10.0_inf": [20, 20, 20, 10, 10, 10],
+            "riesgo_50_10.0_inf": [0.08, 0.04, 0.02, 0.06, 0.035, 0.01],
+            "aforo_100_10.0_inf": [40, 40, 40, 20, 20, 20],
+            "riesgo_100_10.0_inf": [0.1, 0.06, 0.03, 0.09, 0.05, 0.02],
+        }
+    )
+
+
+@pytest.fixture
+def database(tmp_path, risk_data, general_data):
+    save_data(
+        tmp_path,
+        "sqlite",
+        {"ach-ashrae": general_data, "risk_ach_inf_data": risk_data},
+    )
+    return tmp_path.joinpath("results.sqlite")
+
+
+def test_normalized_tables(database, general_data):
+    with sqlite3.connect(database) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM rooms").fetchone() == (2,)
+        assert connection.execute("SELECT COUNT(*) FROM scenarios").fetchone() == (2,)
+        assert connection.execute("SELECT COUNT(*) FROM results").fetchone() == (12,)
+        assert connection.execute("SELECT COUNT(*) FROM ach_ashrae").fetchone() == (
+            len(general_data),
+        )
+    connection.close()
+
+
+def test_query_results(database):
+    rows = list(
+        query_results(database, pabellon="B", occupancy=50, max_ach=6, min_risk=0.03)
+    )
+
+    assert rows == [
+        ("B", "B201", "infected", 10.0, 50.0, 1.0, 10, 0.06),
+        ("B", "B201", "infected", 10.0, 50.0, 5.0, 10, 0.035),
+    ]
+
+
+def test_query_without_filters(database):
+    assert len(list(query_results(database))) == 12
+
+
+def test_engine_columns(tmp_path):
+    # Results carry the input columns once, under the names the engines use
+    data = engine_columns(validate_schema(synthetic_rooms(5, ["aula"])))
+    save_data(tmp_path, "sqlite", {"ach-ashrae": data})
+
+    with sqlite3.connect(tmp_path.joinpath("results.sqlite")) as connection:
+        saved = pd.read_sql("SELECT * FROM ach_ashrae", connection, index_col="index")
+    connection.close()
+
+    pd.testing.assert_frame_equal(saved, data, check_names=False)
@@ -1,24 +1,21 @@
-import pytest
-import pandas as pd
+from random import choice
+from random import randint
+from random import uniform
 
+import pandas as pd
+import pytest
 from faker import Faker
-from random import choice, randint, uniform
 
-from airborne_cli.utils.validation import (
-    validate_existing_columns,
-    validate_data_types,
-    validate_input,
-)
+from airborne_cli.utils.validation import SchemaError
+from airborne_cli.utils.validation import validate_schema
 
 
-def test_validate_existing_columns(general_data: pd.DataFrame) -> None:
-    """Tests validation script for columns
+def test_missing_required_column(general_data: pd.DataFrame) -> None:
+    """Tests validation of the required columns
 
     Args:
         general_data (pd.DataFrame): Dataframe wit test data
     """
-    assert validate_existing_columns(general_data.columns) is True
-
     required_columns = [
         "ambiente",
         "area",
@@ -27,24 +24,24 @@ def test_validate_existing_columns(general_data: pd.DataFrame) -> None:
         "actividad",
         "permanencia",
     ]
-    dropped_data = general_data.drop(choice(required_columns), axis=1)
+    column = choice(required_columns)
+    dropped_data = general_data.drop(column, axis=1)
 
-    with pytest.raises(ValueError):
-        validate_existing_columns(dropped_data.columns)
+    with pytest.raises(SchemaError, match=f"{column} not found"):
+        validate_schema(dropped_data)
 
 
-def test_validate_data_types(general_data: pd.DataFrame) -> None:
-    """Test validation script for data types.
+def test_unreadable_data_types(general_data: pd.DataFrame) -> None:
+    """Test validation of data types.
 
     Args:
         general_data (pd.DaraFrame): Dataframe with test data
     """
-    assert validate_data_types(general_data) is True
-
     wrong_data = general_data.astype("object")
+    wrong_data.loc[3, "area"] = "large"
 
-    with pytest.raises(ValueError):
-        validate_data_types(wrong_data)
+    with pytest.raises(SchemaError, match="area has values that can't be read"):
+        validate_schema(wrong_data)
 
 
 class TestValidateInput:
@@ -54,7 +51,7 @@ class TestValidateInput:
         Args:
             general_data (pd.DataFrame): DataFrame with test data.
         """
-        assert validate_input(general_data) is True
+        validate_schema(general_data)
 
     def test_validate_input_wrong_area(
         self, faker: Faker, general_data: pd.DataFrame
@@ -79,8 +76,10 @@ class TestValidateInput:
 
         test_data = pd.concat([general_data, new_data], ignore_index=True)
 
-        with pytest.raises(ValueError):
-            validate_input(test_data)
+        with pytest.raises(SchemaError) as error:
+            validate_schema(test_data)
+
+        assert "area" in [violation.column for violation in error.value.violations]
 
     def test_validate_input_wrong_altura(
         self, faker: Faker, general_data: pd.DataFrame
@@ -105,8 +104,10 @@ class TestValidateInput:
 
         test_data = pd.concat([general_data, new_data], ignore_index=True)
 
-        with pytest.raises(ValueError):
-            validate_input(test_data)
+        with pytest.raises(SchemaError) as error:
+            validate_schema(test_data)
+
+        assert "altura" in [violation.column for violation in error.value.violations]
 
     def test_validate_input_wrong_aforo(
         self, faker: Faker, general_data: pd.DataFrame
@@ -131,8 +132,10 @@ class TestValidateInput:
 
         test_data = pd.concat([general_data, new_data], ignore_index=True)
 
-        with pytest.raises(ValueError):
-            validate_input(test_data)
+        with pytest.raises(SchemaError) as error:
+            validate_schema(test_data)
+
+        assert "aforo_100" in [violation.column for violation in error.value.violations]
 
     def test_validate_input_wrong_activity(
         self, faker: Faker, general_data: pd.DataFrame
@@ -157,8 +160,10 @@ class TestValidateInput:
 
         test_data = pd.concat([general_data, new_data], ignore_index=True)
 
-        with pytest.raises(ValueError):
-            validate_input(test_data)
+        with pytest.raises(SchemaError) as error:
+            validate_schema(test_data)
+
+        assert "actividad" in [violation.column for violation in error.value.violations]
 
     def test_validate_input_wrong_permanencia(
         self, faker: Faker, general_data: pd.DataFrame
@@ -183,5 +188,88 @@ class TestValidateInput:
 
         test_data = pd.concat([general_data, new_data], ignore_index=True)
 
-        with pytest.raises(ValueError):
-            validate_input(test_data)
+        with pytest.raises(SchemaError) as error:
+            validate_schema(test_data)
+
+        assert "permanencia" in [
+            violation.column for violation in error.value.violations
+        ]
+
+
+class TestValidateSchema:
+    def test_valid_data(self, general_data: pd.DataFrame) -> None:
+        """Test schema validation for good data.
+
+        Args:
+            general_data (pd.DataFrame): DataFrame with test data.
+        """
+        validated = validate_schema(general_data)
+
+        pd.testing.assert_frame_equal(validated, general_data)
+
+    def test_safe_coercion(self, general_data: pd.DataFrame) -> None:
+        """Test integer columns read as floats and float columns read as integers are coerced.
+
+        Args:
+            general_data (pd.DataFrame): DataFrame with test data.
+        """
+        test_data = general_data.assign(
+            area=general_data["area"].round().clip(lower=1).astype("int64"),
+            aforo_100=general_data["aforo_100"].astype("float64"),
+            actividad=general_data["actividad"].astype("float64"),
+        )
+
+        validated = validate_schema(test_data)
+
+        assert validated["area"].dtype == "float64"
+        assert validated["aforo_100"].dtype == "int64"
+        assert validated["actividad"].dtype == "int64"
+
+    def test_collects_every_violation(self, general_data: pd.DataFrame) -> None:
+        """Test every broken rule is reported with its rows.
+
+        Args:
+            general_data (pd.DataFrame): DataFrame with test data.
+        """
+        test_data = general_data.copy()
+        test_data.loc[[1, 4], "area"] = -1.0
+        test_data.loc[2, "actividad"] = 5
+        test_data["aforo_100"] = test_data["aforo_100"].astype("float64")
+        test_data.loc[3, "aforo_100"] = 10.5
+        test_data = test_data.drop("permanencia", axis=1)
+
+        with pytest.raises(SchemaError) as error:
+            validate_schema(test_data)
+
+        problems = {
+            violation.column: violation.rows for violation in error.value.violations
+        }
+        assert problems == {
+            "area": [1, 4],
+            "aforo_100": [3],
+            "actividad": [2],
+            "permanencia": [],
+        }
+
+    def test_optional_columns(self, general_data: pd.DataFrame) -> None:
+        """Test optional columns are coerced when present and can leave values empty, except integer ones.
+
+        Args:
+            general_data (pd.DataFrame): DataFrame with test data.
+        """
+        test_data = general_data.assign(**{"Mask Type": 1.0})
+        test_data.loc[0, "ACH_natural"] = None
+
+        validated = validate_schema(test_data)
+
+        assert validated["Mask Type"].dtype == "int64"
+        assert validated["ACH_natural"].isna().sum() == 1
+
+        test_data.loc[[2, 5], "Mask Type"] = [1.5, float("nan")]
+
+        with pytest.raises(SchemaError) as error:
+            validate_schema(test_data)
+
+        assert [
+            (violation.column, violation.rows) for violation in error.value.violations
+        ] == [("Mask Type", [2, 5])]
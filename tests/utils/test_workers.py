@@ -0,0 +1,68 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pytest
+
+from airborne_cli.utils.workers import BLOCKS_PER_JOB
+from airborne_cli.utils.workers import SerialExecutor
+from airborne_cli.utils.workers import chunk_sizes
+from airborne_cli.utils.workers import gather_chunks
+from airborne_cli.utils.workers import make_executor
+from airborne_cli.utils.workers import split_rows
+from airborne_cli.utils.workers import stage_parts
+from airborne_cli.utils.workers import submit_chunks
+
+
+def double_area(data: pd.DataFrame, factor: int) -> pd.DataFrame:
+    return data.assign(area=data["area"] * factor)
+
+
+def test_make_executor():
+    assert isinstance(make_executor(1), SerialExecutor)
+
+    with make_executor(2) as executor:
+        assert isinstance(executor, ProcessPoolExecutor)
+
+
+def test_serial_executor_keeps_exceptions():
+    future = SerialExecutor().submit(int, "not a number")
+
+    with pytest.raises(ValueError):
+        future.result()
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_stage_parts(jobs):
+    assert stage_parts(jobs) == jobs * BLOCKS_PER_JOB
+
+
+def test_chunk_sizes(general_data):
+    sizes = chunk_sizes(general_data, 3)
+
+    assert sizes == [len(chunk) for chunk in split_rows(general_data, 3)]
+    assert sum(sizes) == len(general_data)
+
+
+@pytest.mark.parametrize("parts", [1, 3, 10, 20])
+def test_split_rows(general_data, parts):
+    chunks = split_rows(general_data, parts)
+
+    assert len(chunks) == min(parts, len(general_data))
+    pd.testing.assert_frame_equal(pd.concat(chunks), general_data)
+
+
+def test_split_empty_rows(general_data):
+    chunks = split_rows(general_data.iloc[0:0], 0)
+
+    assert [len(chunk) for chunk in chunks] == [0]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_submit_chunks(general_data, jobs):
+    with make_executor(jobs) as executor:
+        futures = submit_chunks(executor, double_area, general_data, 4, 2)
+        results = gather_chunks(futures)
+
+    pd.testing.assert_series_equal(
+        results["area"], general_data["area"] * 2, check_names=False
+    )